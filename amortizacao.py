@@ -0,0 +1,157 @@
+from datas import mes_chave, somar_meses
+
+# Cronogramas são montados como listas paralelas (uma posição por parcela)
+# para serem inseridos de uma vez com executemany.
+
+SISTEMAS = ("FIXO", "PRICE", "SAC")
+
+# -------------------- CRONOGRAMAS --------------------
+def tabela_fixa(valor_parcela, qtd_parcelas):
+    parcelas = [round(valor_parcela, 2)] * qtd_parcelas
+    return parcelas, [None] * qtd_parcelas, [None] * qtd_parcelas
+
+def tabela_price(valor_financiado, taxa_mensal, qtd_parcelas):
+    # Parcela constante: PMT = P * i / (1 - (1 + i)^-n)
+    if taxa_mensal:
+        pmt = round(valor_financiado * taxa_mensal / (1 - (1 + taxa_mensal) ** -qtd_parcelas), 2)
+    else:
+        pmt = round(valor_financiado / qtd_parcelas, 2)
+    parcelas, amortizacoes, juros = [], [], []
+    saldo = valor_financiado
+    for _ in range(qtd_parcelas):
+        j = round(saldo * taxa_mensal, 2)
+        amortizacoes.append(round(pmt - j, 2))
+        juros.append(j)
+        parcelas.append(pmt)
+        saldo -= pmt - j
+    # Resíduo de arredondamento vai para a última parcela
+    ajuste = round(saldo, 2)
+    amortizacoes[-1] = round(amortizacoes[-1] + ajuste, 2)
+    parcelas[-1] = round(parcelas[-1] + ajuste, 2)
+    return parcelas, amortizacoes, juros
+
+def tabela_sac(valor_financiado, taxa_mensal, qtd_parcelas):
+    # Amortização constante, juros sobre o saldo devedor
+    amortizacao = round(valor_financiado / qtd_parcelas, 2)
+    amortizacoes = [amortizacao] * qtd_parcelas
+    amortizacoes[-1] = round(valor_financiado - amortizacao * (qtd_parcelas - 1), 2)
+    juros, parcelas = [], []
+    saldo = valor_financiado
+    for a in amortizacoes:
+        j = round(saldo * taxa_mensal, 2)
+        juros.append(j)
+        parcelas.append(round(a + j, 2))
+        saldo -= a
+    return parcelas, amortizacoes, juros
+
+def gerar_cronograma(primeira_parcela, qtd_parcelas, sistema="FIXO", valor_parcela=None,
+                     valor_financiado=None, taxa_mensal=0.0):
+    # Retorna (meses, parcelas, amortizacoes, juros). Entradas inválidas
+    # levantam ValueError, que o app e a API mostram como erro de cadastro.
+    sistema = (sistema or "FIXO").upper()
+    if sistema not in SISTEMAS:
+        raise ValueError(f"Sistema de amortização desconhecido: {sistema}")
+    if not isinstance(qtd_parcelas, int) or qtd_parcelas < 1:
+        raise ValueError("A quantidade de parcelas deve ser um inteiro maior que zero")
+    if sistema == "FIXO":
+        if valor_parcela is None or valor_parcela <= 0:
+            raise ValueError("Parcela fixa exige valor da parcela positivo")
+    else:
+        if valor_financiado is None or valor_financiado <= 0:
+            raise ValueError(f"{sistema} exige valor financiado positivo")
+        taxa_mensal = taxa_mensal or 0.0
+        if taxa_mensal < 0:
+            raise ValueError("A taxa de juros não pode ser negativa")
+    if sistema == "FIXO":
+        parcelas, amortizacoes, juros = tabela_fixa(valor_parcela, qtd_parcelas)
+    elif sistema == "PRICE":
+        parcelas, amortizacoes, juros = tabela_price(valor_financiado, taxa_mensal, qtd_parcelas)
+    else:
+        parcelas, amortizacoes, juros = tabela_sac(valor_financiado, taxa_mensal, qtd_parcelas)
+    inicio = mes_chave(primeira_parcela)
+    meses = [somar_meses(inicio, i) for i in range(qtd_parcelas)]
+    return meses, parcelas, amortizacoes, juros
+
+# -------------------- QUITAÇÃO ANTECIPADA --------------------
+def valor_presente(valor, meses_antecipados, taxa_mensal):
+    # Desconto de juros proporcional ao tempo de antecipação
+    if meses_antecipados <= 0 or not taxa_mensal:
+        return round(valor, 2)
+    return round(valor / (1 + taxa_mensal) ** meses_antecipados, 2)
+
+def meses_entre_chaves(inicio, fim):
+    return (fim // 100 - inicio // 100) * 12 + (fim % 100 - inicio % 100)
+
+def descontar_parcelas(parcelas, mes_pagamento, taxa_mensal):
+    # parcelas: [(id, mes_ano, valor_original)] -> [(id, mes_ano, valor_original, valor_presente, desconto)]
+    mes_pagamento = mes_chave(mes_pagamento)
+    resultado = []
+    for pid, mes_ano, valor in parcelas:
+        vp = valor_presente(valor, meses_entre_chaves(mes_pagamento, mes_ano), taxa_mensal)
+        resultado.append((pid, mes_ano, valor, vp, round(valor - vp, 2)))
+    return resultado
+
+# -------------------- OTIMIZAÇÃO DE QUITAÇÃO --------------------
+# Escolher parcelas para antecipar é uma mochila 0/1: custo = valor presente,
+# ganho = desconto. O orçamento é discretizado em no máximo LIMITE_CAPACIDADE
+# unidades e, com n itens, em no máximo LIMITE_CELULAS // n (em centavos
+# quando couber), e os custos arredondados para cima, então a solução da
+# mochila sempre cabe no orçamento real; o guloso por razão desconto/custo
+# cobre os casos em que o arredondamento atrapalha, e fica a melhor das duas.
+# Memória no pior caso: ~8 MB por vetor float64 da capacidade (melhor e o
+# candidato temporário) mais 12,5 MB da tabela de decisões em bits.
+LIMITE_CAPACIDADE = 1_000_000
+LIMITE_CELULAS = 100_000_000
+
+def _guloso(custos, ganhos, orcamento):
+    import numpy as np
+
+    escolhidos, gasto = [], 0.0
+    for i in np.argsort(-(ganhos / custos), kind="stable"):
+        if gasto + custos[i] <= orcamento + 1e-9:
+            escolhidos.append(int(i))
+            gasto += custos[i]
+    return escolhidos
+
+def _mochila(custos, ganhos, orcamento):
+    import numpy as np
+
+    unidades = max(min(LIMITE_CAPACIDADE, LIMITE_CELULAS // len(custos)), 1)
+    escala = max(orcamento / unidades, 0.01)
+    capacidade = int(orcamento / escala + 1e-9)
+    pesos = np.ceil(custos / escala - 1e-9).astype(np.int64)
+    itens = np.flatnonzero(pesos <= capacidade)
+    melhor = np.zeros(capacidade + 1)
+    # Decisões guardadas em bits: uma linha por item, uma coluna por capacidade
+    decisoes = np.zeros((len(itens), (capacidade + 8) // 8), dtype=np.uint8)
+    toma = np.zeros(capacidade + 1, dtype=bool)
+    for k, i in enumerate(itens):
+        p = pesos[i]
+        candidato = melhor[:capacidade + 1 - p] + ganhos[i]
+        toma[:p] = False
+        np.greater(candidato, melhor[p:], out=toma[p:])
+        np.maximum(melhor[p:], candidato, out=melhor[p:])
+        decisoes[k] = np.packbits(toma)
+    escolhidos, c = [], capacidade
+    for k in range(len(itens) - 1, -1, -1):
+        if decisoes[k, c // 8] >> (7 - c % 8) & 1:
+            escolhidos.append(int(itens[k]))
+            c -= pesos[itens[k]]
+    return escolhidos[::-1]
+
+def otimizar_quitacao(custos, ganhos, orcamento):
+    # Retorna (índices escolhidos, custo total, ganho total, método).
+    # NumPy só é importado aqui: db.py importa este módulo no startup do app
+    import numpy as np
+
+    custos = np.asarray(custos, dtype=float)
+    ganhos = np.asarray(ganhos, dtype=float)
+    validos = np.flatnonzero((ganhos > 0) & (custos > 0) & (custos <= orcamento + 1e-9))
+    if orcamento <= 0 or not len(validos):
+        return [], 0.0, 0.0, "nenhum"
+    resultados = []
+    for metodo, funcao in (("mochila", _mochila), ("guloso", _guloso)):
+        escolhidos = validos[funcao(custos[validos], ganhos[validos], orcamento)]
+        resultados.append((round(float(ganhos[escolhidos].sum()), 2), metodo, escolhidos))
+    ganho, metodo, escolhidos = max(resultados, key=lambda r: r[0])
+    return sorted(escolhidos.tolist()), round(float(custos[escolhidos].sum()), 2), ganho, metodo
@@ -0,0 +1,107 @@
+import numpy as np
+
+from cache import em_cache
+from conexao import leitura
+from datas import mes_chave, mes_br, meses_entre
+from db import get_subcontas
+
+# Séries mensais por subconta e por conta: planejado (saldo_inicial), gasto e
+# transferido líquido (sem a sobra automática do fechamento). Tudo sai de uma
+# única consulta agregada e vira matrizes (linha x mês); médias móveis,
+# variações e aderência são calculadas sobre as matrizes inteiras. As duas
+# etapas ficam no cache por versão dos dados, então rerun sem escrita não
+# consulta o banco.
+
+JANELA_MEDIA = 3
+NIVEIS = ("subconta", "conta")
+
+# -------------------- EXTRAÇÃO --------------------
+@em_cache
+def series_mensais(mes_inicio, mes_fim):
+    # Retorna (meses, subcontas, planejado, gasto, transferido): meses AAAAMM,
+    # subcontas [(id, conta, subconta)] e matrizes subconta x mês
+    inicio, fim = mes_chave(mes_inicio), mes_chave(mes_fim)
+    meses = meses_entre(inicio, fim)
+    subcontas = [(sid, c_nome, s_nome) for sid, s_nome, c_nome in get_subcontas()]
+    with leitura() as cur:
+        cur.execute("""
+            SELECT subconta_id, ano_mes, SUM(planejado), SUM(gasto), SUM(transferido)
+            FROM (
+                SELECT subconta_id, ano_mes, saldo_inicial AS planejado, 0 AS gasto, 0 AS transferido
+                FROM subconta_atribuicoes WHERE ano_mes BETWEEN ? AND ?
+                UNION ALL
+                SELECT subconta_id, ano_mes, 0, valor, 0
+                FROM gastos WHERE subconta_id IS NOT NULL AND ano_mes BETWEEN ? AND ?
+                UNION ALL
+                SELECT subconta_destino, mes_ano, 0, 0, valor
+                FROM transferencias WHERE mes_ano BETWEEN ? AND ? AND NOT automatica
+                UNION ALL
+                SELECT subconta_origem, mes_ano, 0, 0, -valor
+                FROM transferencias WHERE mes_ano BETWEEN ? AND ? AND NOT automatica
+            )
+            GROUP BY subconta_id, ano_mes
+        """, (inicio, fim) * 4)
+        rows = cur.fetchall()
+
+    linhas = {sid: i for i, (sid, _, _) in enumerate(subcontas)}
+    colunas = {mes: j for j, mes in enumerate(meses)}
+    matrizes = np.zeros((3, len(subcontas), len(meses)))
+    rows = [r for r in rows if r[0] in linhas and r[1] in colunas]
+    if rows:
+        sids, mes_rows, *valores = zip(*rows)
+        i = np.array([linhas[s] for s in sids])
+        j = np.array([colunas[m] for m in mes_rows])
+        np.add.at(matrizes, (slice(None), i, j), np.nan_to_num(np.array(valores, dtype=float)))
+    planejado, gasto, transferido = matrizes
+    return meses, subcontas, planejado, gasto, transferido
+
+# -------------------- INDICADORES --------------------
+def media_movel(matriz, janela):
+    # Média dos últimos `janela` meses (menos no começo da série), por linha
+    acumulado = np.cumsum(np.pad(matriz, ((0, 0), (1, 0))), axis=1)
+    fim = np.arange(1, matriz.shape[1] + 1)
+    inicio = np.maximum(fim - janela, 0)
+    return (acumulado[:, fim] - acumulado[:, inicio]) / (fim - inicio)
+
+def variacao(matriz):
+    # Diferença para o mês anterior; o primeiro mês fica sem valor (NaN)
+    return np.diff(matriz, axis=1, prepend=np.nan)
+
+def _dividir(numerador, denominador):
+    resultado = np.full(numerador.shape, np.nan)
+    np.divide(numerador, denominador, out=resultado, where=denominador > 0)
+    return resultado
+
+@em_cache
+def analisar(mes_inicio, mes_fim, nivel="subconta", janela=JANELA_MEDIA):
+    # Retorna (meses, linhas, indicadores): meses em MM/AAAA, linhas
+    # [(id, nome)] do nível pedido e {indicador: matriz linha x mês}
+    if nivel not in NIVEIS:
+        raise ValueError(f"Nível deve ser um de: {', '.join(NIVEIS)}")
+    meses, subcontas, planejado, gasto, transferido = series_mensais(mes_inicio, mes_fim)
+    if nivel == "conta":
+        contas = sorted({c_nome for _, c_nome, _ in subcontas})
+        posicao = {nome: i for i, nome in enumerate(contas)}
+        agrupamento = np.zeros((len(contas), len(subcontas)))
+        agrupamento[[posicao[c_nome] for _, c_nome, _ in subcontas], np.arange(len(subcontas))] = 1
+        planejado, gasto, transferido = agrupamento @ planejado, agrupamento @ gasto, agrupamento @ transferido
+        linhas = [(nome, nome) for nome in contas]
+    else:
+        linhas = [(sid, f"{c_nome} / {s_nome}") for sid, c_nome, s_nome in subcontas]
+
+    disponivel = planejado + transferido
+    indicadores = {
+        "planejado": planejado,
+        "gasto": gasto,
+        "transferido": transferido,
+        "media_gasto": media_movel(gasto, janela),
+        "media_planejado": media_movel(planejado, janela),
+        "variacao_gasto": variacao(gasto),
+        "variacao_gasto_pct": _dividir(variacao(gasto), np.roll(gasto, 1, axis=1)) * 100,
+        # Quanto do disponível (planejado + transferido) foi gasto, em %
+        "aderencia": _dividir(gasto, disponivel) * 100,
+        "media_aderencia": _dividir(media_movel(gasto, janela), media_movel(disponivel, janela)) * 100,
+    }
+    # Fatia, não índice: um período vazio não tem coluna 0
+    indicadores["variacao_gasto_pct"][:, :1] = np.nan
+    return [mes_br(m) for m in meses], linhas, indicadores
@@ -0,0 +1,402 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+import conexao
+import instrumentacao
+from db import (
+    init_db, garantir_reservas, add_receita, listar_receitas,
+    add_conta, get_contas, add_subconta, get_subcontas, pode_excluir_subconta, delete_subconta,
+    salvar_valor_subconta, get_saldos_mes, registrar_gasto, listar_gastos,
+    registrar_transferencia, listar_transferencias,
+    registrar_emprestimo, resumo_emprestimos, listar_parcelas, quitar_parcela,
+    quitar_parcelas, excluir_emprestimo, simular_quitacao_antecipada,
+    totais_por_mes, totais_por_subconta
+)
+from datas import intervalo_mes, mes_chave
+from previsao import prever_saldos, HORIZONTE_MIN, JANELA_HISTORICO
+from analise import analisar, JANELA_MEDIA
+from relatorio import solicitar_pdf_mensal, solicitar_pdf_periodo
+from sessoes import autenticar, criar_sessao, validar_sessao, encerrar_sessao
+
+# API JSON local sobre as funções do db.py, para atalhos e scripts lançarem
+# gastos sem passar pelo rerun do Streamlit:
+#
+#   uvicorn api:app --port 8600
+#   curl -X POST localhost:8600/sessoes -d '{"usuario": "ana", "senha": "..."}'
+#   curl -H "Authorization: Bearer <token>" localhost:8600/atribuicoes?mes=01/2025
+#
+# O servidor é assíncrono; toda chamada ao SQLite roda num pool de threads
+# do tamanho do pool de conexões. Datas e meses seguem o formato da tela
+# (DD/MM/AAAA e MM/AAAA) e também aceitam ISO. Para testes, o TestClient do
+# Starlette (requer httpx) roda o app sem abrir porta.
+
+_executor = ThreadPoolExecutor(max_workers=conexao.TAMANHO_POOL, thread_name_prefix="api-db")
+_estado = {}
+ROTAS = []
+# Rota em atendimento, para atribuir as consultas SQL na instrumentação
+_rota_atual = contextvars.ContextVar("rota_atual", default=instrumentacao.SEM_PAGINA)
+
+class ErroApi(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+# -------------------- HELPERS --------------------
+def _executar(rotulo, funcao, args, kwargs):
+    with instrumentacao.pagina(rotulo):
+        return funcao(*args, **kwargs)
+
+async def _db(funcao, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(_executar, _rota_atual.get(), funcao, args, kwargs))
+
+def _linhas(campos, rows):
+    return [dict(zip(campos, row)) for row in rows]
+
+def _mes_atual():
+    return date.today().strftime("%m/%Y")
+
+async def _corpo(request, *obrigatorios):
+    try:
+        corpo = await request.json()
+    except ValueError:
+        raise ErroApi(400, "Corpo da requisição não é um JSON válido")
+    if not isinstance(corpo, dict):
+        raise ErroApi(400, "Corpo da requisição deve ser um objeto JSON")
+    faltando = [campo for campo in obrigatorios if corpo.get(campo) in (None, "")]
+    if faltando:
+        raise ErroApi(400, f"Campos obrigatórios: {', '.join(faltando)}")
+    return corpo
+
+def _valor(corpo, campo="valor"):
+    try:
+        valor = float(corpo.get(campo))
+    except (TypeError, ValueError):
+        raise ErroApi(400, f"'{campo}' deve ser numérico")
+    if valor <= 0:
+        raise ErroApi(400, f"'{campo}' deve ser positivo")
+    return valor
+
+def _inteiro(texto, campo):
+    try:
+        return int(texto)
+    except (TypeError, ValueError):
+        raise ErroApi(400, f"'{campo}' deve ser inteiro")
+
+def _periodo(request):
+    # ?inicio=&fim= (datas) ou ?mes= ; sem nada, o mês atual
+    params = request.query_params
+    if "inicio" in params or "fim" in params:
+        inicio, fim = params.get("inicio"), params.get("fim")
+        if not inicio or not fim:
+            raise ErroApi(400, "Informe 'inicio' e 'fim'")
+        return inicio, fim
+    return intervalo_mes(params.get("mes") or _mes_atual())
+
+def _meses(inicio, fim):
+    # Janela de meses para relatórios e análises; fora de ordem é erro do cliente
+    if mes_chave(inicio) > mes_chave(fim):
+        raise ErroApi(400, "'inicio' deve ser anterior ou igual a 'fim'")
+    return inicio, fim
+
+def _token(request):
+    cabecalho = request.headers.get("authorization", "")
+    return cabecalho[7:].strip() if cabecalho.lower().startswith("bearer ") else None
+
+async def _autenticado(request):
+    # Tokens já vistos são validados pelo cache de sessoes.py, que só volta ao
+    # banco a cada VALIDADE_CACHE segundos
+    usuario = await _db(validar_sessao, _token(request))
+    if usuario is None:
+        raise ErroApi(401, "Sessão inválida ou expirada")
+    return usuario
+
+def rota(caminho, metodos=("GET",), publica=False):
+    def decorador(handler):
+        async def endpoint(request):
+            _rota_atual.set(f"{request.method} {caminho}")
+            try:
+                # Uma leitura da versão dos dados por requisição (escritas de outros processos)
+                await _db(conexao.sincronizar_versao)
+                if not publica:
+                    request.state.usuario = await _autenticado(request)
+                return await handler(request)
+            except ErroApi as e:
+                return JSONResponse({"erro": e.mensagem}, status_code=e.status)
+            except ValueError as e:
+                # Datas/meses mal formatados, sistema de amortização inválido...
+                return JSONResponse({"erro": str(e)}, status_code=400)
+        ROTAS.append(Route(caminho, endpoint, methods=list(metodos)))
+        return handler
+    return decorador
+
+# -------------------- SESSÕES --------------------
+@rota("/sessoes", ["POST"], publica=True)
+async def login(request):
+    corpo = await _corpo(request, "usuario", "senha")
+    if not autenticar(corpo["usuario"], corpo["senha"]):
+        raise ErroApi(401, "Usuário ou senha inválidos")
+    token = await _db(criar_sessao, corpo["usuario"])
+    return JSONResponse({"token": token, "usuario": corpo["usuario"]}, status_code=201)
+
+@rota("/sessoes", ["DELETE"])
+async def logout(request):
+    await _db(encerrar_sessao, _token(request))
+    return Response(status_code=204)
+
+# -------------------- CONTAS / SUBCONTAS --------------------
+@rota("/contas")
+async def contas(request):
+    return JSONResponse(_linhas(("id", "nome"), await _db(get_contas)))
+
+@rota("/contas", ["POST"])
+async def nova_conta(request):
+    corpo = await _corpo(request, "nome")
+    await _db(add_conta, str(corpo["nome"]).strip())
+    return JSONResponse({"nome": str(corpo["nome"]).strip()}, status_code=201)
+
+@rota("/subcontas")
+async def subcontas(request):
+    return JSONResponse(_linhas(("id", "nome", "conta"), await _db(get_subcontas)))
+
+@rota("/subcontas", ["POST"])
+async def nova_subconta(request):
+    corpo = await _corpo(request, "nome", "conta_id")
+    await _db(add_subconta, str(corpo["nome"]).strip(), _inteiro(corpo["conta_id"], "conta_id"))
+    return JSONResponse({"nome": str(corpo["nome"]).strip()}, status_code=201)
+
+@rota("/subcontas/{id:int}", ["DELETE"])
+async def apagar_subconta(request):
+    sid = request.path_params["id"]
+    if sid == _estado["reservas_id"]:
+        raise ErroApi(409, "A subconta Reservas não pode ser excluída")
+    if not await _db(pode_excluir_subconta, sid):
+        raise ErroApi(409, "Subconta com saldo não pode ser excluída")
+    await _db(delete_subconta, sid)
+    return Response(status_code=204)
+
+# -------------------- ATRIBUIÇÕES --------------------
+@rota("/atribuicoes")
+async def atribuicoes(request):
+    mes = request.query_params.get("mes") or _mes_atual()
+    saldos = await _db(get_saldos_mes, mes)
+    return JSONResponse(_linhas(("subconta_id", "conta", "subconta", "saldo_inicial", "saldo_atual"), saldos))
+
+@rota("/atribuicoes", ["POST"])
+async def atribuir(request):
+    corpo = await _corpo(request, "subconta_id", "valor")
+    mes = corpo.get("mes") or _mes_atual()
+    await _db(salvar_valor_subconta, mes, _inteiro(corpo["subconta_id"], "subconta_id"), _valor(corpo))
+    return JSONResponse({"mes": mes}, status_code=201)
+
+# -------------------- RECEITAS --------------------
+@rota("/receitas")
+async def receitas(request):
+    rows = await _db(listar_receitas, *_periodo(request))
+    return JSONResponse(_linhas(("id", "data", "origem", "valor", "descricao"), rows))
+
+@rota("/receitas", ["POST"])
+async def nova_receita(request):
+    corpo = await _corpo(request, "origem", "valor")
+    data = corpo.get("data") or date.today().strftime("%d/%m/%Y")
+    qtd, total = await _db(add_receita, data, corpo["origem"], _valor(corpo), corpo.get("descricao", ""))
+    return JSONResponse({"parcelas_quitadas": qtd, "valor_quitado": total}, status_code=201)
+
+# -------------------- GASTOS / TRANSFERÊNCIAS --------------------
+@rota("/gastos")
+async def gastos(request):
+    sid = request.query_params.get("subconta_id")
+    rows = await _db(listar_gastos, *_periodo(request), _inteiro(sid, "subconta_id") if sid else None)
+    return JSONResponse(_linhas(("id", "data", "valor", "descricao", "subconta_id"), rows))
+
+@rota("/gastos", ["POST"])
+async def novo_gasto(request):
+    corpo = await _corpo(request, "subconta_id", "valor")
+    data = corpo.get("data") or date.today().strftime("%d/%m/%Y")
+    mes = corpo.get("mes") or _mes_atual()
+    ok = await _db(registrar_gasto, data, _valor(corpo), corpo.get("descricao", ""),
+                   _inteiro(corpo["subconta_id"], "subconta_id"), mes)
+    if not ok:
+        raise ErroApi(409, "Saldo insuficiente para registrar este gasto")
+    return JSONResponse({"data": data, "mes": mes}, status_code=201)
+
+@rota("/transferencias")
+async def transferencias(request):
+    sid = request.query_params.get("subconta_id")
+    rows = await _db(listar_transferencias, *_periodo(request), _inteiro(sid, "subconta_id") if sid else None)
+    return JSONResponse(_linhas(("id", "data", "origem", "destino", "valor", "justificativa", "mes"), rows))
+
+@rota("/transferencias", ["POST"])
+async def nova_transferencia(request):
+    corpo = await _corpo(request, "origem", "destino", "valor", "justificativa")
+    origem, destino = _inteiro(corpo["origem"], "origem"), _inteiro(corpo["destino"], "destino")
+    if origem == destino:
+        raise ErroApi(400, "Origem e destino não podem ser iguais")
+    data = corpo.get("data") or date.today().strftime("%d/%m/%Y")
+    mes = corpo.get("mes") or _mes_atual()
+    ok = await _db(registrar_transferencia, data, origem, destino, _valor(corpo), corpo["justificativa"], mes)
+    if not ok:
+        raise ErroApi(409, "Saldo insuficiente")
+    return JSONResponse({"data": data, "mes": mes}, status_code=201)
+
+# -------------------- EMPRÉSTIMOS --------------------
+CAMPOS_EMPRESTIMO = ("id", "instituicao", "contrato", "tipo", "qtd_parcelas", "valor_parcela", "economia",
+                     "parcelas_abertas", "parcelas_quitadas", "proximo_vencimento", "saldo_devedor")
+CAMPOS_PARCELA = ("id", "mes", "valor_original", "valor_quitado", "data_quitacao")
+
+@rota("/emprestimos")
+async def emprestimos(request):
+    ativos = request.query_params.get("ativos", "").lower() in ("1", "true", "sim")
+    return JSONResponse(_linhas(CAMPOS_EMPRESTIMO, await _db(resumo_emprestimos, ativos)))
+
+@rota("/emprestimos", ["POST"])
+async def novo_emprestimo(request):
+    corpo = await _corpo(request, "instituicao", "contrato", "primeira_parcela", "qtd_parcelas")
+    sistema = (corpo.get("sistema") or "FIXO").upper()
+    if sistema == "FIXO":
+        extras = {"valor_parcela": _valor(corpo, "valor_parcela")}
+    else:
+        extras = {"valor_financiado": _valor(corpo, "valor_financiado"),
+                  "taxa_juros": float(corpo.get("taxa_juros") or 0)}
+    eid = await _db(registrar_emprestimo, corpo["instituicao"], corpo["contrato"], corpo.get("tipo", ""),
+                    corpo["primeira_parcela"], _inteiro(corpo["qtd_parcelas"], "qtd_parcelas"),
+                    sistema=sistema, **extras)
+    return JSONResponse({"id": eid}, status_code=201)
+
+@rota("/emprestimos/{id:int}/parcelas")
+async def parcelas(request):
+    return JSONResponse(_linhas(CAMPOS_PARCELA, await _db(listar_parcelas, request.path_params["id"])))
+
+@rota("/emprestimos/{id:int}/simulacao")
+async def simulacao(request):
+    mes = request.query_params.get("mes") or _mes_atual()
+    qtd = request.query_params.get("qtd")
+    rows = await _db(simular_quitacao_antecipada, request.path_params["id"], mes,
+                     _inteiro(qtd, "qtd") if qtd else None)
+    if rows is None:
+        raise ErroApi(404, "Empréstimo não encontrado")
+    return JSONResponse(_linhas(("parcela_id", "mes", "valor_original", "valor_presente", "desconto"), rows))
+
+@rota("/emprestimos/{id:int}", ["DELETE"])
+async def apagar_emprestimo(request):
+    await _db(excluir_emprestimo, request.path_params["id"])
+    return Response(status_code=204)
+
+@rota("/parcelas/{id:int}/quitacao", ["POST"])
+async def quitar(request):
+    corpo = await _corpo(request, "valor")
+    data = corpo.get("data") or date.today().strftime("%d/%m/%Y")
+    await _db(quitar_parcela, request.path_params["id"], _valor(corpo), data)
+    return JSONResponse({"data": data})
+
+@rota("/parcelas/quitacoes", ["POST"])
+async def quitar_lote(request):
+    # {"parcelas": [{"id": 1, "valor": 350.0}, ...], "data": "10/01/2025"}
+    corpo = await _corpo(request, "parcelas")
+    if not isinstance(corpo["parcelas"], list):
+        raise ErroApi(400, "'parcelas' deve ser uma lista")
+    quitacoes = []
+    for item in corpo["parcelas"]:
+        if not isinstance(item, dict):
+            raise ErroApi(400, "Cada parcela deve ser um objeto com 'id' e 'valor'")
+        quitacoes.append((_inteiro(item.get("id"), "id"), _valor(item)))
+    data = corpo.get("data") or date.today().strftime("%d/%m/%Y")
+    qtd = await _db(quitar_parcelas, quitacoes, data)
+    return JSONResponse({"data": data, "quitadas": qtd})
+
+# -------------------- RELATÓRIOS --------------------
+CAMPOS_MES = ("mes", "receitas", "atribuido", "saldo", "gastos", "transferido",
+              "parcelas_pagas", "valor_parcelas", "economia")
+CAMPOS_SUBCONTA = ("subconta_id", "conta", "subconta", "planejado", "gasto", "transferido_liquido", "saldo")
+
+@rota("/relatorios")
+async def relatorio(request):
+    params = request.query_params
+    inicio = params.get("inicio") or params.get("mes") or _mes_atual()
+    inicio, fim = _meses(inicio, params.get("fim") or inicio)
+    meses = await _db(totais_por_mes, inicio, fim)
+    subcontas = await _db(totais_por_subconta, inicio, fim)
+    return JSONResponse({"meses": _linhas(CAMPOS_MES, meses),
+                         "subcontas": _linhas(CAMPOS_SUBCONTA, subcontas)})
+
+@rota("/relatorios/pdf")
+async def relatorio_pdf(request):
+    # Usa o mesmo pool e cache de PDFs do app
+    params = request.query_params
+    reservas_id = _estado["reservas_id"]
+    if params.get("inicio"):
+        inicio, fim = _meses(params["inicio"], params.get("fim") or params["inicio"])
+        futuro = solicitar_pdf_periodo(inicio, fim, reservas_id)
+        nome = f"relatorio_{inicio.replace('/', '-')}_{fim.replace('/', '-')}.pdf"
+    else:
+        mes = params.get("mes") or _mes_atual()
+        futuro = solicitar_pdf_mensal(mes, reservas_id)
+        nome = f"relatorio_{mes.replace('/', '-')}.pdf"
+    pdf = await asyncio.wrap_future(futuro)
+    return Response(pdf, media_type="application/pdf",
+                    headers={"Content-Disposition": f'attachment; filename="{nome}"'})
+
+@rota("/previsao")
+async def previsao(request):
+    # ?mes=&meses=12..60&janela=6
+    params = request.query_params
+    horizonte = _inteiro(params.get("meses", HORIZONTE_MIN), "meses")
+    janela = _inteiro(params.get("janela", JANELA_HISTORICO), "janela")
+    if janela < 1:
+        raise ErroApi(400, "'janela' deve ser positiva")
+    meses, subcontas, saldos, total = await _db(prever_saldos, params.get("mes") or _mes_atual(),
+                                                horizonte, janela, _estado["reservas_id"])
+    return JSONResponse({"meses": meses, "total": total.round(2).tolist(),
+                         "subcontas": [{"subconta_id": sid, "saldos": linha.round(2).tolist()}
+                                       for sid, linha in zip(subcontas, saldos)]})
+
+@rota("/analises")
+async def analises(request):
+    # ?inicio=MM/AAAA&fim=MM/AAAA&nivel=subconta|conta&janela=3
+    params = request.query_params
+    fim = params.get("fim") or _mes_atual()
+    inicio, fim = _meses(params.get("inicio") or fim, fim)
+    janela = _inteiro(params.get("janela", JANELA_MEDIA), "janela")
+    if janela < 1:
+        raise ErroApi(400, "'janela' deve ser positiva")
+    meses, linhas, indicadores = await _db(analisar, inicio, fim, params.get("nivel", "subconta"), janela)
+    # NaN (sem base de comparação) vira null no JSON
+    serie = {nome: np.where(np.isnan(m), None, m.round(2)).tolist() for nome, m in indicadores.items()}
+    return JSONResponse({"meses": meses, "linhas": [
+        {"id": chave, "nome": nome, **{indicador: valores[i] for indicador, valores in serie.items()}}
+        for i, (chave, nome) in enumerate(linhas)
+    ]})
+
+# -------------------- MÉTRICAS --------------------
+@rota("/metricas")
+async def metricas(request):
+    # Texto do Prometheus ou ?formato=json; só há dados com FINANCE_DEBUG=1
+    if request.query_params.get("formato") == "json":
+        return JSONResponse(instrumentacao.snapshot())
+    return PlainTextResponse(instrumentacao.prometheus(), media_type="text/plain; version=0.0.4")
+
+# -------------------- APP --------------------
+@contextlib.asynccontextmanager
+async def _ciclo_de_vida(app):
+    if os.environ.get("FINANCE_DEBUG", "") not in ("", "0"):
+        instrumentacao.ativar(float(os.environ.get("FINANCE_SQL_LENTA_MS", instrumentacao.LIMITE_LENTA_MS)))
+    await _db(init_db)
+    _estado["reservas_id"] = await _db(garantir_reservas)
+    yield
+
+app = Starlette(routes=ROTAS, lifespan=_ciclo_de_vida)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=8600)
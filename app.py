@@ -1,59 +1,87 @@
 import streamlit as st
 import uuid
 import os
+import re
+import json
 from datetime import date, datetime
 from db import (
-    init_db, add_receita, get_total_receitas_mes,
-    salvar_sessao, carregar_sessao, limpar_sessao,
+    init_db, garantir_reservas, add_receita, get_total_receitas_mes,
     add_conta, get_contas,
     add_subconta, get_subcontas, delete_subconta, pode_excluir_subconta,
-    salvar_valor_subconta, get_saldos_mes, registrar_gasto,
-    registrar_transferencia,
-    registrar_emprestimo, listar_emprestimos, listar_parcelas, quitar_parcela
+    salvar_valor_subconta, resumo_saldos_mes, saldos_mes_pagina, registrar_gasto,
+    registrar_transferencia, totais_por_mes, totais_por_subconta, fechar_meses_pendentes,
+    registrar_emprestimo, resumo_emprestimos, listar_parcelas, quitar_parcelas,
+    candidatos_antecipacao, otimizar_quitacoes, quitar_com_reservas, saldo_reservas,
+    excluir_emprestimo, simular_quitacao_antecipada, historico_gastos, historico_transferencias,
+    buscar
 )
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-import io
-from reportlab.lib.enums import TA_LEFT
+from importacao import ler_extrato, importar_extrato
+from formatacao import brl
+import instrumentacao
+from conexao import sincronizar_versao
+from sessoes import autenticar, criar_sessao, validar_sessao, encerrar_sessao, DURACAO_SESSAO
+from relatorio import solicitar_pdf_mensal, solicitar_pdf_periodo
+from datas import mes_chave, intervalo_mes, somar_meses
 
 # =========================================================
-# LOGIN CONFIG
+# INIT (uma vez por processo: schema, Reservas e aquecimento do cache)
 # =========================================================
-USERNAME = os.environ.get("APP_USER", "")
-PASSWORD = os.environ.get("APP_PASS", "")
+# FINANCE_DEBUG=1 liga a medição das consultas SQL e o painel na barra lateral
+DEBUG = os.environ.get("FINANCE_DEBUG", "") not in ("", "0")
 
-# =========================================================
-# INIT
-# =========================================================
-init_db()
+@st.cache_resource(show_spinner=False)
+def inicializar():
+    if DEBUG:
+        instrumentacao.ativar(float(os.environ.get("FINANCE_SQL_LENTA_MS", instrumentacao.LIMITE_LENTA_MS)))
+    init_db()
+    reservas_id = garantir_reservas()
+    get_contas()
+    get_subcontas()
+    resumo_saldos_mes(date.today().strftime("%m/%Y"))
+    return reservas_id
 
-if "logged_in" not in st.session_state:
-    token = carregar_sessao()
-    if token:
-        st.session_state.logged_in = True
-        st.session_state.page = "dashboard"
-    else:
-        st.session_state.logged_in = False
-        st.session_state.page = "login"
+RESERVAS_ID = inicializar()
+# Uma leitura da versão dos dados por rerun: traz as escritas feitas por
+# outros processos; o resto do rerun consulta o cache sem ir ao banco
+sincronizar_versao()
+
+# O token fica em st.session_state e num cookie, então recarregar a página
+# mantém o login sem expor o token na URL (histórico, Referer, logs). Links
+# antigos com ?sessao= ainda entram, mas o parâmetro sai da URL na primeira
+# carga. A validação a cada rerun sai do cache em memória de sessoes.py.
+COOKIE_SESSAO = "sessao"
+
+def gravar_cookie_sessao(token, duracao):
+    # st.context.cookies só lê (e só na abertura da sessão); quem grava é o navegador
+    st.html(f"""<script>
+    document.cookie = "{COOKIE_SESSAO}=" + {json.dumps(token)} + "; path=/; max-age={duracao}; SameSite=Strict"
+        + (location.protocol === "https:" ? "; Secure" : "");
+    </script>""", unsafe_allow_javascript=True)
+
+if "sessao" in st.query_params:
+    st.session_state.sessao = st.query_params["sessao"]
+    st.session_state.gravar_cookie = True
+    del st.query_params["sessao"]
+if "sessao" not in st.session_state:
+    st.session_state.sessao = st.context.cookies.get(COOKIE_SESSAO)
+usuario = validar_sessao(st.session_state.sessao)
+if st.session_state.get("logged_in") and not usuario:
+    # Sessão expirou ou foi encerrada
+    st.session_state.page = "login"
+st.session_state.logged_in = usuario is not None
+st.session_state.usuario = usuario
 if "page" not in st.session_state:
     st.session_state.page = "login" if not st.session_state.logged_in else "dashboard"
 if "gasto_info" not in st.session_state:
     st.session_state.gasto_info = None
-if "ultimo_mes" not in st.session_state:
-    st.session_state.ultimo_mes = date.today().strftime("%m/%Y")
 if "emprestimo_detalhe" not in st.session_state:
     st.session_state.emprestimo_detalhe = None
 if "confirmar_quitacao" not in st.session_state:
-    st.session_state.confirmar_quitacao = None  # (pid, valor, valor_orig)
+    st.session_state.confirmar_quitacao = None  # [(pid, valor, valor_orig)]
 
 # =========================================================
 # HELPERS
 # =========================================================
-def brl(v: float) -> str:
-    return f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
 def date_br_input(label: str, key=None, default=None):
     if default is None:
         default = date.today()
@@ -65,45 +93,28 @@ def date_br_input(label: str, key=None, default=None):
         st.warning("Use o formato DD/MM/AAAA")
         return None, val_str, True
 
-# =========================================================
-# RESERVAS - Garantir existência
-# =========================================================
-def garantir_reservas():
-    contas = get_contas()
-    conta_dict = {nome: cid for cid, nome in contas}
-    if "Sistema" not in conta_dict:
-        add_conta("Sistema")
-        contas = get_contas()
-        conta_dict = {nome: cid for cid, nome in contas}
-    subcontas = get_subcontas()
-    nomes_sub = [s_nome for _, s_nome, _ in subcontas]
-    if "Reservas" not in nomes_sub:
-        add_subconta("Reservas", conta_dict["Sistema"])
-
-garantir_reservas()
+MESES = {
+    "Janeiro": "01",
+    "Fevereiro": "02",
+    "Março": "03",
+    "Abril": "04",
+    "Maio": "05",
+    "Junho": "06",
+    "Julho": "07",
+    "Agosto": "08",
+    "Setembro": "09",
+    "Outubro": "10",
+    "Novembro": "11",
+    "Dezembro": "12",
+}
 
 # =========================================================
 # FECHAMENTO DE MÊS
 # =========================================================
+@st.cache_resource(show_spinner=False)
 def fechamento_mes(ano_mes_atual):
-    ultimo = st.session_state.ultimo_mes
-    if ano_mes_atual != ultimo:
-        sobras = get_saldos_mes(ultimo)
-        reservas = [s for s in get_subcontas() if s[1] == "Reservas"]
-        if reservas:
-            reservas_id = reservas[0][0]
-            hoje = date.today().strftime("%d/%m/%Y")
-            for sid, conta_nome, sub_nome, inicial, atual in sobras:
-                if atual > 0 and sub_nome != "Reservas":
-                    registrar_transferencia(
-                        hoje,
-                        sid,
-                        reservas_id,
-                        atual,
-                        f"Sobra automática de {ultimo}",
-                        ultimo
-                    )
-        st.session_state.ultimo_mes = ano_mes_atual
+    # Roda uma vez por processo a cada mês; os meses fechados ficam no banco
+    return fechar_meses_pendentes(ano_mes_atual, RESERVAS_ID)
 
 # =========================================================
 # CSS
@@ -203,6 +214,38 @@ div[data-testid="column"] div.stButton > button:hover {
 # =========================================================
 # DASHBOARD
 # =========================================================
+SUBCONTAS_POR_PAGINA = 12
+ORDENS_GRADE = {
+    "Nome": "nome",
+    "Maior saldo": "maior_saldo",
+    "Menor saldo": "menor_saldo",
+    "Mais usado (%)": "mais_usado",
+    "Menos usado (%)": "menos_usado",
+}
+
+def previsao_saldos(ano_mes):
+    # previsao (e o NumPy) só é importado quando a previsão é aberta
+    with st.expander("📈 Previsão de saldos"):
+        if not st.toggle("Mostrar previsão", key="mostrar_previsao"):
+            return
+        from previsao import prever_saldos, HORIZONTE_MIN, HORIZONTE_MAX, JANELA_HISTORICO
+
+        coluna1, coluna2 = st.columns([1, 2])
+        with coluna1:
+            horizonte = st.slider("Meses à frente", HORIZONTE_MIN, HORIZONTE_MAX, HORIZONTE_MIN, step=6)
+        nomes = {sid: f"{c_nome} / {s_nome}" for sid, s_nome, c_nome in get_subcontas()}
+        with coluna2:
+            escolhidas = st.multiselect("Subcontas", list(nomes.values()), max_selections=8)
+        meses, subcontas, saldos, total = prever_saldos(ano_mes, horizonte, reservas_id=RESERVAS_ID)
+        # AAAA-MM para o eixo ordenar cronologicamente
+        grafico = {"Mês": [f"{m[3:]}-{m[:2]}" for m in meses], "Total": total.round(2)}
+        for i, sid in enumerate(subcontas):
+            if nomes.get(sid) in escolhidas:
+                grafico[nomes[sid]] = saldos[i].round(2)
+        st.line_chart(grafico, x="Mês")
+        st.caption(f"Saldo total previsto em {meses[-1]}: {brl(float(total[-1]))}. Por subconta: média dos "
+                   f"últimos {JANELA_HISTORICO} meses fechados; total inclui as parcelas de empréstimo em aberto.")
+
 def dashboard():
     hoje = date.today()
     ano_mes = hoje.strftime("%m/%Y")
@@ -212,9 +255,7 @@ def dashboard():
     col_sair, col_titulo = st.columns([1, 6])
     with col_sair:
         if st.button("🚪 Sair", key="btn_sair", help="Encerrar sessão"):
-            st.session_state.logged_in = False
-            st.session_state.page = "login"
-            st.rerun()
+            sair()
     with col_titulo:
         st.title("📊 Dashboard Financeiro")
 
@@ -222,9 +263,7 @@ def dashboard():
     st.caption(f"📅 Data/Hora atual: {agora}")
 
     total_receitas = get_total_receitas_mes(ano_mes)
-    saldos = get_saldos_mes(ano_mes)
-    total_atribuido = sum(s[3] for s in saldos) if saldos else 0
-    saldo_atual = sum(s[4] for s in saldos) if saldos else 0
+    _, total_atribuido, saldo_atual = resumo_saldos_mes(ano_mes)
 
     c1, c2, c3 = st.columns(3)
     c1.metric("Saldo Atual", brl(saldo_atual))
@@ -232,9 +271,8 @@ def dashboard():
     c3.metric("Valor distribuído", brl(total_atribuido))
 
     # Card de Reservas fixo
-    saldos_reserva = [s for s in saldos if s[2] == "Reservas"]
-    if saldos_reserva:
-        sid, c_nome, s_nome, inicial, atual = saldos_reserva[0]
+    tem_reserva, _, atual = resumo_saldos_mes(ano_mes, subconta_id=RESERVAS_ID)
+    if tem_reserva:
         st.markdown(f"""
         <div style='
             position: fixed; top: 100px; right: 40px;
@@ -247,7 +285,7 @@ def dashboard():
             font-weight: bold; color: #1e3a8a;
             z-index: 999;
         '>
-            <div style="font-size:18px;">💰 {s_nome}</div>
+            <div style="font-size:18px;">💰 Reservas</div>
             <div style="font-size:16px;">{brl(atual)}</div>
         </div>
         """, unsafe_allow_html=True)
@@ -263,19 +301,33 @@ def dashboard():
             salvar = st.form_submit_button("Salvar")
             if salvar:
                 if not err and valor > 0:
-                    if valor > atual:
-                        st.error("Saldo insuficiente para registrar este gasto.")
-                    else:
-                        registrar_gasto(data_str, valor, desc, sid, am)
+                    if registrar_gasto(data_str, valor, desc, sid, am):
                         st.success("Gasto registrado!")
                         st.session_state.gasto_info = None
                         st.rerun()
+                    else:
+                        st.error("Saldo insuficiente para registrar este gasto.")
         if st.button("Fechar"):
             st.session_state.gasto_info = None
             st.rerun()
 
     st.subheader("📌 Subcontas")
-    saldos_normais = [s for s in saldos if s[2] != "Reservas"]
+    contas = {nome: cid for cid, nome in get_contas()}
+    coluna1, coluna2 = st.columns(2)
+    with coluna1:
+        conta = st.selectbox("Conta", ["Todas"] + list(contas), key="grade_conta")
+    with coluna2:
+        ordem = ORDENS_GRADE[st.selectbox("Ordenar por", list(ORDENS_GRADE), key="grade_ordem")]
+    conta_id = contas.get(conta)
+
+    # Só a página visível vem do banco; filtro novo volta à primeira página
+    qtd, _, _ = resumo_saldos_mes(ano_mes, conta_id=conta_id, excluir_id=RESERVAS_ID)
+    paginas = max(1, -(-qtd // SUBCONTAS_POR_PAGINA))
+    if st.session_state.get("grade_filtros") != (conta_id, ordem):
+        st.session_state.grade_filtros = (conta_id, ordem)
+        st.session_state.grade_pagina = 1
+    pagina = min(st.session_state.grade_pagina, paginas)
+    saldos_normais = saldos_mes_pagina(ano_mes, conta_id, ordem, pagina, SUBCONTAS_POR_PAGINA, RESERVAS_ID)
     if saldos_normais:
         for i in range(0, len(saldos_normais), 3):
             cols = st.columns(3)
@@ -289,9 +341,23 @@ def dashboard():
                             st.session_state.gasto_info = (sid, c_nome, s_nome, atual, ano_mes)
                             st.rerun()
                         st.markdown('</div>', unsafe_allow_html=True)
+        if paginas > 1:
+            coluna1, coluna2, coluna3 = st.columns([1, 2, 1])
+            with coluna1:
+                if pagina > 1 and st.button("⬅️ Anterior", key="grade_anterior"):
+                    st.session_state.grade_pagina = pagina - 1
+                    st.rerun()
+            with coluna2:
+                st.caption(f"Página {pagina} de {paginas} · {qtd} subcontas")
+            with coluna3:
+                if pagina < paginas and st.button("Próxima ➡️", key="grade_proxima"):
+                    st.session_state.grade_pagina = pagina + 1
+                    st.rerun()
     else:
         st.info("Nenhuma subconta cadastrada.")
 
+    previsao_saldos(ano_mes)
+
     # Ações rápidas
     st.subheader("⚡ Ações rápidas")
     botoes = [
@@ -302,33 +368,23 @@ def dashboard():
         ("💵", "Atribuir Valores", "atribuir"),
         ("🔄", "Transferir Saldo", "transferencia"),
         ("💳", "Empréstimos", "emprestimos"),
-        ("📊", "Relatório Mensal", "relatorio"),
+        ("📊", "Relatórios", "relatorio"),
+        ("📥", "Importar Extrato", "importar"),
+        ("🧾", "Histórico", "historico"),
+        ("🔎", "Buscar", "busca"),
+        ("📈", "Análises", "analises"),
         ("🚪", "Sair", "sair"),
     ]
-    cols = st.columns(4)
-    for (icone, texto, destino), col in zip(botoes[:4], cols):
-        with col:
-            if st.button(f"{icone}\n{texto}", key=f"quick_{destino}"):
-                if destino == "sair":
-                    limpar_sessao()
-                    st.session_state.logged_in = False
-                    st.session_state.page = "login"
-                    st.rerun()
-                else:
-                    st.session_state.page = destino
-                    st.rerun()
-    cols = st.columns(4)
-    for (icone, texto, destino), col in zip(botoes[4:], cols):
-        with col:
-            if st.button(f"{icone}\n{texto}", key=f"quick_{destino}"):
-                if destino == "sair":
-                    limpar_sessao()
-                    st.session_state.logged_in = False
-                    st.session_state.page = "login"
-                    st.rerun()
-                else:
-                    st.session_state.page = destino
-                    st.rerun()
+    for i in range(0, len(botoes), 4):
+        cols = st.columns(4)
+        for (icone, texto, destino), col in zip(botoes[i:i+4], cols):
+            with col:
+                if st.button(f"{icone}\n{texto}", key=f"quick_{destino}"):
+                    if destino == "sair":
+                        sair()
+                    else:
+                        st.session_state.page = destino
+                        st.rerun()
 
 # =========================================================
 # PÁGINAS DE OPERAÇÕES (contas, subcontas, etc.)
@@ -343,8 +399,10 @@ def registrar_receita():
         submitted = st.form_submit_button("Salvar Receita")
         if submitted:
             if not err and valor > 0 and origem.strip():
-                add_receita(data_str, origem.strip(), valor, descricao)
+                quitadas, total_quitado = add_receita(data_str, origem.strip(), valor, descricao)
                 st.success(f"Receita registrada em {data_str}!")
+                if quitadas:
+                    st.info(f"{quitadas} parcela(s) de empréstimo quitada(s) automaticamente: {brl(total_quitado)}")
             else:
                 st.error("Preencha corretamente.")
     if st.button("Voltar"):
@@ -394,7 +452,7 @@ def apagar_subconta():
         if st.button("Voltar"):
             st.session_state.page = "dashboard"; st.rerun()
         return
-    sub_dict = {f"{c_nome} / {s_nome}": sid for sid, s_nome, c_nome in subcontas if s_nome != "Reservas"}
+    sub_dict = {f"{c_nome} / {s_nome}": sid for sid, s_nome, c_nome in subcontas if sid != RESERVAS_ID}
     if not sub_dict:
         st.info("Nenhuma subconta excluível disponível.")
         if st.button("Voltar"):
@@ -414,7 +472,7 @@ def atribuir_valores():
     st.title("💵 Atribuir Valores")
     hoje = date.today()
     ano_mes = hoje.strftime("%m/%Y")
-    subcontas = [s for s in get_subcontas() if s[1] != "Reservas"]
+    subcontas = [s for s in get_subcontas() if s[0] != RESERVAS_ID]
     total_receitas = get_total_receitas_mes(ano_mes)
     st.info(f"Receita total do mês {ano_mes}: {brl(total_receitas)}")
     if not subcontas:
@@ -462,30 +520,89 @@ def transferir_saldo():
                 st.error("Origem e destino não podem ser iguais.")
             elif valor <= 0:
                 st.error("O valor deve ser positivo.")
+            elif not justificativa.strip():
+                st.error("Informe uma justificativa.")
+            elif registrar_transferencia(
+                hoje.strftime("%d/%m/%Y"),
+                sub_dict[origem],
+                sub_dict[destino],
+                valor,
+                justificativa,
+                ano_mes
+            ):
+                st.success("Transferência realizada!")
             else:
-                saldos = get_saldos_mes(ano_mes)
-                saldo_origem = [s for s in saldos if s[0] == sub_dict[origem]]
-                saldo_origem = saldo_origem[0][4] if saldo_origem else 0
-                if valor > saldo_origem:
-                    st.error("Saldo insuficiente.")
-                elif not justificativa.strip():
-                    st.error("Informe uma justificativa.")
-                else:
-                    registrar_transferencia(
-                        hoje.strftime("%d/%m/%Y"),
-                        sub_dict[origem],
-                        sub_dict[destino],
-                        valor,
-                        justificativa,
-                        ano_mes
-                    )
-                    st.success("Transferência realizada!")
+                st.error("Saldo insuficiente.")
     if st.button("Voltar"):
         st.session_state.page = "dashboard"; st.rerun()
 
 # =========================================================
 # PÁGINA DE EMPRÉSTIMOS
 # =========================================================
+def _status_parcela(valor_orig, valor_quitado, data_q):
+    if not valor_quitado:
+        return "🔴 Em aberto"
+    if valor_quitado < valor_orig:
+        return f"🔵 Quitada antecipada: {brl(valor_quitado)} em {data_q}"
+    return f"🟢 Quitada: {brl(valor_quitado)} em {data_q}"
+
+def otimizador_quitacao():
+    # Sugere quais parcelas antecipar com o saldo da Reservas; só monta a
+    # grade de taxas (uma linha por contrato) quando aberto
+    st.subheader("🎯 Otimizar quitação antecipada")
+    if not st.toggle("Mostrar otimizador", key="mostrar_otimizador"):
+        return
+    hoje = date.today()
+    ano_mes = hoje.strftime("%m/%Y")
+    disponivel = saldo_reservas(ano_mes, RESERVAS_ID)
+    with st.form("otimizador"):
+        orcamento = st.number_input("Orçamento (saldo da Reservas)", min_value=0.0, step=100.0,
+                                    value=float(max(disponivel, 0)))
+        contratos = {}
+        for pid, eid, inst, contrato, mes, valor, taxa in candidatos_antecipacao(ano_mes):
+            contratos.setdefault(eid, {"id": eid, "Contrato": f"{inst} · {contrato}", "Taxa (% a.m.)": taxa * 100})
+        st.caption("Desconto por contrato: juros compostos pela taxa mensal (padrão: a do contrato).")
+        regras = st.data_editor(
+            list(contratos.values()),
+            column_config={"id": None,
+                           "Taxa (% a.m.)": st.column_config.NumberColumn(min_value=0.0, step=0.01, format="%.4f")},
+            disabled=["Contrato"], hide_index=True, use_container_width=True, key="otimizador_taxas",
+        )
+        calcular = st.form_submit_button("Calcular")
+    if calcular:
+        taxas = {r["id"]: (r["Taxa (% a.m.)"] or 0) / 100 for r in regras}
+        st.session_state.plano_quitacao = otimizar_quitacoes(ano_mes, orcamento, taxas)
+
+    plano = st.session_state.get("plano_quitacao")
+    if not plano:
+        return
+    selecionadas, custo, economia, metodo = plano
+    if not selecionadas:
+        st.info("Nenhuma parcela com desconto cabe no orçamento.")
+        return
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Parcelas", len(selecionadas))
+    c2.metric("A pagar hoje", brl(custo))
+    c3.metric("Economia", brl(economia))
+    st.dataframe(
+        [{"Contrato": f"{inst} · {contrato}", "Mês/Ano": mes, "Valor Original": valor,
+          "Valor Presente": vp, "Desconto": desconto}
+         for pid, eid, inst, contrato, mes, valor, vp, desconto in selecionadas],
+        hide_index=True, use_container_width=True,
+    )
+    if st.button("✅ Quitar estas parcelas com a Reservas"):
+        try:
+            qtd = quitar_com_reservas([(s[0], s[6]) for s in selecionadas], hoje.strftime("%d/%m/%Y"),
+                                      RESERVAS_ID, ano_mes)
+        except ValueError as erro:
+            st.error(str(erro))
+        else:
+            if qtd is None:
+                st.error("Saldo insuficiente na Reservas para este plano.")
+            else:
+                st.session_state.plano_quitacao = None
+                st.success(f"{qtd} parcela(s) quitada(s), economia de {brl(economia)}.")
+
 def emprestimos_page():
     st.title("💳 Empréstimos")
 
@@ -504,12 +621,15 @@ def emprestimos_page():
         parcelas = listar_parcelas(eid)
 
         if st.session_state.confirmar_quitacao:
-            pid, novo_valor, valor_orig = st.session_state.confirmar_quitacao
-            st.warning(f"Tem certeza que deseja confirmar a quitação antecipada desta parcela? Valor: {brl(novo_valor)} (original {brl(valor_orig)})")
+            quitacoes = st.session_state.confirmar_quitacao
+            total = sum(v for _, v, _ in quitacoes)
+            total_orig = sum(o for _, _, o in quitacoes)
+            st.warning(f"Tem certeza que deseja confirmar a quitação antecipada de {len(quitacoes)} parcela(s)? "
+                       f"Valor: {brl(total)} (original {brl(total_orig)})")
             if st.button("✅ Confirmar quitação antecipada"):
                 data_q = date.today().strftime("%d/%m/%Y")
-                quitar_parcela(pid, novo_valor, data_q)
-                st.success("Parcela quitada antecipadamente!")
+                qtd = quitar_parcelas([(pid, v) for pid, v, _ in quitacoes], data_q)
+                st.success(f"{qtd} parcela(s) quitada(s) antecipadamente!")
                 st.session_state.confirmar_quitacao = None
                 st.rerun()
             if st.button("❌ Cancelar"):
@@ -517,36 +637,52 @@ def emprestimos_page():
                 st.rerun()
             return
 
-        # Render tabela de parcelas
-        st.markdown("<table class='table-parcelas'><tr><th>Mês/Ano</th><th>Valor Original</th><th>Status</th><th>Ação</th></tr>", unsafe_allow_html=True)
-
-        for pid, mes_ano, valor_orig, valor_quitado, data_q in parcelas:
-            if valor_quitado:
-                if valor_quitado < valor_orig:
-                    row_class = "antecipada"
-                    status = f"Quitada antecipada: {brl(valor_quitado)} em {data_q}"
-                else:
-                    row_class = "quitada"
-                    status = f"Quitada: {brl(valor_quitado)} em {data_q}"
-                action = "-"
+        # Uma única grade editável: marca-se as parcelas e, se quiser, o valor
+        # de quitação (vazio = valor original); tudo é gravado de uma vez
+        tabela = [{"id": pid, "Mês/Ano": mes_ano, "Valor Original": valor_orig,
+                   "Status": _status_parcela(valor_orig, valor_quitado, data_q),
+                   "Quitar": False, "Valor quitação": None}
+                  for pid, mes_ano, valor_orig, valor_quitado, data_q in parcelas]
+        with st.form(f"quitacao_{eid}"):
+            editada = st.data_editor(
+                tabela,
+                column_config={
+                    "id": None,
+                    "Valor Original": st.column_config.NumberColumn(format="R$ %.2f"),
+                    "Valor quitação": st.column_config.NumberColumn(min_value=0.0, step=0.01, format="R$ %.2f"),
+                },
+                disabled=["Mês/Ano", "Valor Original", "Status"],
+                hide_index=True, use_container_width=True, key=f"parcelas_{eid}",
+            )
+            enviar = st.form_submit_button("Quitar parcelas marcadas")
+        if enviar:
+            abertas = {pid for pid, _, _, valor_quitado, _ in parcelas if not valor_quitado}
+            quitacoes = []
+            for linha in editada:
+                if not linha["Quitar"] or linha["id"] not in abertas:
+                    continue
+                original = linha["Valor Original"]
+                novo_valor = linha["Valor quitação"] or 0
+                quitacoes.append((linha["id"], novo_valor if 0 < novo_valor < original else original, original))
+            if not quitacoes:
+                st.error("Marque ao menos uma parcela em aberto.")
+            elif any(v < o for _, v, o in quitacoes):
+                st.session_state.confirmar_quitacao = quitacoes
+                st.rerun()
             else:
-                row_class = "aberta"
-                status = "Em aberto"
-                novo_valor = st.number_input(f"Valor quitação {mes_ano}", min_value=0.0, step=0.01, key=f"quit_{pid}")
-                if st.button(f"Quitar {mes_ano}", key=f"btn_quit_{pid}"):
-                    if novo_valor and novo_valor < valor_orig:
-                        st.session_state.confirmar_quitacao = (pid, novo_valor, valor_orig)
-                        st.rerun()
-                    else:
-                        data_q = date.today().strftime("%d/%m/%Y")
-                        quitar_parcela(pid, valor_orig, data_q)
-                        st.success("Parcela quitada!")
-                        st.rerun()
-                action = "⬅️ Botão acima"
-
-            st.markdown(f"<tr class='{row_class}'><td>{mes_ano}</td><td>{brl(valor_orig)}</td><td>{status}</td><td>{action}</td></tr>", unsafe_allow_html=True)
+                qtd = quitar_parcelas([(pid, v) for pid, v, _ in quitacoes], date.today().strftime("%d/%m/%Y"))
+                st.success(f"{qtd} parcela(s) quitada(s)!")
+                st.rerun()
 
-        st.markdown("</table>", unsafe_allow_html=True)
+        with st.expander("🧮 Simular quitação antecipada"):
+            qtd_antecipar = st.number_input("Parcelas a antecipar (a partir da última)", min_value=1, step=1, key="sim_qtd")
+            simulacao = simular_quitacao_antecipada(eid, date.today(), int(qtd_antecipar))
+            if simulacao:
+                total_orig = sum(s[2] for s in simulacao)
+                total_vp = sum(s[3] for s in simulacao)
+                st.write(f"Valor original: {brl(total_orig)} · A pagar hoje: {brl(total_vp)} · Desconto: {brl(total_orig - total_vp)}")
+            else:
+                st.info("Nenhuma parcela em aberto.")
 
         if st.button("Voltar"):
             st.session_state.emprestimo_detalhe = None
@@ -580,31 +716,32 @@ def emprestimos_page():
             tipo = st.text_input("Tipo de Empréstimo")
             primeira_parcela = st.text_input("Primeira Parcela (MM/AAAA)")
             qtd = st.number_input("Quantidade de Parcelas", min_value=1, step=1)
-            valor = st.number_input("Valor da Parcela", min_value=0.0, step=0.01)
+            sistemas = {"Parcela fixa": "FIXO", "Tabela Price": "PRICE", "SAC": "SAC"}
+            sistema = sistemas[st.selectbox("Sistema de Amortização", list(sistemas.keys()))]
+            valor = st.number_input("Valor da Parcela (parcela fixa)", min_value=0.0, step=0.01)
+            financiado = st.number_input("Valor Financiado (Price/SAC)", min_value=0.0, step=0.01)
+            taxa = st.number_input("Taxa de Juros (% a.m.)", min_value=0.0, step=0.01, format="%.4f")
             submitted = st.form_submit_button("Cadastrar")
             if submitted:
-                if instituicao and contrato and tipo and primeira_parcela and qtd > 0 and valor > 0:
-                    registrar_emprestimo(instituicao, contrato, tipo, primeira_parcela, int(qtd), valor)
+                valores_ok = valor > 0 if sistema == "FIXO" else financiado > 0
+                if instituicao and contrato and tipo and primeira_parcela and qtd > 0 and valores_ok:
+                    registrar_emprestimo(instituicao, contrato, tipo, primeira_parcela, int(qtd), valor,
+                                         sistema=sistema, taxa_juros=taxa / 100,
+                                         valor_financiado=financiado if sistema != "FIXO" else None)
                     st.success("Empréstimo registrado!")
                     st.rerun()
                 else:
                     st.error("Preencha todos os campos corretamente.")
 
         st.subheader("📋 Empréstimos Registrados")
-        emprestimos = listar_emprestimos()
-
-        # Ocultar empréstimos plenamente quitados
-        emprestimos_ativos = []
-        for eid, inst, contrato, tipo, qtd, valor, economia in emprestimos:
-            parcelas = listar_parcelas(eid)
-            todas_quitadas = all(p[3] is not None for p in parcelas)
-            if not todas_quitadas:  # só mostra se ainda tem parcelas abertas
-                emprestimos_ativos.append((eid, inst, contrato, tipo, qtd, valor, economia))
+        # Só empréstimos com parcelas em aberto (filtrado na própria consulta)
+        emprestimos_ativos = resumo_emprestimos(apenas_ativos=True)
 
         if emprestimos_ativos:
             for i in range(0, len(emprestimos_ativos), 3):
                 cols = st.columns(3, gap="large")
-                for col, (eid, inst, contrato, tipo, qtd, valor, economia) in zip(cols, emprestimos_ativos[i:i+3]):
+                for col, (eid, inst, contrato, tipo, qtd, valor, economia,
+                          abertas, quitadas, proximo, saldo_devedor) in zip(cols, emprestimos_ativos[i:i+3]):
                     with col:
                         card_html = f"""
                         <div style="
@@ -619,8 +756,10 @@ def emprestimos_page():
                             <p><b>💳 Instituição:</b> {inst}</p>
                             <p><b>📑 Contrato:</b> {contrato}</p>
                             <p><b>🏷️ Tipo:</b> {tipo}</p>
-                            <p><b>📅 Parcelas:</b> {qtd}</p>
+                            <p><b>📅 Parcelas:</b> {quitadas}/{qtd} quitadas</p>
                             <p><b>💰 Valor da Parcela:</b> {brl(valor)}</p>
+                            <p><b>📆 Próximo vencimento:</b> {proximo}</p>
+                            <p><b>💸 Saldo devedor:</b> {brl(saldo_devedor)}</p>
                         </div>
                         """
                         if st.button("Selecionar", key=f"emp_{eid}", use_container_width=True):
@@ -630,11 +769,226 @@ def emprestimos_page():
         else:
             st.info("Nenhum empréstimo ativo no momento.")
 
+        otimizador_quitacao()
+
+# =========================================================
+# IMPORTAÇÃO DE EXTRATOS
+# =========================================================
+def importar_extrato_page():
+    st.title("📥 Importar Extrato")
+    if st.button("⬅️ Voltar para o Dashboard"):
+        st.session_state.page = "dashboard"
+        st.rerun()
+
+    subcontas = get_subcontas()
+    sub_dict = {f"{c_nome} / {s_nome}": sid for sid, s_nome, c_nome in subcontas}
+    arquivo = st.file_uploader("Arquivo do extrato (CSV ou OFX)", type=["csv", "ofx", "qfx"])
+    encoding = st.selectbox("Codificação", ["utf-8-sig", "latin-1"])
+    st.caption("Créditos viram receitas; débitos viram gastos na subconta da primeira regra que casar com a descrição.")
+    regras = st.data_editor(
+        [{"Trecho da descrição": "", "Subconta": None}],
+        num_rows="dynamic",
+        column_config={"Subconta": st.column_config.SelectboxColumn(options=list(sub_dict.keys()))},
+        key="regras_importacao",
+    )
+    padrao = st.selectbox("Subconta para débitos sem regra", ["(nenhuma)"] + list(sub_dict.keys()))
+
+    if arquivo and st.button("Importar"):
+        regras = [(r["Trecho da descrição"] or "", sub_dict[r["Subconta"]])
+                  for r in regras if r.get("Subconta") in sub_dict]
+        barra = st.progress(0.0)
+        status = st.empty()
+
+        def progresso(processados):
+            barra.progress(min(arquivo.tell() / max(arquivo.size, 1), 1.0))
+            status.caption(f"{processados} lançamentos importados...")
+
+        try:
+            receitas, gastos, quitadas, total_quitado = importar_extrato(
+                ler_extrato(arquivo, arquivo.name, encoding), regras,
+                subconta_padrao=sub_dict.get(padrao), origem=f"Extrato {arquivo.name}",
+                progresso=progresso,
+            )
+        except (ValueError, KeyError) as e:
+            st.error(f"Não foi possível ler o extrato: {e}")
+        else:
+            barra.progress(1.0)
+            st.success(f"{receitas} receitas e {gastos} gastos importados.")
+            if quitadas:
+                st.info(f"{quitadas} parcela(s) de empréstimo quitada(s) automaticamente: {brl(total_quitado)}")
+
+# =========================================================
+# HISTÓRICO DE GASTOS E TRANSFERÊNCIAS
+# =========================================================
+def historico_page():
+    st.title("🧾 Histórico")
+    if st.button("⬅️ Voltar para o Dashboard"):
+        st.session_state.page = "dashboard"
+        st.rerun()
+
+    nomes = {sid: f"{c_nome} / {s_nome}" for sid, s_nome, c_nome in get_subcontas()}
+    coluna1, coluna2 = st.columns(2)
+    with coluna1:
+        tipo = st.radio("Lançamentos", ["Gastos", "Transferências"], horizontal=True)
+    with coluna2:
+        escolha = st.selectbox("Subconta", ["Todas"] + list(nomes.values()))
+    subconta_id = next((sid for sid, nome in nomes.items() if nome == escolha), None)
+
+    filtro = st.radio("Período", ["Mês", "Intervalo de datas", "Tudo"], horizontal=True)
+    data_inicio = data_fim = None
+    if filtro == "Mês":
+        coluna1, coluna2 = st.columns(2)
+        hoje = date.today()
+        with coluna1:
+            mes = MESES[st.selectbox("Mês", list(MESES.keys()), index=hoje.month - 1)]
+        with coluna2:
+            anos = list(range(2025, hoje.year + 2))
+            ano = st.selectbox("Ano", anos, index=anos.index(hoje.year) if hoje.year in anos else 0)
+        data_inicio, data_fim = intervalo_mes(f"{mes}/{ano}")
+    elif filtro == "Intervalo de datas":
+        coluna1, coluna2 = st.columns(2)
+        with coluna1:
+            d_ini, _, err_ini = date_br_input("De", key="hist_de", default=date.today().replace(day=1))
+        with coluna2:
+            d_fim, _, err_fim = date_br_input("Até", key="hist_ate")
+        if err_ini or err_fim:
+            return
+        data_inicio, data_fim = d_ini, d_fim
+
+    coluna1, coluna2 = st.columns(2)
+    with coluna1:
+        valor_min = st.number_input("Valor mínimo", min_value=0.0, step=10.0)
+    with coluna2:
+        valor_max = st.number_input("Valor máximo (0 = sem limite)", min_value=0.0, step=10.0)
+    filtros = (tipo, subconta_id, str(data_inicio), str(data_fim), valor_min, valor_max)
+
+    # Pilha com a chave de início de cada página visitada; filtros novos voltam à primeira
+    if st.session_state.get("historico_filtros") != filtros:
+        st.session_state.historico_filtros = filtros
+        st.session_state.historico_paginas = [None]
+    paginas = st.session_state.historico_paginas
+
+    consulta = historico_gastos if tipo == "Gastos" else historico_transferencias
+    linhas, proximo = consulta(subconta_id, data_inicio, data_fim, valor_min or None, valor_max or None,
+                               apos=paginas[-1])
+    if not linhas:
+        st.info("Nenhum lançamento encontrado.")
+    elif tipo == "Gastos":
+        st.dataframe(
+            [{"Data": d, "Valor": v, "Descrição": desc, "Subconta": nomes.get(sid, sid), "Mês": m}
+             for gid, d, v, desc, sid, m in linhas],
+            hide_index=True, use_container_width=True,
+        )
+    else:
+        st.dataframe(
+            [{"Data": d, "Origem": nomes.get(o, o), "Destino": nomes.get(de, de), "Valor": v,
+              "Justificativa": j, "Mês": m}
+             for tid, d, o, de, v, j, m in linhas],
+            hide_index=True, use_container_width=True,
+        )
+
+    coluna1, coluna2, coluna3 = st.columns([1, 2, 1])
+    with coluna1:
+        if len(paginas) > 1 and st.button("⬅️ Anterior"):
+            paginas.pop()
+            st.rerun()
+    with coluna2:
+        st.caption(f"Página {len(paginas)}")
+    with coluna3:
+        if proximo and st.button("Próxima ➡️"):
+            paginas.append(proximo)
+            st.rerun()
+
+# =========================================================
+# BUSCA
+# =========================================================
+TIPOS_BUSCA = {"receitas": "Receita", "gastos": "Gasto", "transferencias": "Transferência",
+               "emprestimos": "Empréstimo"}
+_MARCADOR = ("\x02", "\x03")
+
+def _destacar(texto):
+    # Escapa o markdown do texto e troca os marcadores da busca por negrito
+    texto = re.sub(r"([\\`*_{}\[\]()#+\-.!|~<>$])", r"\\\1", texto)
+    return texto.replace(_MARCADOR[0], "**").replace(_MARCADOR[1], "**")
+
+def busca_page():
+    st.title("🔎 Buscar")
+    if st.button("⬅️ Voltar para o Dashboard"):
+        st.session_state.page = "dashboard"
+        st.rerun()
+
+    texto = st.text_input("Buscar por", placeholder="mercado, farmácia, CT-0001...")
+    escolhidos = st.multiselect("Em", list(TIPOS_BUSCA.values()), default=list(TIPOS_BUSCA.values()))
+    if not texto.strip():
+        return
+    tabelas = tuple(t for t, nome in TIPOS_BUSCA.items() if nome in escolhidos)
+    resultados = buscar(texto, tabelas, marcador=_MARCADOR) if tabelas else []
+    if not resultados:
+        st.info("Nada encontrado.")
+        return
+
+    st.caption(f"{len(resultados)} resultado(s), mais relevantes primeiro")
+    for tabela, _, data, valor, principal, extra in resultados:
+        linha = f"**{TIPOS_BUSCA[tabela]}** · {data or '-'} · {brl(valor or 0)} — {_destacar(principal)}"
+        if extra:
+            linha += f" ({_destacar(extra)})"
+        st.markdown(linha)
+
+# =========================================================
+# ANÁLISES
+# =========================================================
+def _numero(valor):
+    # NaN (sem base de comparação) vira célula vazia
+    return None if valor != valor else round(float(valor), 2)
+
+def analises_page():
+    import numpy as np
+    from analise import analisar, JANELA_MEDIA
+
+    st.title("📈 Análises")
+    if st.button("⬅️ Voltar para o Dashboard"):
+        st.session_state.page = "dashboard"
+        st.rerun()
+
+    coluna1, coluna2, coluna3 = st.columns(3)
+    with coluna1:
+        qtd_meses = st.slider("Últimos meses", 6, 60, 12, step=6)
+    with coluna2:
+        janela = st.slider("Média móvel (meses)", 2, 12, JANELA_MEDIA)
+    with coluna3:
+        nivel = st.radio("Agrupar por", ["Subconta", "Conta"], horizontal=True)
+    mes_fim = mes_chave(date.today())
+    meses, linhas, ind = analisar(somar_meses(mes_fim, 1 - qtd_meses), mes_fim, nivel.lower(), janela)
+    if not linhas:
+        st.info("Nenhuma subconta cadastrada.")
+        return
+
+    # Resumo do mês atual para todas as linhas numa única tabela
+    st.subheader(f"Resumo de {meses[-1]}")
+    st.dataframe(
+        [{nivel: nome, "Planejado": _numero(ind["planejado"][i, -1]), "Gasto": _numero(ind["gasto"][i, -1]),
+          "Transferido": _numero(ind["transferido"][i, -1]),
+          f"Média {janela}m": _numero(ind["media_gasto"][i, -1]),
+          "Variação %": _numero(ind["variacao_gasto_pct"][i, -1]),
+          "Aderência %": _numero(ind["aderencia"][i, -1]),
+          f"Aderência {janela}m %": _numero(ind["media_aderencia"][i, -1])}
+         for i, (_, nome) in enumerate(linhas)],
+        hide_index=True, use_container_width=True,
+    )
+
+    st.subheader("Evolução")
+    nomes = [nome for _, nome in linhas]
+    i = nomes.index(st.selectbox(nivel, nomes))
+    eixo = [f"{m[3:]}-{m[:2]}" for m in meses]
+    st.line_chart({"Mês": eixo, "Planejado": ind["planejado"][i].round(2), "Gasto": ind["gasto"][i].round(2),
+                   f"Média {janela}m": ind["media_gasto"][i].round(2)}, x="Mês")
+    st.bar_chart({"Mês": eixo, "Aderência %": np.nan_to_num(ind["aderencia"][i]).round(1)}, x="Mês")
+
 # =========================================================
 # RELATÓRIO MENSAL
 # =========================================================
 def relatorio_mensal():
-    st.title("📊 Relatório Mensal")
+    st.title("📊 Relatórios")
 
     # Botão para voltar ao dashboard
     if st.button("⬅️ Voltar para o Dashboard"):
@@ -642,153 +996,138 @@ def relatorio_mensal():
         st.rerun()
 
     # Seleção de mês e ano
-    meses = {
-        "Janeiro": "01",
-        "Fevereiro": "02",
-        "Março": "03",
-        "Abril": "04",
-        "Maio": "05",
-        "Junho": "06",
-        "Julho": "07",
-        "Agosto": "08",
-        "Setembro": "09",
-        "Outubro": "10",
-        "Novembro": "11",
-        "Dezembro": "12",
-    }
+    meses = MESES
+    anos = list(range(2025, datetime.now().year + 2))
 
-    coluna1, coluna2 = st.columns(2)
-    with coluna1:
-        mes_nome = st.selectbox("Selecione o mês", list(meses.keys()))
-        mes = meses[mes_nome]
-    with coluna2:
-        ano = st.selectbox("Selecione o ano", list(range(2025, datetime.now().year + 2)))
-
-    ano_mes = f"{mes}/{ano}"
-    st.markdown(f"📅 Relatório de referência: **{mes_nome}/{ano}**")
-
-    # Botão para gerar relatório
-    if st.button("📄 Gerar Relatório em PDF"):
-        gerar_pdf_relatorio(ano_mes)
-
-def gerar_pdf_relatorio(ano_mes):
-    receitas_total = get_total_receitas_mes(ano_mes)
-    saldos = get_saldos_mes(ano_mes)
-    total_atribuido = sum(saldo[3] for saldo in saldos) if saldos else 0
-    saldo_atual = sum(saldo[4] for saldo in saldos) if saldos else 0
-
-    reservas = [saldo for saldo in saldos if saldo[2] == "Reservas"]
-    saldo_reservas = reservas[0][4] if reservas else 0
-
-    emprestimos = listar_emprestimos()
-
-    # Criar PDF em memória
-    buffer = io.BytesIO()
-    documento = SimpleDocTemplate(buffer, pagesize=A4)
-    elementos = []
-    estilos = getSampleStyleSheet()
-    estilos.add(ParagraphStyle(name="Titulo", fontSize=16, leading=20, spaceAfter=15, alignment=1))
-    estilos.add(ParagraphStyle(name="Subtitulo", fontSize=12, leading=14, spaceAfter=10, textColor=colors.HexColor("#4f46e5")))
-    estilos.add(ParagraphStyle(name="Texto", fontSize=10, leading=12))
-
-    # Cabeçalho
-    elementos.append(Paragraph("📊 Relatório Mensal de Orçamento e Finanças", estilos["Titulo"]))
-    elementos.append(Paragraph(f"Mês/Ano: {ano_mes}", estilos["Texto"]))
-    elementos.append(Spacer(1, 12))
-
-    # Resumo Executivo
-    elementos.append(Paragraph("Resumo Executivo", estilos["Subtitulo"]))
-    resumo_dados = [
-        [Paragraph("Receitas no mês", estilos["Texto"]), Paragraph(brl(receitas_total), estilos["Texto"])],
-        [Paragraph("Total atribuído em subcontas", estilos["Texto"]), Paragraph(brl(total_atribuido), estilos["Texto"])],
-        [Paragraph("Saldo atual consolidado", estilos["Texto"]), Paragraph(brl(saldo_atual), estilos["Texto"])],
-        [Paragraph("Saldo em Reservas", estilos["Texto"]), Paragraph(brl(saldo_reservas), estilos["Texto"])]
-    ]
-    tabela_resumo = Table(resumo_dados, colWidths=[250, 150])
-    tabela_resumo.setStyle(TableStyle([
-        ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
-        ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
-        ("VALIGN", (0,0), (-1,-1), "TOP"),
-    ]))
-    elementos.append(tabela_resumo)
-    elementos.append(Spacer(1, 18))
-
-    # Subcontas
-    elementos.append(Paragraph("Subcontas – Planejamento vs. Execução", estilos["Subtitulo"]))
-    dados_subcontas = [[
-        Paragraph("Subconta", estilos["Texto"]),
-        Paragraph("Planejado", estilos["Texto"]),
-        Paragraph("Gasto", estilos["Texto"]),
-        Paragraph("Saldo", estilos["Texto"])
-    ]]
-    for sid, conta, subconta, valor_inicial, valor_atual in saldos:
-        dados_subcontas.append([
-            Paragraph(f"{conta}/{subconta}", estilos["Texto"]),
-            Paragraph(brl(valor_inicial), estilos["Texto"]),
-            Paragraph(brl(valor_inicial - valor_atual), estilos["Texto"]),
-            Paragraph(brl(valor_atual), estilos["Texto"])
-        ])
-    tabela_subcontas = Table(dados_subcontas, colWidths=[200, 100, 100, 100])
-    tabela_subcontas.setStyle(TableStyle([
-        ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#dbeafe")),
-        ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
-        ("VALIGN", (0,0), (-1,-1), "TOP"),
-    ]))
-    elementos.append(tabela_subcontas)
-    elementos.append(Spacer(1, 18))
-
-    # Empréstimos (apenas com parcelas quitadas no mês)
-    elementos.append(Paragraph("Empréstimos", estilos["Subtitulo"]))
-    emprestimos_filtrados = []
-    for eid, instituicao, contrato, tipo, quantidade_parcelas, valor_parcela, economia in emprestimos:
-        parcelas = listar_parcelas(eid)
-        parcelas_quitadas_no_mes = [
-            (pid, mes_ano, valor_orig, valor_quitado, data_q)
-            for pid, mes_ano, valor_orig, valor_quitado, data_q in parcelas
-            if valor_quitado and data_q and data_q.endswith(ano_mes)  # ex: "15/01/2025".endswith("01/2025")
-        ]
-        if parcelas_quitadas_no_mes:
-            emprestimos_filtrados.append((instituicao, contrato, tipo, quantidade_parcelas, valor_parcela))
-
-    if emprestimos_filtrados:
-        dados_emprestimos = [[
-            Paragraph("Instituição", estilos["Texto"]),
-            Paragraph("Contrato", estilos["Texto"]),
-            Paragraph("Tipo", estilos["Texto"]),
-            Paragraph("Parcelas", estilos["Texto"]),
-            Paragraph("Valor Parcela", estilos["Texto"])
-        ]]
-        for instituicao, contrato, tipo, quantidade_parcelas, valor_parcela in emprestimos_filtrados:
-            dados_emprestimos.append([
-                Paragraph(instituicao, estilos["Texto"]),
-                Paragraph(contrato, estilos["Texto"]),
-                Paragraph(tipo, estilos["Texto"]),
-                Paragraph(str(quantidade_parcelas), estilos["Texto"]),
-                Paragraph(brl(valor_parcela), estilos["Texto"])
-            ])
-        tabela_emprestimos = Table(dados_emprestimos, colWidths=[100, 150, 100, 80, 100])
-        tabela_emprestimos.setStyle(TableStyle([
-            ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#fef3c7")),
-            ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
-            ("VALIGN", (0,0), (-1,-1), "TOP"),
-        ]))
-        elementos.append(tabela_emprestimos)
+    tipo = st.radio("Tipo de relatório", ["Mensal", "Anual", "Período"], horizontal=True)
+
+    if tipo == "Mensal":
+        coluna1, coluna2 = st.columns(2)
+        with coluna1:
+            mes_nome = st.selectbox("Selecione o mês", list(meses.keys()))
+            mes = meses[mes_nome]
+        with coluna2:
+            ano = st.selectbox("Selecione o ano", anos)
+
+        ano_mes = f"{mes}/{ano}"
+        st.markdown(f"📅 Relatório de referência: **{mes_nome}/{ano}**")
+
+        # Botão para gerar relatório (a geração roda em segundo plano)
+        if st.button("📄 Gerar Relatório em PDF"):
+            st.session_state.relatorio_pedido = (ano_mes, solicitar_pdf_mensal(ano_mes, RESERVAS_ID))
+        pedido = st.session_state.get("relatorio_pedido")
+        if pedido and pedido[0] == ano_mes:
+            gerar_pdf_relatorio(*pedido)
+        return
+
+    if tipo == "Anual":
+        ano = st.selectbox("Selecione o ano", anos)
+        inicio, fim = f"01/{ano}", f"12/{ano}"
     else:
-        elementos.append(Paragraph("Nenhum empréstimo com parcelas quitadas neste mês.", estilos["Texto"]))
+        coluna1, coluna2, coluna3, coluna4 = st.columns(4)
+        with coluna1:
+            mes_ini = meses[st.selectbox("Mês inicial", list(meses.keys()))]
+        with coluna2:
+            ano_ini = st.selectbox("Ano inicial", anos)
+        with coluna3:
+            mes_fim = meses[st.selectbox("Mês final", list(meses.keys()), index=11)]
+        with coluna4:
+            ano_fim = st.selectbox("Ano final", anos, index=len(anos) - 1)
+        inicio, fim = f"{mes_ini}/{ano_ini}", f"{mes_fim}/{ano_fim}"
+        if mes_chave(inicio) > mes_chave(fim):
+            st.error("O mês inicial deve ser anterior ao final.")
+            return
+
+    st.markdown(f"📅 Período: **{inicio} a {fim}**")
+    st.subheader("Evolução mensal")
+    st.dataframe(
+        [{"Mês": m, "Receitas": r, "Atribuído": a, "Saldo": s, "Gastos": g, "Transferido": t,
+          "Parcelas pagas": q, "Valor pago": p, "Economia": e}
+         for m, r, a, s, g, t, q, p, e in totais_por_mes(inicio, fim)],
+        hide_index=True, use_container_width=True,
+    )
+    st.subheader("Subcontas no período")
+    st.dataframe(
+        [{"Subconta": f"{conta}/{sub}", "Planejado": pl, "Gasto": g, "Transferências (líq.)": t, "Saldo": s}
+         for sid, conta, sub, pl, g, t, s in totais_por_subconta(inicio, fim)],
+        hide_index=True, use_container_width=True,
+    )
+
+    periodo = f"{inicio}-{fim}"
+    if st.button("📄 Gerar Relatório do Período em PDF"):
+        st.session_state.relatorio_pedido = (periodo, solicitar_pdf_periodo(inicio, fim, RESERVAS_ID))
+    pedido = st.session_state.get("relatorio_pedido")
+    if pedido and pedido[0] == periodo:
+        gerar_pdf_relatorio(*pedido)
 
-    # Gerar PDF
-    documento.build(elementos)
-    pdf = buffer.getvalue()
-    buffer.close()
+def gerar_pdf_relatorio(ano_mes, futuro):
+    if not futuro.done():
+        aguardar_relatorio(futuro)
+        return
+    if futuro.exception() is not None:
+        st.error(f"Falha ao gerar o relatório: {futuro.exception()}")
+        return
 
     # Botão de download
     st.download_button(
-        label="📥 Baixar Relatório Mensal em PDF",
-        data=pdf,
+        label="📥 Baixar Relatório em PDF",
+        data=futuro.result(),
         file_name=f"relatorio_{ano_mes.replace('/', '-')}.pdf",
         mime="application/pdf"
     )
 
+def painel_debug(consultas):
+    # Consultas do rerun atual e exportação dos acumulados do processo
+    with st.sidebar:
+        st.subheader("🔎 Consultas SQL")
+        total = sum(c.duracao_ms for c in consultas)
+        st.caption(f"Este rerun: {len(consultas)} comandos em {total:.1f} ms")
+        if consultas:
+            st.dataframe([c.como_dict() for c in sorted(consultas, key=lambda c: -c.duracao_ms)],
+                         hide_index=True, use_container_width=True)
+        dados = instrumentacao.snapshot()
+        cache = dados["cache"]
+        st.caption(f"Cache do db.py: {cache['acertos']} acertos, {cache['falhas']} falhas, "
+                   f"{cache['entradas']} entradas")
+        if dados["lentas"]:
+            st.markdown(f"**Lentas (≥ {dados['limite_lenta_ms']:g} ms)**")
+            st.dataframe(dados["lentas"][-20:][::-1], hide_index=True, use_container_width=True)
+        st.download_button("📥 JSON", instrumentacao.snapshot_json(), "consultas_sql.json", "application/json")
+        st.download_button("📥 Prometheus", instrumentacao.prometheus(), "metricas.prom", "text/plain")
+
+def sair():
+    token = st.session_state.get("sessao")
+    if token:
+        encerrar_sessao(token)
+    st.session_state.sessao = None
+    st.session_state.apagar_cookie = True
+    st.session_state.logged_in = False
+    st.session_state.page = "login"
+    st.rerun()
+
+@st.fragment(run_every=1)
+def aguardar_relatorio(futuro):
+    # Só este trecho é reexecutado enquanto o PDF não fica pronto
+    if futuro.done():
+        st.rerun()
+    st.info("⏳ Gerando relatório...")
+
+PAGINAS = {
+    "dashboard": dashboard,
+    "receita": registrar_receita,
+    "conta": cadastrar_conta,
+    "subconta": cadastrar_subconta,
+    "apagar_subconta": apagar_subconta,
+    "atribuir": atribuir_valores,
+    "transferencia": transferir_saldo,
+    "emprestimos": emprestimos_page,
+    "relatorio": relatorio_mensal,
+    "importar": importar_extrato_page,
+    "historico": historico_page,
+    "busca": busca_page,
+    "analises": analises_page,
+}
+
 # =========================================================
 # ROUTER / LOGIN (login individual por navegador)
 # =========================================================
@@ -798,34 +1137,27 @@ if "page" not in st.session_state:
     st.session_state.page = "login"
 
 if not st.session_state.logged_in:
+    if st.session_state.pop("apagar_cookie", False):
+        gravar_cookie_sessao("", 0)
     st.title("💰 Sistema de Controle Financeiro")
     with st.form("login_form"):
         user = st.text_input("Usuário")
         pwd = st.text_input("Senha", type="password")
         if st.form_submit_button("Entrar"):
-            if user == USERNAME and pwd == PASSWORD and user and pwd:
+            if autenticar(user, pwd):
+                st.session_state.sessao = criar_sessao(user)
+                st.session_state.gravar_cookie = True
                 st.session_state.logged_in = True
                 st.session_state.page = "dashboard"
                 st.rerun()
             else:
                 st.error("Usuário ou senha inválidos.")
 else:
-    if st.session_state.page == "dashboard":
-        dashboard()
-    elif st.session_state.page == "receita":
-        registrar_receita()
-    elif st.session_state.page == "conta":
-        cadastrar_conta()
-    elif st.session_state.page == "subconta":
-        cadastrar_subconta()
-    elif st.session_state.page == "apagar_subconta":
-        apagar_subconta()
-    elif st.session_state.page == "atribuir":
-        atribuir_valores()
-    elif st.session_state.page == "transferencia":
-        transferir_saldo()
-    elif st.session_state.page == "emprestimos":
-        emprestimos_page()
-    elif st.session_state.page == "relatorio":
-        relatorio_mensal()
-
+    if st.session_state.pop("gravar_cookie", False):
+        gravar_cookie_sessao(st.session_state.sessao, int(DURACAO_SESSAO.total_seconds()))
+    funcao = PAGINAS.get(st.session_state.page)
+    if funcao:
+        with instrumentacao.pagina(funcao.__name__) as consultas:
+            funcao()
+        if DEBUG:
+            painel_debug(consultas)
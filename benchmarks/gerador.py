@@ -0,0 +1,141 @@
+"""Gera um banco sintético e reprodutível para benchmarks.
+
+Preenche contas/subcontas, anos de atribuições, receitas e gastos,
+transferências e milhares de empréstimos com parcelas. A mesma semente
+gera sempre o mesmo banco. Uso:
+
+    python benchmarks/gerador.py saida.db [--tamanho medio] [--semente 42] [--mes-final 12/2025]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from calendar import monthrange
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import conexao  # noqa: E402
+from conexao import transacao, leitura  # noqa: E402
+from datas import mes_chave, mes_br, somar_meses  # noqa: E402
+from db import (  # noqa: E402
+    init_db, garantir_reservas, add_conta, get_contas, add_subconta, get_subcontas,
+    importar_emprestimos, registrar_lote, registrar_transferencia
+)
+
+TAMANHOS = {
+    "pequeno": dict(contas=3, subcontas_por_conta=4, anos=1, gastos_por_mes=100,
+                    transferencias_por_mes=5, emprestimos=50),
+    "medio": dict(contas=8, subcontas_por_conta=6, anos=3, gastos_por_mes=1000,
+                  transferencias_por_mes=20, emprestimos=1000),
+    "grande": dict(contas=20, subcontas_por_conta=10, anos=10, gastos_por_mes=3000,
+                   transferencias_por_mes=50, emprestimos=5000),
+}
+
+ORIGENS = ("Salário", "Freelance", "Aluguel recebido", "Dividendos")
+DESCRICOES = ("Mercado", "Padaria", "Farmácia", "Combustível", "Restaurante", "Luz", "Água",
+              "Internet", "Streaming", "Academia", "Escola", "Uber", "Pet shop", "Presente")
+INSTITUICOES = ("Banco A", "Banco B", "Cooperativa C", "Financeira D")
+TIPOS = ("Pessoal", "Consignado", "Veículo", "Imobiliário")
+
+def _data(rng, chave):
+    dia = rng.randint(1, monthrange(chave // 100, chave % 100)[1])
+    return f"{chave // 100:04d}-{chave % 100:02d}-{dia:02d}"
+
+def gerar(caminho, contas=3, subcontas_por_conta=4, anos=1, gastos_por_mes=100,
+          transferencias_por_mes=5, emprestimos=50, semente=42, mes_final=None):
+    # Retorna um resumo com as contagens de linhas e o tempo de geração
+    rng = random.Random(semente)
+    inicio_geracao = time.perf_counter()
+    for sufixo in ("", "-wal", "-shm"):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+    conexao.usar_banco(caminho)
+    init_db()
+    reservas_id = garantir_reservas()
+
+    # Contas e subcontas
+    for i in range(contas):
+        add_conta(f"Conta {i + 1:02d}")
+    ids_conta = {nome: cid for cid, nome in get_contas()}
+    for i in range(contas):
+        for j in range(subcontas_por_conta):
+            add_subconta(f"Subconta {i + 1:02d}.{j + 1:02d}", ids_conta[f"Conta {i + 1:02d}"])
+    subcontas = [sid for sid, _, _ in get_subcontas() if sid != reservas_id]
+
+    fim = mes_chave(mes_final or date.today())
+    meses = [somar_meses(fim, -n) for n in range(anos * 12 - 1, -1, -1)]
+
+    # Empréstimos começam até 5 anos antes da janela para haver contratos
+    # em andamento, quitados e futuros
+    contratos = []
+    for n in range(emprestimos):
+        sistema = rng.choice(("FIXO", "PRICE", "SAC"))
+        qtd = rng.choice((12, 24, 36, 48, 60, 120))
+        contrato = dict(instituicao=rng.choice(INSTITUICOES), contrato=f"CT-{n + 1:06d}",
+                        tipo=rng.choice(TIPOS), qtd_parcelas=qtd, sistema=sistema,
+                        primeira_parcela=somar_meses(meses[0], rng.randint(-60, len(meses))))
+        if sistema == "FIXO":
+            contrato["valor_parcela"] = round(rng.uniform(80, 1500), 2)
+        else:
+            contrato["valor_financiado"] = round(rng.uniform(2000, 80000), 2)
+            contrato["taxa_juros"] = round(rng.uniform(0.005, 0.035), 4)
+        contratos.append(contrato)
+    for i in range(0, len(contratos), 500):
+        importar_emprestimos(contratos[i:i + 500])
+
+    # Mês a mês: atribuições, receitas (que quitam as parcelas do mês), gastos
+    # e algumas transferências entre subcontas
+    transferencias = 0
+    for chave in meses:
+        atribuicoes = [(sid, chave, v, v) for sid, v in
+                       ((sid, round(rng.uniform(300, 3000), 2)) for sid in subcontas)]
+        with transacao() as cur:
+            cur.executemany("""
+                INSERT INTO subconta_atribuicoes (subconta_id, ano_mes, saldo_inicial, saldo_atual)
+                VALUES (?,?,?,?)
+                ON CONFLICT (subconta_id, ano_mes) DO UPDATE SET saldo_atual = saldo_atual + excluded.saldo_atual
+            """, atribuicoes)
+        teto = sum(a[2] for a in atribuicoes) * 0.8 / max(gastos_por_mes, 1)
+        receitas = [(_data(rng, chave), rng.choice(ORIGENS), round(rng.uniform(1000, 15000), 2), "")
+                    for _ in range(rng.randint(2, 4))]
+        gastos = [(_data(rng, chave), round(rng.uniform(1, 2 * teto), 2), rng.choice(DESCRICOES),
+                   rng.choice(subcontas)) for _ in range(gastos_por_mes)]
+        registrar_lote(receitas, gastos)
+        for _ in range(transferencias_por_mes):
+            origem, destino = rng.sample(subcontas, 2)
+            if registrar_transferencia(_data(rng, chave), origem, destino, round(rng.uniform(5, 150), 2),
+                                       "Ajuste de orçamento", chave):
+                transferencias += 1
+
+    with leitura() as cur:
+        linhas = {tabela: cur.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+                  for tabela in ("contas", "subcontas", "subconta_atribuicoes", "receitas", "gastos",
+                                 "transferencias", "emprestimos", "parcelas_emprestimo")}
+    conexao.fechar_conexoes()
+    return {
+        "caminho": caminho,
+        "semente": semente,
+        "mes_inicial": mes_br(meses[0]),
+        "mes_final": mes_br(fim),
+        "reservas_id": reservas_id,
+        "linhas": linhas,
+        "bytes": os.path.getsize(caminho),
+        "geracao_s": round(time.perf_counter() - inicio_geracao, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("caminho")
+    parser.add_argument("--tamanho", choices=TAMANHOS, default="pequeno")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--mes-final", help="último mês gerado (MM/AAAA); padrão: mês atual")
+    args = parser.parse_args()
+    resumo = gerar(args.caminho, semente=args.semente, mes_final=args.mes_final, **TAMANHOS[args.tamanho])
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Mede o cold start do app: tempo de import e tempo até a tela de login.
+
+Cada medida roda num interpretador novo (sem cache de módulos) contra um
+banco temporário. Uso:
+
+    python benchmarks/startup.py [--repeticoes 5] [--saida startup.json] [--limite-ms 3000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tempo para importar um conjunto de módulos num processo novo
+SCRIPT_IMPORT = """
+import sys, time
+sys.path.insert(0, {raiz!r})
+t = time.perf_counter()
+for nome in {modulos!r}:
+    __import__(nome)
+print((time.perf_counter() - t) * 1000)
+"""
+
+# Da largada do processo até a tela de login renderizada
+SCRIPT_LOGIN = """
+import sys, time
+t = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=60).run()
+ms = (time.perf_counter() - t) * 1000
+assert not at.exception, at.exception
+assert any("Sistema de Controle Financeiro" in x.value for x in at.title), "tela de login não renderizou"
+print(ms)
+print(",".join(m for m in {pesados!r} if m in sys.modules) or "-")
+"""
+
+# Dependências pesadas que só devem carregar quando uma página precisa delas
+MODULOS_PESADOS = ("reportlab", "numpy", "pandas", "pyarrow", "altair", "PIL")
+
+MEDIDAS_IMPORT = {
+    "import_streamlit_ms": ["streamlit"],
+    "import_app_ms": ["db", "importacao", "relatorio", "formatacao"],
+    "import_reportlab_ms": ["reportlab.platypus", "reportlab.lib.styles"],
+}
+
+def _rodar(script, env):
+    saida = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                           cwd=RAIZ, env=env, check=True)
+    return saida.stdout.split()
+
+def medir(repeticoes):
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, FINANCE_DB=os.path.join(tmp, "startup.db"))
+    resultado = {}
+    for nome, modulos in MEDIDAS_IMPORT.items():
+        tempos = [float(_rodar(SCRIPT_IMPORT.format(raiz=RAIZ, modulos=modulos), env)[0])
+                  for _ in range(repeticoes)]
+        resultado[nome] = round(statistics.median(tempos), 1)
+
+    tempos, pesados = [], set()
+    for _ in range(repeticoes):
+        ms, carregados = _rodar(SCRIPT_LOGIN.format(app=os.path.join(RAIZ, "app.py"),
+                                                    pesados=MODULOS_PESADOS), env)
+        tempos.append(float(ms))
+        pesados.update(m for m in carregados.split(",") if m != "-")
+    resultado["primeira_renderizacao_login_ms"] = round(statistics.median(tempos), 1)
+    resultado["modulos_pesados_no_login"] = sorted(pesados)
+    resultado["repeticoes"] = repeticoes
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--limite-ms", type=float,
+                        help="falha se a primeira renderização passar deste tempo")
+    args = parser.parse_args()
+
+    resultado = medir(args.repeticoes)
+    texto = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, "w") as f:
+            f.write(texto + "\n")
+    print(texto)
+
+    falhas = []
+    for modulo in resultado["modulos_pesados_no_login"]:
+        falhas.append(f"{modulo} foi importado antes de alguma página precisar dele")
+    if args.limite_ms and resultado["primeira_renderizacao_login_ms"] > args.limite_ms:
+        falhas.append(f"primeira renderização acima de {args.limite_ms} ms")
+    for falha in falhas:
+        print(f"REGRESSÃO: {falha}", file=sys.stderr)
+    sys.exit(1 if falhas else 0)
+
+if __name__ == "__main__":
+    main()
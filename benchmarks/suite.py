@@ -0,0 +1,278 @@
+"""Mede as funções do db.py, o fechamento de mês e os PDFs em vários tamanhos de banco.
+
+Para cada tamanho gera um banco sintético (benchmarks/gerador.py, mesma
+semente) e cronometra cada caso com o cache de leituras zerado. Casos que
+alteram o banco rodam sobre uma cópia nova a cada repetição. Uso:
+
+    python benchmarks/suite.py [--tamanhos pequeno medio] [--repeticoes 5]
+                               [--saida resultado.json] [--comparar anterior.json] [--tolerancia 1.25]
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import conexao  # noqa: E402
+import db  # noqa: E402
+import analise  # noqa: E402
+import previsao  # noqa: E402
+import relatorio  # noqa: E402
+from cache import limpar_cache  # noqa: E402
+from conexao import leitura  # noqa: E402
+from datas import mes_chave, mes_br, somar_meses, intervalo_mes  # noqa: E402
+from benchmarks.gerador import TAMANHOS, gerar  # noqa: E402
+
+# Diferenças abaixo disso são ruído de medição
+RUIDO_MS = 1.0
+# Mês final fixo: o mesmo banco é gerado em qualquer data
+MES_FINAL = "12/2025"
+# Saldo posto na Reservas do mês final para quitar_com_reservas medir o caminho de sucesso
+SALDO_RESERVAS = 1_000_000.0
+
+# -------------------- CASOS --------------------
+# nome -> (função(ctx), altera_banco). ctx traz ids e meses do banco gerado.
+# altera_banco=True para todo caso que grava: roda sobre uma cópia nova a cada
+# repetição, senão as repetições medem um banco que o próprio caso já mudou.
+def _casos():
+    return {
+        # Sessões
+        "salvar_sessao": (lambda c: db.salvar_sessao("bench"), True),
+        "carregar_sessao": (lambda c: db.carregar_sessao(), False),
+        "limpar_sessao": (lambda c: db.limpar_sessao(), True),
+        # Setup
+        "init_db": (lambda c: db.init_db(), False),
+        "garantir_reservas": (lambda c: db.garantir_reservas(), False),
+        # Receitas
+        "add_receita": (lambda c: db.add_receita(c["data"], "Bench", 100.0, ""), True),
+        "get_total_receitas_mes": (lambda c: db.get_total_receitas_mes(c["mes"]), False),
+        "get_total_receitas_periodo": (lambda c: db.get_total_receitas_periodo(c["mes_inicial"], c["mes"]), False),
+        "listar_receitas": (lambda c: db.listar_receitas(*c["ano"]), False),
+        # Contas / subcontas
+        "add_conta": (lambda c: db.add_conta("Bench"), True),
+        "get_contas": (lambda c: db.get_contas(), False),
+        "add_subconta": (lambda c: db.add_subconta("Bench", c["conta"]), True),
+        "get_subcontas": (lambda c: db.get_subcontas(), False),
+        "pode_excluir_subconta": (lambda c: db.pode_excluir_subconta(c["subconta"]), False),
+        "delete_subconta": (lambda c: db.delete_subconta(c["subconta"]), True),
+        # Atribuições, gastos e transferências
+        "salvar_valor_subconta": (lambda c: db.salvar_valor_subconta(c["mes"], c["subconta"], 10.0), True),
+        "get_saldos_mes": (lambda c: db.get_saldos_mes(c["mes"]), False),
+        "saldos_mes_pagina": (lambda c: db.saldos_mes_pagina(c["mes"], ordem="mais_usado", pagina=2,
+                                                             excluir_id=c["reservas_id"]), False),
+        "resumo_saldos_mes": (lambda c: db.resumo_saldos_mes(c["mes"], excluir_id=c["reservas_id"]), False),
+        "registrar_gasto": (lambda c: db.registrar_gasto(c["data"], 0.01, "Bench", c["subconta"], c["mes"]), True),
+        "listar_gastos": (lambda c: db.listar_gastos(*c["ano"]), False),
+        "registrar_transferencia": (lambda c: db.registrar_transferencia(
+            c["data"], c["subconta"], c["reservas_id"], 0.01, "Bench", c["mes"]), True),
+        "listar_transferencias": (lambda c: db.listar_transferencias(*c["ano"]), False),
+        "historico_gastos": (lambda c: db.historico_gastos(c["subconta"], *c["ano"]), False),
+        "historico_transferencias": (lambda c: db.historico_transferencias(c["subconta"], *c["ano"]), False),
+        "buscar": (lambda c: db.buscar("mercado"), False),
+        # Previsão: com as matrizes do previsao.py já montadas e refeitas do zero
+        "prever_saldos": (lambda c: previsao.prever_saldos(c["mes"], 24, reservas_id=c["reservas_id"]), False),
+        "prever_saldos_frio": (lambda c: (previsao.limpar_previsao(),
+                                          previsao.prever_saldos(c["mes"], 24, reservas_id=c["reservas_id"])), False),
+        # Análises (extração agregada e indicadores sobre as matrizes)
+        "series_mensais": (lambda c: analise.series_mensais(c["mes_inicial"], c["mes"]), False),
+        "analisar_conta": (lambda c: analise.analisar(c["mes_inicial"], c["mes"], "conta"), False),
+        # Fechamento de mês (o fechamento_mes do app chama fechar_meses_pendentes)
+        "fechar_mes": (lambda c: db.fechar_mes(c["mes_anterior"], c["reservas_id"]), True),
+        "meses_pendentes_fechamento": (lambda c: db.meses_pendentes_fechamento(c["mes"]), False),
+        "fechar_meses_pendentes": (lambda c: db.fechar_meses_pendentes(c["mes"], c["reservas_id"]), True),
+        # Empréstimos
+        "registrar_emprestimo": (lambda c: db.registrar_emprestimo(
+            "Bench", "B-1", "Pessoal", c["mes"], 120, sistema="PRICE", taxa_juros=0.02,
+            valor_financiado=50000.0), True),
+        "importar_emprestimos": (lambda c: db.importar_emprestimos(
+            [dict(instituicao="Bench", contrato=f"B-{i}", tipo="Pessoal", primeira_parcela=c["mes"],
+                  qtd_parcelas=60, sistema="SAC", taxa_juros=0.015, valor_financiado=20000.0)
+             for i in range(100)]), True),
+        "simular_quitacao_antecipada": (lambda c: db.simular_quitacao_antecipada(c["emprestimo"], c["mes"]), False),
+        "resumo_emprestimos": (lambda c: db.resumo_emprestimos(), False),
+        "listar_emprestimos": (lambda c: db.listar_emprestimos(), False),
+        "listar_parcelas": (lambda c: db.listar_parcelas(c["emprestimo"]), False),
+        "listar_parcelas_quitadas": (lambda c: db.listar_parcelas_quitadas(*c["ano"]), False),
+        "quitar_parcela": (lambda c: db.quitar_parcela(c["parcela"], 1.0, c["data"]), True),
+        "candidatos_antecipacao": (lambda c: db.candidatos_antecipacao(c["mes"]), False),
+        "otimizar_quitacoes": (lambda c: db.otimizar_quitacoes(c["mes"], 50000.0), False),
+        "saldo_reservas": (lambda c: db.saldo_reservas(c["mes"], c["reservas_id"]), False),
+        "quitar_com_reservas": (lambda c: db.quitar_com_reservas(
+            [(c["parcela"], 0.01)], c["data"], c["reservas_id"], c["mes"]), True),
+        "quitar_parcelas": (lambda c: db.quitar_parcelas([(p, 1.0) for p in c["parcelas_abertas"]], c["data"]), True),
+        # Quita as parcelas do mês seguinte, ainda todas em aberto
+        "verificar_quitacoes_automaticas": (lambda c: db.verificar_quitacoes_automaticas(
+            c["mes_seguinte"], c["data_seguinte"]), True),
+        "excluir_emprestimo": (lambda c: db.excluir_emprestimo(c["emprestimo"]), True),
+        # Relatórios
+        "totais_por_mes": (lambda c: db.totais_por_mes(c["mes_inicial"], c["mes"]), False),
+        "totais_por_subconta": (lambda c: db.totais_por_subconta(c["mes_inicial"], c["mes"]), False),
+        "registrar_lote": (lambda c: db.registrar_lote(
+            [(c["data"], "Bench", 1000.0, "")] * 10,
+            [(c["data"], 1.0, "Bench", c["subconta"])] * 1000), True),
+        "gerar_pdf_mensal": (lambda c: relatorio.gerar_pdf_mensal(c["mes"], c["reservas_id"]), False),
+        "gerar_pdf_periodo": (lambda c: relatorio.gerar_pdf_periodo(
+            c["mes_inicial"], c["mes"], c["reservas_id"]), False),
+    }
+
+def funcoes_publicas_db():
+    return sorted(nome for nome, f in inspect.getmembers(db, inspect.isfunction)
+                  if f.__module__ == "db" and not nome.startswith("_"))
+
+# -------------------- EXECUÇÃO --------------------
+def _contexto(resumo):
+    mes = mes_chave(resumo["mes_final"])
+    with leitura() as cur:
+        conta = cur.execute("SELECT id FROM contas WHERE nome != 'Sistema' ORDER BY id LIMIT 1").fetchone()[0]
+        subconta = cur.execute("""
+            SELECT subconta_id FROM subconta_atribuicoes
+            WHERE ano_mes=? AND subconta_id != ? ORDER BY saldo_atual DESC LIMIT 1
+        """, (mes, resumo["reservas_id"])).fetchone()[0]
+        emprestimo, parcela = cur.execute("""
+            SELECT emprestimo_id, id FROM parcelas_emprestimo
+            WHERE valor_quitado IS NULL ORDER BY emprestimo_id, id LIMIT 1
+        """).fetchone()
+        abertas = [pid for pid, in cur.execute(
+            "SELECT id FROM parcelas_emprestimo WHERE emprestimo_id=? AND valor_quitado IS NULL", (emprestimo,))]
+    seguinte = somar_meses(mes, 1)
+    return {
+        "reservas_id": resumo["reservas_id"],
+        "mes": mes_br(mes),
+        "mes_inicial": resumo["mes_inicial"],
+        "mes_anterior": mes_br(somar_meses(mes, -1)),
+        "mes_seguinte": mes_br(seguinte),
+        "data": intervalo_mes(mes)[0],
+        "data_seguinte": intervalo_mes(seguinte)[0],
+        "ano": intervalo_mes(somar_meses(mes, -11), mes),
+        "conta": conta,
+        "subconta": subconta,
+        "emprestimo": emprestimo,
+        "parcela": parcela,
+        "parcelas_abertas": abertas,
+    }
+
+def _restaurar(base, trabalho):
+    conexao.fechar_conexoes()
+    for sufixo in ("-wal", "-shm"):
+        if os.path.exists(trabalho + sufixo):
+            os.remove(trabalho + sufixo)
+    shutil.copyfile(base, trabalho)
+    conexao.usar_banco(trabalho)
+
+def cronometrar(funcao, repeticoes, preparo=None):
+    tempos = []
+    for _ in range(repeticoes):
+        if preparo:
+            preparo()
+        limpar_cache()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {"mediana_ms": round(statistics.median(tempos), 3),
+            "min_ms": round(min(tempos), 3),
+            "max_ms": round(max(tempos), 3)}
+
+def medir_tamanho(tamanho, repeticoes, semente, pasta, mes_final=MES_FINAL):
+    base = os.path.join(pasta, f"{tamanho}.db")
+    trabalho = os.path.join(pasta, f"{tamanho}-trabalho.db")
+    resumo = gerar(base, semente=semente, mes_final=mes_final, **TAMANHOS[tamanho])
+    conexao.usar_banco(base)
+    db.salvar_valor_subconta(resumo["mes_final"], resumo["reservas_id"], SALDO_RESERVAS)
+    _restaurar(base, trabalho)
+    ctx = _contexto(resumo)
+    # Aquece o import do ReportLab para não entrar na medida dos PDFs
+    relatorio.gerar_pdf_mensal(ctx["mes"], ctx["reservas_id"])
+
+    funcoes = {}
+    for nome, (caso, altera_banco) in _casos().items():
+        if altera_banco:
+            funcoes[nome] = cronometrar(lambda: caso(ctx), repeticoes, lambda: _restaurar(base, trabalho))
+            _restaurar(base, trabalho)
+        else:
+            funcoes[nome] = cronometrar(lambda: caso(ctx), repeticoes)
+    conexao.fechar_conexoes()
+    resumo.pop("caminho")
+    return dict(resumo, funcoes=funcoes)
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=RAIZ, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def medir(tamanhos, repeticoes, semente, mes_final=MES_FINAL):
+    pasta = tempfile.mkdtemp(prefix="bench-")
+    try:
+        resultado = {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "semente": semente,
+            "repeticoes": repeticoes,
+            "sem_medicao": sorted(set(funcoes_publicas_db()) - set(_casos())),
+            "tamanhos": {},
+        }
+        for tamanho in tamanhos:
+            resultado["tamanhos"][tamanho] = medir_tamanho(tamanho, repeticoes, semente, pasta, mes_final)
+        return resultado
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+# -------------------- COMPARAÇÃO --------------------
+def comparar(anterior, atual, tolerancia):
+    # Casos que ficaram mais lentos que tolerancia x o valor anterior
+    regressoes = []
+    for tamanho, medidas in atual["tamanhos"].items():
+        antes = anterior.get("tamanhos", {}).get(tamanho, {}).get("funcoes", {})
+        for nome, medida in medidas["funcoes"].items():
+            if nome not in antes:
+                continue
+            velho, novo = antes[nome]["mediana_ms"], medida["mediana_ms"]
+            if novo > velho * tolerancia and novo - velho > RUIDO_MS:
+                regressoes.append(f"{tamanho}/{nome}: {velho:.2f} -> {novo:.2f} ms")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", nargs="+", choices=TAMANHOS, default=["pequeno", "medio"])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--mes-final", default=MES_FINAL)
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, default=1.25,
+                        help="razão máxima aceita entre a mediana nova e a anterior")
+    args = parser.parse_args()
+
+    resultado = medir(args.tamanhos, args.repeticoes, args.semente, args.mes_final)
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+    falhas = []
+    if resultado["sem_medicao"]:
+        print(f"AVISO: funções do db.py sem caso na suíte: {', '.join(resultado['sem_medicao'])}",
+              file=sys.stderr)
+    if args.comparar:
+        with open(args.comparar) as f:
+            falhas = comparar(json.load(f), resultado, args.tolerancia)
+    for falha in falhas:
+        print(f"REGRESSÃO: {falha}", file=sys.stderr)
+    sys.exit(1 if falhas else 0)
+
+if __name__ == "__main__":
+    main()
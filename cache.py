@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import conexao
+
+# Cache das leituras do db.py, chaveado por função + argumentos e válido
+# apenas para a versão dos dados em que foi lido. Qualquer escrita
+# confirmada, deste ou de outro processo, muda a versão e descarta todas as
+# entradas.
+# Os resultados são compartilhados: quem chama não deve alterá-los.
+
+LIMITE_ENTRADAS = 256
+
+_lock = threading.Lock()
+_entradas = OrderedDict()
+_versao = None
+_estatisticas = {"acertos": 0, "falhas": 0, "invalidacoes": 0}
+
+def em_cache(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        global _versao
+        # Dentro de uma transação a leitura pode ver dados não confirmados
+        if conexao.em_transacao():
+            return func(*args, **kwargs)
+        chave = (func.__name__, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(chave)
+        except TypeError:
+            return func(*args, **kwargs)
+        versao = conexao.versao_dados()
+        if versao is None:
+            return func(*args, **kwargs)
+
+        with _lock:
+            if versao != _versao:
+                if _entradas:
+                    _estatisticas["invalidacoes"] += 1
+                _entradas.clear()
+                _versao = versao
+            if chave in _entradas:
+                _entradas.move_to_end(chave)
+                _estatisticas["acertos"] += 1
+                return _entradas[chave]
+            _estatisticas["falhas"] += 1
+
+        valor = func(*args, **kwargs)
+        with _lock:
+            # Só guarda se nenhuma escrita aconteceu durante a leitura
+            if versao == _versao == conexao.versao_dados():
+                _entradas[chave] = valor
+                if len(_entradas) > LIMITE_ENTRADAS:
+                    _entradas.popitem(last=False)
+        return valor
+    return wrapper
+
+def estatisticas_cache():
+    with _lock:
+        return dict(_estatisticas, entradas=len(_entradas), versao=_versao)
+
+def limpar_cache():
+    with _lock:
+        _entradas.clear()
@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_NAME = os.environ.get("FINANCE_DB", "finance.db")
+
+# Pragmas aplicados uma única vez em cada conexão nova
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",      # seguro com WAL, evita fsync a cada commit
+    "PRAGMA cache_size=-20000",       # ~20 MB de cache de páginas
+    "PRAGMA mmap_size=268435456",     # 256 MB mapeados em memória
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Conexões ociosas mantidas entre reruns do Streamlit
+TAMANHO_POOL = 8
+
+_lock = threading.Lock()
+_livres = []
+_geracao = 0
+_versao_banco = None
+_local = threading.local()
+
+# Trocada por instrumentacao.ativar() por um cursor que mede as consultas
+fabrica_cursor = sqlite3.Cursor
+
+# -------------------- POOL --------------------
+def _abrir():
+    conn = sqlite3.connect(DB_NAME, isolation_level=None, check_same_thread=False, timeout=5)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def _adquirir():
+    with _lock:
+        if _livres:
+            return _livres.pop()
+        geracao = _geracao
+    return _abrir(), geracao
+
+def _devolver(item):
+    conn, geracao = item
+    with _lock:
+        if geracao == _geracao and len(_livres) < TAMANHO_POOL:
+            _livres.append(item)
+            return
+    conn.close()
+
+@contextmanager
+def _conexao():
+    # Chamadas aninhadas na mesma thread reutilizam a conexão já em uso
+    atual = getattr(_local, "conn", None)
+    if atual is not None:
+        yield atual
+        return
+    item = _adquirir()
+    _local.conn = item[0]
+    try:
+        yield item[0]
+    finally:
+        _local.conn = None
+        if item[0].in_transaction:
+            item[0].rollback()
+        _devolver(item)
+
+@contextmanager
+def _cursor(conn):
+    cur = conn.cursor(fabrica_cursor)
+    try:
+        yield cur
+    finally:
+        cur.close()
+
+# -------------------- API --------------------
+@contextmanager
+def transacao(versionar=True):
+    # versionar=False: gravações que não são dados financeiros (ex.: sessões)
+    # não invalidam as leituras em cache
+    with _conexao() as conn, _cursor(conn) as cur:
+        if conn.in_transaction:
+            # Já dentro de uma transação: participa dela
+            yield cur
+            return
+        cur.execute("BEGIN IMMEDIATE")
+        alteracoes, versao, geracao = conn.total_changes, None, _geracao
+        try:
+            yield cur
+            if versionar and conn.total_changes != alteracoes:
+                versao = _nova_versao(cur)
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        if versao is not None:
+            _definir_versao(geracao, versao)
+
+@contextmanager
+def leitura():
+    with _conexao() as conn, _cursor(conn) as cur:
+        yield cur
+
+# -------------------- VERSÃO DOS DADOS --------------------
+# Contador na tabela versao_dados, incrementado dentro de cada transação que
+# alterou linhas; leituras em cache guardam a versão em que foram feitas.
+# Ler a versão não consulta o banco: o valor fica em memória, é atualizado
+# pelas escritas deste processo e relido por sincronizar_versao() uma vez por
+# rerun do app (ou requisição da API), o que traz as escritas de outros
+# processos (API, CLI, outro worker do Streamlit). None enquanto a tabela não
+# existe (antes da migração), e aí nada deve ser guardado em cache.
+def versao_dados():
+    if _versao_banco is None:
+        sincronizar_versao()
+    valor = _versao_banco
+    return None if valor is None else (_geracao, valor)
+
+def sincronizar_versao():
+    geracao = _geracao
+    with leitura() as cur:
+        try:
+            cur.execute("SELECT valor FROM versao_dados")
+        except sqlite3.OperationalError:
+            return
+        row = cur.fetchone()
+    _definir_versao(geracao, row[0] if row else None)
+
+def _definir_versao(geracao, valor):
+    # Nunca volta atrás: uma leitura mais lenta não desfaz a de uma escrita
+    global _versao_banco
+    with _lock:
+        if geracao == _geracao and (valor is None or _versao_banco is None or valor > _versao_banco):
+            _versao_banco = valor
+
+def _nova_versao(cur):
+    cur.execute("UPDATE versao_dados SET valor = valor + 1 RETURNING valor")
+    return cur.fetchone()[0]
+
+def em_transacao():
+    conn = getattr(_local, "conn", None)
+    return conn is not None and conn.in_transaction
+
+def usar_banco(caminho):
+    # Troca o arquivo do banco (testes, benchmarks); conexões antigas são descartadas
+    global DB_NAME, _geracao, _versao_banco
+    with _lock:
+        DB_NAME = caminho
+        _geracao += 1
+        _versao_banco = None
+        antigas = [conn for conn, _ in _livres]
+        _livres.clear()
+    for conn in antigas:
+        conn.close()
+
+def fechar_conexoes():
+    usar_banco(DB_NAME)
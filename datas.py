@@ -0,0 +1,65 @@
+from calendar import monthrange
+from datetime import date, datetime
+
+# No banco, datas ficam em ISO (AAAA-MM-DD) e meses como inteiro AAAAMM,
+# ambos ordenáveis. A interface continua usando DD/MM/AAAA e MM/AAAA.
+
+# -------------------- MESES --------------------
+def mes_chave(mes):
+    # Aceita 202501, "01/2025", "2025-01" ou date/datetime
+    if isinstance(mes, int):
+        return mes
+    if isinstance(mes, (date, datetime)):
+        return mes.year * 100 + mes.month
+    mes = mes.strip()
+    if "/" in mes:
+        m, a = mes.split("/")
+        return int(a) * 100 + int(m)
+    if "-" in mes:
+        a, m = mes.split("-")[:2]
+        return int(a) * 100 + int(m)
+    return int(mes)
+
+def mes_br(chave):
+    return f"{chave % 100:02d}/{chave // 100}"
+
+def somar_meses(chave, n):
+    total = (chave // 100) * 12 + (chave % 100 - 1) + n
+    return (total // 12) * 100 + total % 12 + 1
+
+def meses_entre(inicio, fim):
+    inicio, fim = mes_chave(inicio), mes_chave(fim)
+    meses = []
+    while inicio <= fim:
+        meses.append(inicio)
+        inicio = somar_meses(inicio, 1)
+    return meses
+
+def intervalo_mes(inicio, fim=None):
+    # Primeiro e último dia (inclusive) de um mês ou de uma janela de meses
+    inicio = mes_chave(inicio)
+    fim = inicio if fim is None else mes_chave(fim)
+    ultimo_dia = monthrange(fim // 100, fim % 100)[1]
+    return (f"{inicio // 100:04d}-{inicio % 100:02d}-01",
+            f"{fim // 100:04d}-{fim % 100:02d}-{ultimo_dia:02d}")
+
+# -------------------- DATAS --------------------
+def data_iso(data):
+    # Aceita "DD/MM/AAAA", "AAAA-MM-DD" ou date/datetime
+    if data is None:
+        return None
+    if isinstance(data, (date, datetime)):
+        return data.strftime("%Y-%m-%d")
+    data = data.strip()
+    if "/" in data:
+        return datetime.strptime(data, "%d/%m/%Y").strftime("%Y-%m-%d")
+    return data[:10]
+
+def data_br(iso):
+    if not iso:
+        return iso
+    return f"{iso[8:10]}/{iso[5:7]}/{iso[0:4]}"
+
+def mes_da_data(data):
+    iso = data_iso(data)
+    return int(iso[0:4]) * 100 + int(iso[5:7])
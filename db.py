@@ -1,261 +1,156 @@
-import sqlite3
-from datetime import datetime
-
-DB_NAME = "finance.db"
+import re
+from datetime import datetime, timedelta
+from itertools import repeat
+from conexao import transacao, leitura
+from cache import em_cache
+from migracoes import migrar, TIPOS_BUSCA
+from amortizacao import gerar_cronograma, descontar_parcelas, valor_presente, meses_entre_chaves, otimizar_quitacao
+from datas import mes_chave, mes_br, meses_entre, data_iso, data_br, mes_da_data, intervalo_mes, somar_meses
 
 # -------------------- INIT --------------------
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-
-    # Sessão (corrigido para incluir criado_em)
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS sessao (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        token TEXT,
-        criado_em TEXT
-    )
-    """)
-
-    # Receitas
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS receitas (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        data TEXT,
-        origem TEXT,
-        valor REAL,
-        descricao TEXT,
-        ano_mes TEXT
-    )
-    """)
-
-    # Contas principais
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS contas (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome TEXT UNIQUE
-    )
-    """)
-
-    # Subcontas
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS subcontas (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome TEXT,
-        conta_id INTEGER,
-        FOREIGN KEY (conta_id) REFERENCES contas(id)
-    )
-    """)
-
-    # Atribuições mensais
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS subconta_atribuicoes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        subconta_id INTEGER,
-        ano_mes TEXT,
-        saldo_inicial REAL,
-        saldo_atual REAL,
-        FOREIGN KEY (subconta_id) REFERENCES subcontas(id)
-    )
-    """)
-
-    # Gastos
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS gastos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        data TEXT,
-        valor REAL,
-        descricao TEXT,
-        subconta_id INTEGER,
-        ano_mes TEXT,
-        FOREIGN KEY (subconta_id) REFERENCES subcontas(id)
-    )
-    """)
-
-    # Transferências
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS transferencias (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        data TEXT,
-        subconta_origem INTEGER,
-        subconta_destino INTEGER,
-        valor REAL,
-        justificativa TEXT,
-        mes_ano TEXT
-    )
-    """)
-
-    # Empréstimos
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS emprestimos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        instituicao TEXT,
-        contrato TEXT,
-        tipo TEXT,
-        primeira_parcela TEXT,
-        qtd_parcelas INTEGER,
-        valor_parcela REAL
-    )
-    """)
-
-    # Parcelas de empréstimos
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS parcelas_emprestimo (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        emprestimo_id INTEGER,
-        mes_ano TEXT,
-        valor_original REAL,
-        valor_quitado REAL,
-        data_quitacao TEXT,
-        FOREIGN KEY (emprestimo_id) REFERENCES emprestimos(id)
-    )
-    """)
-
-    conn.commit()
-    conn.close()
+    migrar()
 
 # -------------------- SESSÕES --------------------
+# Sessão única do app antigo (app1.py); o app atual usa sessoes.py, com um
+# token por usuário. Aqui só as linhas sem usuário são tocadas.
 def salvar_sessao(token):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM sessao")
-    cur.execute("INSERT INTO sessao (token, criado_em) VALUES (?, ?)", 
-                (token, datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
+    agora = datetime.now()
+    with transacao(versionar=False) as cur:
+        cur.execute("DELETE FROM sessao WHERE usuario IS NULL")
+        cur.execute("INSERT INTO sessao (token, criado_em, expira_em) VALUES (?, ?, ?)",
+                    (token, agora.isoformat(), (agora + timedelta(hours=1)).isoformat()))
 
 def carregar_sessao():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT token, criado_em FROM sessao LIMIT 1")
-    row = cur.fetchone()
-    conn.close()
-    if row:
-        token, criado_em = row
-        dt = datetime.fromisoformat(criado_em)
-        if (datetime.now() - dt).total_seconds() <= 3600:  # 1h
-            return token
-    return None
+    with leitura() as cur:
+        cur.execute("""
+            SELECT token FROM sessao
+            WHERE usuario IS NULL AND expira_em > ?
+            ORDER BY id DESC LIMIT 1
+        """, (datetime.now().isoformat(),))
+        row = cur.fetchone()
+    return row[0] if row else None
 
 def limpar_sessao():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM sessao")
-    conn.commit()
-    conn.close()
+    with transacao(versionar=False) as cur:
+        cur.execute("DELETE FROM sessao WHERE usuario IS NULL")
 
 # -------------------- RECEITAS --------------------
 def add_receita(data, origem, valor, descricao):
-    d = datetime.strptime(data, "%d/%m/%Y")
-    ano_mes = d.strftime("%m/%Y")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO receitas (data, origem, valor, descricao, ano_mes) VALUES (?,?,?,?,?)",
-                (data, origem, valor, descricao, ano_mes))
-    conn.commit()
-    conn.close()
-
-    verificar_quitacoes_automaticas(ano_mes, data)
-
+    data = data_iso(data)
+    ano_mes = mes_da_data(data)
+    with transacao() as cur:
+        cur.execute("INSERT INTO receitas (data, origem, valor, descricao, ano_mes) VALUES (?,?,?,?,?)",
+                    (data, origem, valor, descricao, ano_mes))
+        return verificar_quitacoes_automaticas(ano_mes, data)
+
+@em_cache
 def get_total_receitas_mes(ano_mes):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT SUM(valor) FROM receitas WHERE ano_mes=?", (ano_mes,))
-    total = cur.fetchone()[0]
-    conn.close()
+    with leitura() as cur:
+        cur.execute("SELECT SUM(valor) FROM receitas WHERE ano_mes=?", (mes_chave(ano_mes),))
+        total = cur.fetchone()[0]
     return total if total else 0
 
+@em_cache
+def get_total_receitas_periodo(mes_inicio, mes_fim):
+    with leitura() as cur:
+        cur.execute("SELECT SUM(valor) FROM receitas WHERE ano_mes BETWEEN ? AND ?",
+                    (mes_chave(mes_inicio), mes_chave(mes_fim)))
+        total = cur.fetchone()[0]
+    return total if total else 0
+
+def listar_receitas(data_inicio, data_fim):
+    with leitura() as cur:
+        cur.execute("""
+        SELECT id, data, origem, valor, descricao
+        FROM receitas
+        WHERE data BETWEEN ? AND ?
+        ORDER BY data, id
+        """, (data_iso(data_inicio), data_iso(data_fim)))
+        rows = cur.fetchall()
+    return [(rid, data_br(data), origem, valor, desc) for rid, data, origem, valor, desc in rows]
+
 # -------------------- CONTAS --------------------
 def add_conta(nome):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("INSERT OR IGNORE INTO contas (nome) VALUES (?)", (nome,))
-    conn.commit()
-    conn.close()
+    with transacao() as cur:
+        cur.execute("INSERT OR IGNORE INTO contas (nome) VALUES (?)", (nome,))
 
+@em_cache
 def get_contas():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT id, nome FROM contas ORDER BY nome")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    with leitura() as cur:
+        cur.execute("SELECT id, nome FROM contas ORDER BY nome")
+        return cur.fetchall()
 
 # -------------------- SUBCONTAS --------------------
 def add_subconta(nome, conta_id):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO subcontas (nome, conta_id) VALUES (?, ?)", (nome, conta_id))
-    conn.commit()
-    conn.close()
+    with transacao() as cur:
+        cur.execute("INSERT INTO subcontas (nome, conta_id) VALUES (?, ?)", (nome, conta_id))
 
+@em_cache
 def get_subcontas():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
-    SELECT s.id, s.nome, c.nome
-    FROM subcontas s
-    JOIN contas c ON s.conta_id = c.id
-    ORDER BY c.nome, s.nome
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
+    with leitura() as cur:
+        cur.execute("""
+        SELECT s.id, s.nome, c.nome
+        FROM subcontas s
+        JOIN contas c ON s.conta_id = c.id
+        ORDER BY c.nome, s.nome
+        """)
+        return cur.fetchall()
+
+@em_cache
 def pode_excluir_subconta(subconta_id):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT SUM(saldo_atual)
-        FROM subconta_atribuicoes
-        WHERE subconta_id=?
-    """, (subconta_id,))
-    total = cur.fetchone()[0]
-    conn.close()
+    with leitura() as cur:
+        cur.execute("""
+            SELECT SUM(saldo_atual)
+            FROM subconta_atribuicoes
+            WHERE subconta_id=?
+        """, (subconta_id,))
+        total = cur.fetchone()[0]
     return (total or 0) == 0
 
 def delete_subconta(subconta_id):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM subcontas WHERE id=?", (subconta_id,))
-    cur.execute("DELETE FROM subconta_atribuicoes WHERE subconta_id=?", (subconta_id,))
-    cur.execute("DELETE FROM gastos WHERE subconta_id=?", (subconta_id,))
-    conn.commit()
-    conn.close()
+    with transacao() as cur:
+        cur.execute("DELETE FROM subcontas WHERE id=?", (subconta_id,))
+        cur.execute("DELETE FROM subconta_atribuicoes WHERE subconta_id=?", (subconta_id,))
+        cur.execute("DELETE FROM gastos WHERE subconta_id=?", (subconta_id,))
+
+def garantir_reservas():
+    # Garante a conta "Sistema" com a subconta "Reservas" e devolve o id da subconta
+    with transacao() as cur:
+        cur.execute("INSERT OR IGNORE INTO contas (nome) VALUES ('Sistema')")
+        cur.execute("SELECT id FROM contas WHERE nome='Sistema'")
+        conta_id = cur.fetchone()[0]
+        cur.execute("""
+            SELECT id FROM subcontas WHERE nome='Reservas'
+            ORDER BY conta_id = ? DESC, id LIMIT 1
+        """, (conta_id,))
+        row = cur.fetchone()
+        if row:
+            return row[0]
+        cur.execute("INSERT INTO subcontas (nome, conta_id) VALUES ('Reservas', ?)", (conta_id,))
+        return cur.lastrowid
 
 # -------------------- ATRIBUIÇÕES --------------------
 def salvar_valor_subconta(ano_mes, subconta_id, valor):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
-    SELECT id, saldo_inicial, saldo_atual
-    FROM subconta_atribuicoes
-    WHERE subconta_id=? AND ano_mes=?
-    """, (subconta_id, ano_mes))
-    row = cur.fetchone()
-    if row:
-        id_, saldo_inicial, saldo_atual = row
-        saldo_atual += valor
-        cur.execute("UPDATE subconta_atribuicoes SET saldo_atual=? WHERE id=?",
-                    (saldo_atual, id_))
-    else:
-        cur.execute("INSERT INTO subconta_atribuicoes (subconta_id, ano_mes, saldo_inicial, saldo_atual) VALUES (?,?,?,?)",
-                    (subconta_id, ano_mes, valor, valor))
-    conn.commit()
-    conn.close()
+    # Nova atribuição cria o mês; atribuições seguintes somam ao saldo atual
+    with transacao() as cur:
+        cur.execute("""
+        INSERT INTO subconta_atribuicoes (subconta_id, ano_mes, saldo_inicial, saldo_atual)
+        VALUES (?,?,?,?)
+        ON CONFLICT (subconta_id, ano_mes) DO UPDATE SET saldo_atual = saldo_atual + excluded.saldo_atual
+        """, (subconta_id, mes_chave(ano_mes), valor, valor))
 
+@em_cache
 def get_saldos_mes(ano_mes):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
-    SELECT s.id, c.nome, s.nome, sa.saldo_inicial, sa.saldo_atual
-    FROM subcontas s
-    JOIN contas c ON s.conta_id = c.id
-    LEFT JOIN subconta_atribuicoes sa ON sa.subconta_id = s.id AND sa.ano_mes=?
-    ORDER BY c.nome, s.nome
-    """, (ano_mes,))
-    rows = cur.fetchall()
-    conn.close()
+    with leitura() as cur:
+        cur.execute("""
+        SELECT s.id, c.nome, s.nome, sa.saldo_inicial, sa.saldo_atual
+        FROM subcontas s
+        JOIN contas c ON s.conta_id = c.id
+        LEFT JOIN subconta_atribuicoes sa ON sa.subconta_id = s.id AND sa.ano_mes=?
+        ORDER BY c.nome, s.nome
+        """, (mes_chave(ano_mes),))
+        rows = cur.fetchall()
     result = []
     for sid, c_nome, s_nome, inicial, atual in rows:
         inicial = inicial if inicial else 0
@@ -263,128 +158,647 @@ def get_saldos_mes(ano_mes):
         result.append((sid, c_nome, s_nome, inicial, atual))
     return result
 
+# Grade do dashboard: filtro, ordenação e paginação feitos no SQL, para a
+# página trazer só as subcontas que vão aparecer
+ORDENS_SALDOS = {
+    "nome": "c.nome, s.nome",
+    "maior_saldo": "atual DESC, c.nome, s.nome",
+    "menor_saldo": "atual, c.nome, s.nome",
+    "mais_usado": "uso DESC, c.nome, s.nome",
+    "menos_usado": "uso, c.nome, s.nome",
+}
+
+def _filtros_saldos(conta_id, subconta_id, excluir_id):
+    condicoes, params = [], []
+    if conta_id is not None:
+        condicoes.append("s.conta_id = ?")
+        params.append(conta_id)
+    if subconta_id is not None:
+        condicoes.append("s.id = ?")
+        params.append(subconta_id)
+    if excluir_id is not None:
+        condicoes.append("s.id <> ?")
+        params.append(excluir_id)
+    return (" WHERE " + " AND ".join(condicoes) if condicoes else ""), params
+
+@em_cache
+def saldos_mes_pagina(ano_mes, conta_id=None, ordem="nome", pagina=1, por_pagina=12, excluir_id=None):
+    # Mesmas linhas de get_saldos_mes, só as da página pedida (a partir de 1)
+    where, params = _filtros_saldos(conta_id, None, excluir_id)
+    with leitura() as cur:
+        cur.execute(f"""
+        SELECT s.id, c.nome, s.nome,
+               IFNULL(sa.saldo_inicial, 0) AS inicial, IFNULL(sa.saldo_atual, 0) AS atual,
+               CASE WHEN IFNULL(sa.saldo_inicial, 0) = 0 THEN 0
+                    ELSE 1 - IFNULL(sa.saldo_atual, 0) / sa.saldo_inicial END AS uso
+        FROM subcontas s
+        JOIN contas c ON s.conta_id = c.id
+        LEFT JOIN subconta_atribuicoes sa ON sa.subconta_id = s.id AND sa.ano_mes=?
+        {where}
+        ORDER BY {ORDENS_SALDOS[ordem]}
+        LIMIT ? OFFSET ?
+        """, [mes_chave(ano_mes), *params, por_pagina, (max(pagina, 1) - 1) * por_pagina])
+        return [row[:5] for row in cur.fetchall()]
+
+@em_cache
+def resumo_saldos_mes(ano_mes, conta_id=None, subconta_id=None, excluir_id=None):
+    # (quantidade de subcontas, total atribuído, saldo atual) no mês
+    where, params = _filtros_saldos(conta_id, subconta_id, excluir_id)
+    with leitura() as cur:
+        cur.execute(f"""
+        SELECT COUNT(*), IFNULL(SUM(sa.saldo_inicial), 0), IFNULL(SUM(sa.saldo_atual), 0)
+        FROM subcontas s
+        LEFT JOIN subconta_atribuicoes sa ON sa.subconta_id = s.id AND sa.ano_mes=?
+        {where}
+        """, [mes_chave(ano_mes), *params])
+        return cur.fetchone()
+
 # -------------------- GASTOS --------------------
+def _validar_valor(valor):
+    if valor <= 0:
+        raise ValueError("O valor deve ser positivo")
+
 def registrar_gasto(data, valor, descricao, subconta_id, ano_mes):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO gastos (data, valor, descricao, subconta_id, ano_mes) VALUES (?,?,?,?,?)",
-                (data, valor, descricao, subconta_id, ano_mes))
-    cur.execute("""
-    UPDATE subconta_atribuicoes
-    SET saldo_atual = saldo_atual - ?
-    WHERE subconta_id=? AND ano_mes=?
-    """, (valor, subconta_id, ano_mes))
-    conn.commit()
-    conn.close()
+    # Débito condicional: só grava se o saldo do mês cobrir o valor. A
+    # comparação é em centavos (ROUND) para que 0,3 - 0,1 ainda cubra 0,2.
+    # Retorna False (nada gravado) quando o saldo é insuficiente.
+    _validar_valor(valor)
+    data, ano_mes = data_iso(data), mes_chave(ano_mes)
+    with transacao() as cur:
+        cur.execute("""
+        UPDATE subconta_atribuicoes
+        SET saldo_atual = ROUND(saldo_atual - ?, 2)
+        WHERE subconta_id=? AND ano_mes=? AND ROUND(saldo_atual, 2) >= ROUND(?, 2)
+        """, (valor, subconta_id, ano_mes, valor))
+        if cur.rowcount == 0:
+            return False
+        cur.execute("INSERT INTO gastos (data, valor, descricao, subconta_id, ano_mes) VALUES (?,?,?,?,?)",
+                    (data, valor, descricao, subconta_id, ano_mes))
+    return True
+
+def listar_gastos(data_inicio, data_fim, subconta_id=None):
+    sql = """
+    SELECT id, data, valor, descricao, subconta_id
+    FROM gastos
+    WHERE data BETWEEN ? AND ?
+    """
+    params = [data_iso(data_inicio), data_iso(data_fim)]
+    if subconta_id is not None:
+        sql += " AND subconta_id=?"
+        params.append(subconta_id)
+    with leitura() as cur:
+        cur.execute(sql + " ORDER BY data, id", params)
+        rows = cur.fetchall()
+    return [(gid, data_br(data), valor, desc, sid) for gid, data, valor, desc, sid in rows]
 
 # -------------------- TRANSFERÊNCIAS --------------------
 def registrar_transferencia(data, origem, destino, valor, justificativa, mes_ano):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-
-    c.execute("UPDATE subconta_atribuicoes SET saldo_atual = saldo_atual - ? WHERE subconta_id=? AND ano_mes=?", (valor, origem, mes_ano))
-    c.execute("UPDATE subconta_atribuicoes SET saldo_atual = saldo_atual + ? WHERE subconta_id=? AND ano_mes=?", (valor, destino, mes_ano))
-
-    c.execute("""
-    INSERT INTO transferencias (data, subconta_origem, subconta_destino, valor, justificativa, mes_ano)
-    VALUES (?, ?, ?, ?, ?, ?)
-    """, (data, origem, destino, valor, justificativa, mes_ano))
+    # Mesmo débito condicional de registrar_gasto; o destino ganha a linha do
+    # mês se ainda não tiver. Retorna False quando a origem não tem saldo.
+    _validar_valor(valor)
+    data, mes_ano = data_iso(data), mes_chave(mes_ano)
+    with transacao() as c:
+        c.execute("""
+        UPDATE subconta_atribuicoes SET saldo_atual = ROUND(saldo_atual - ?, 2)
+        WHERE subconta_id=? AND ano_mes=? AND ROUND(saldo_atual, 2) >= ROUND(?, 2)
+        """, (valor, origem, mes_ano, valor))
+        if c.rowcount == 0:
+            return False
+        c.execute("""
+        INSERT INTO subconta_atribuicoes (subconta_id, ano_mes, saldo_inicial, saldo_atual)
+        VALUES (?, ?, 0, ?)
+        ON CONFLICT (subconta_id, ano_mes) DO UPDATE SET saldo_atual = saldo_atual + excluded.saldo_atual
+        """, (destino, mes_ano, valor))
+
+        c.execute("""
+        INSERT INTO transferencias (data, subconta_origem, subconta_destino, valor, justificativa, mes_ano)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, (data, origem, destino, valor, justificativa, mes_ano))
+    return True
+
+def listar_transferencias(data_inicio, data_fim, subconta_id=None):
+    sql = """
+    SELECT id, data, subconta_origem, subconta_destino, valor, justificativa, mes_ano
+    FROM transferencias
+    WHERE data BETWEEN ? AND ?
+    """
+    params = [data_iso(data_inicio), data_iso(data_fim)]
+    if subconta_id is not None:
+        sql += " AND (subconta_origem=? OR subconta_destino=?)"
+        params += [subconta_id, subconta_id]
+    with leitura() as cur:
+        cur.execute(sql + " ORDER BY data, id", params)
+        rows = cur.fetchall()
+    return [(tid, data_br(data), origem, destino, valor, just, mes_br(mes_ano))
+            for tid, data, origem, destino, valor, just, mes_ano in rows]
+
+# -------------------- HISTÓRICO --------------------
+# Paginação por chave (keyset), do mais recente para o mais antigo: cada
+# página recebe o (data, id) da última linha da anterior e busca direto no
+# índice, sem OFFSET. Retorna (linhas, proximo); proximo é None na última página.
+TAMANHO_PAGINA = 50
+
+def _filtros_historico(data_inicio, data_fim, valor_min, valor_max, apos):
+    filtros, params = [], []
+    if data_inicio:
+        filtros.append("data >= ?")
+        params.append(data_iso(data_inicio))
+    if data_fim:
+        filtros.append("data <= ?")
+        params.append(data_iso(data_fim))
+    if valor_min is not None:
+        filtros.append("valor >= ?")
+        params.append(valor_min)
+    if valor_max is not None:
+        filtros.append("valor <= ?")
+        params.append(valor_max)
+    if apos is not None:
+        filtros.append("(data, id) < (?, ?)")
+        params += list(apos)
+    return "".join(f" AND {f}" for f in filtros), params
+
+def _pagina(rows, limite):
+    if len(rows) > limite:
+        rows = rows[:limite]
+        return rows, (rows[-1][1], rows[-1][0])
+    return rows, None
+
+def historico_gastos(subconta_id=None, data_inicio=None, data_fim=None, valor_min=None, valor_max=None,
+                     apos=None, limite=TAMANHO_PAGINA):
+    filtros, params = _filtros_historico(data_inicio, data_fim, valor_min, valor_max, apos)
+    if subconta_id is not None:
+        filtros = " AND subconta_id = ?" + filtros
+        params.insert(0, subconta_id)
+    with leitura() as cur:
+        cur.execute(f"""
+            SELECT id, data, valor, descricao, subconta_id, ano_mes
+            FROM gastos
+            WHERE 1=1{filtros}
+            ORDER BY data DESC, id DESC
+            LIMIT ?
+        """, params + [limite + 1])
+        rows, proximo = _pagina(cur.fetchall(), limite)
+    return [(gid, data_br(data), valor, desc, sid, mes_br(ano_mes))
+            for gid, data, valor, desc, sid, ano_mes in rows], proximo
+
+def historico_transferencias(subconta_id=None, data_inicio=None, data_fim=None, valor_min=None,
+                             valor_max=None, apos=None, limite=TAMANHO_PAGINA):
+    filtros, params = _filtros_historico(data_inicio, data_fim, valor_min, valor_max, apos)
+    colunas = "SELECT id, data, subconta_origem, subconta_destino, valor, justificativa, mes_ano FROM transferencias"
+    ordem = "ORDER BY data DESC, id DESC LIMIT ?"
+    if subconta_id is None:
+        sql = f"{colunas} WHERE 1=1{filtros} {ordem}"
+        params = params + [limite + 1]
+    else:
+        # Uma busca por índice para cada lado da transferência
+        sql = f"""
+            SELECT * FROM (
+                SELECT * FROM ({colunas} WHERE subconta_origem = ?{filtros} {ordem})
+                UNION ALL
+                SELECT * FROM ({colunas} WHERE subconta_destino = ? AND subconta_origem != ?{filtros} {ordem})
+            ) {ordem}
+        """
+        params = ([subconta_id] + params + [limite + 1] +
+                  [subconta_id, subconta_id] + params + [limite + 1] + [limite + 1])
+    with leitura() as cur:
+        cur.execute(sql, params)
+        rows, proximo = _pagina(cur.fetchall(), limite)
+    return [(tid, data_br(data), origem, destino, valor, just, mes_br(mes_ano))
+            for tid, data, origem, destino, valor, just, mes_ano in rows], proximo
+
+# -------------------- BUSCA --------------------
+# Busca textual (FTS5) em receitas, gastos, transferências e empréstimos;
+# o índice é mantido por gatilhos (migração V9).
+_TIPO_POR_TABELA = {tabela: tipo for tipo, (tabela, _, _) in TIPOS_BUSCA.items()}
+_PALAVRA = re.compile(r"\w+")
+
+def _expressao_busca(texto):
+    # Cada palavra vira um prefixo entre aspas: "merc farm" -> "merc"* "farm"*
+    return " ".join(f'"{p}"*' for p in _PALAVRA.findall(texto or ""))
+
+@em_cache
+def buscar(texto, tabelas=None, limite=50, marcador=("[", "]")):
+    # Retorna [(tabela, id, data, valor, texto, extra)] pela relevância (bm25),
+    # com os termos encontrados entre os marcadores
+    expressao = _expressao_busca(texto)
+    if not expressao:
+        return []
+    filtro, params = "", [*marcador, *marcador, expressao]
+    if tabelas:
+        tipos = [_TIPO_POR_TABELA[t] for t in tabelas]
+        filtro = f" AND busca.rowid % 8 IN ({','.join('?' * len(tipos))})"
+        params += tipos
+    with leitura() as cur:
+        cur.execute(f"""
+            SELECT busca.rowid % 8, busca.rowid / 8,
+                   highlight(busca, 0, ?, ?), highlight(busca, 1, ?, ?),
+                   COALESCE(r.data, g.data, t.data), e.primeira_parcela,
+                   COALESCE(r.valor, g.valor, t.valor, e.valor_parcela)
+            FROM busca
+            LEFT JOIN receitas r ON busca.rowid % 8 = 1 AND r.id = busca.rowid / 8
+            LEFT JOIN gastos g ON busca.rowid % 8 = 2 AND g.id = busca.rowid / 8
+            LEFT JOIN transferencias t ON busca.rowid % 8 = 3 AND t.id = busca.rowid / 8
+            LEFT JOIN emprestimos e ON busca.rowid % 8 = 4 AND e.id = busca.rowid / 8
+            WHERE busca MATCH ?{filtro}
+            ORDER BY rank, busca.rowid DESC
+            LIMIT ?
+        """, params + [limite])
+        rows = cur.fetchall()
+    return [(TIPOS_BUSCA[tipo][0], rid, data_br(data) if data else mes_br(mes) if mes else None, valor, texto, extra)
+            for tipo, rid, texto, extra, data, mes, valor in rows]
+
+# -------------------- FECHAMENTO DE MÊS --------------------
+# Justificativa das transferências da varredura; quem as identifica é a
+# coluna transferencias.automatica, não o texto
+JUSTIFICATIVA_SOBRA = "Sobra automática de {}"
+
+def fechar_mes(ano_mes, reservas_id, data=None):
+    # Varre as sobras das subcontas para a Reservas do mês seguinte numa única
+    # transação, e leva junto o saldo da própria Reservas; assim a Reservas do
+    # mês corrente acumula tudo o que sobrou dos meses já fechados.
+    # Devolve (subcontas, valor) das outras subcontas ou None se o mês já
+    # estava fechado.
+    ano_mes = mes_chave(ano_mes)
+    data = data_iso(data or datetime.now().date())
+    with transacao() as cur:
+        cur.execute("INSERT OR IGNORE INTO meses_fechados (ano_mes, fechado_em) VALUES (?, ?)",
+                    (ano_mes, datetime.now().isoformat()))
+        if cur.rowcount == 0:
+            return None
 
-    conn.commit()
-    conn.close()
+        cur.execute("""
+            INSERT INTO transferencias (data, subconta_origem, subconta_destino, valor, justificativa, mes_ano,
+                                        automatica)
+            SELECT ?, subconta_id, ?, saldo_atual, ?, ano_mes, 1
+            FROM subconta_atribuicoes
+            WHERE ano_mes=? AND saldo_atual > 0 AND subconta_id != ?
+            ORDER BY subconta_id
+        """, (data, reservas_id, JUSTIFICATIVA_SOBRA.format(mes_br(ano_mes)), ano_mes, reservas_id))
+        cur.execute("""
+            SELECT IFNULL(SUM(subconta_id != ?), 0),
+                   IFNULL(SUM(CASE WHEN subconta_id != ? THEN saldo_atual END), 0),
+                   IFNULL(SUM(saldo_atual), 0)
+            FROM subconta_atribuicoes
+            WHERE ano_mes=? AND saldo_atual > 0
+        """, (reservas_id, reservas_id, ano_mes))
+        quantidade, total, levado = cur.fetchone()
+
+        if levado:
+            cur.execute("""
+                INSERT INTO subconta_atribuicoes (subconta_id, ano_mes, saldo_inicial, saldo_atual)
+                VALUES (?, ?, 0, ?)
+                ON CONFLICT (subconta_id, ano_mes) DO UPDATE SET saldo_atual = saldo_atual + excluded.saldo_atual
+            """, (reservas_id, somar_meses(ano_mes, 1), levado))
+            cur.execute("UPDATE subconta_atribuicoes SET saldo_atual = 0 WHERE ano_mes=? AND saldo_atual > 0",
+                        (ano_mes,))
+        cur.execute("UPDATE meses_fechados SET subcontas_varridas=?, valor_varrido=? WHERE ano_mes=?",
+                    (quantidade, total, ano_mes))
+    return quantidade, total
+
+def meses_pendentes_fechamento(mes_atual):
+    with leitura() as cur:
+        cur.execute("""
+            SELECT DISTINCT ano_mes FROM subconta_atribuicoes
+            WHERE ano_mes < ? AND ano_mes NOT IN (SELECT ano_mes FROM meses_fechados)
+            ORDER BY ano_mes
+        """, (mes_chave(mes_atual),))
+        return [mes for mes, in cur.fetchall()]
+
+def fechar_meses_pendentes(mes_atual, reservas_id, data=None):
+    # Fecha, em ordem, todos os meses anteriores ao atual que ainda não foram
+    # fechados (o app pode ter ficado dias ou meses sem ser aberto). A lista é
+    # relida a cada fechamento: levar a Reservas para o mês seguinte pode
+    # criar a linha de um mês que ainda não tinha atribuições.
+    fechados = []
+    pendentes = meses_pendentes_fechamento(mes_atual)
+    while pendentes:
+        mes = pendentes[0]
+        resultado = fechar_mes(mes, reservas_id, data)
+        if resultado is not None:
+            fechados.append((mes_br(mes),) + resultado)
+        pendentes = meses_pendentes_fechamento(mes_atual)
+    return fechados
 
 # -------------------- EMPRÉSTIMOS --------------------
-def registrar_emprestimo(instituicao, contrato, tipo, primeira_parcela, qtd_parcelas, valor_parcela):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
+def _inserir_emprestimo(cur, instituicao, contrato, tipo, primeira_parcela, qtd_parcelas,
+                        valor_parcela=None, sistema="FIXO", taxa_juros=0.0, valor_financiado=None):
+    meses, parcelas, amortizacoes, juros = gerar_cronograma(
+        primeira_parcela, qtd_parcelas, sistema, valor_parcela, valor_financiado, taxa_juros)
     cur.execute("""
-        INSERT INTO emprestimos (instituicao, contrato, tipo, primeira_parcela, qtd_parcelas, valor_parcela)
-        VALUES (?,?,?,?,?,?)
-    """, (instituicao, contrato, tipo, primeira_parcela, qtd_parcelas, valor_parcela))
+        INSERT INTO emprestimos (instituicao, contrato, tipo, primeira_parcela, qtd_parcelas, valor_parcela,
+                                 sistema, taxa_juros, valor_financiado)
+        VALUES (?,?,?,?,?,?,?,?,?)
+    """, (instituicao, contrato, tipo, meses[0], qtd_parcelas, parcelas[0],
+          sistema.upper(), taxa_juros, valor_financiado))
     emprestimo_id = cur.lastrowid
-
-    mes, ano = map(int, primeira_parcela.split("/"))
-    for i in range(qtd_parcelas):
-        mes_atual = (mes + i - 1) % 12 + 1
-        ano_atual = ano + (mes + i - 1) // 12
-        mes_ano = f"{mes_atual:02d}/{ano_atual}"
+    cur.executemany("""
+        INSERT INTO parcelas_emprestimo (emprestimo_id, mes_ano, valor_original, amortizacao, juros)
+        VALUES (?,?,?,?,?)
+    """, zip(repeat(emprestimo_id), meses, parcelas, amortizacoes, juros))
+    return emprestimo_id
+
+def registrar_emprestimo(instituicao, contrato, tipo, primeira_parcela, qtd_parcelas, valor_parcela=None,
+                         sistema="FIXO", taxa_juros=0.0, valor_financiado=None):
+    # FIXO usa valor_parcela; PRICE e SAC calculam as parcelas a partir de
+    # valor_financiado e taxa_juros (mensal, em fração: 0.01 = 1% a.m.)
+    with transacao() as cur:
+        return _inserir_emprestimo(cur, instituicao, contrato, tipo, primeira_parcela, qtd_parcelas,
+                                   valor_parcela, sistema, taxa_juros, valor_financiado)
+
+def importar_emprestimos(contratos):
+    # contratos: iterável de dicts com os mesmos argumentos de registrar_emprestimo
+    with transacao() as cur:
+        return [_inserir_emprestimo(cur, **contrato) for contrato in contratos]
+
+@em_cache
+def simular_quitacao_antecipada(emprestimo_id, mes_pagamento, qtd_parcelas=None):
+    # Antecipa as últimas parcelas em aberto (todas, se qtd_parcelas=None),
+    # descontando os juros pela taxa do contrato. None se o empréstimo não existe.
+    with leitura() as cur:
+        cur.execute("SELECT taxa_juros FROM emprestimos WHERE id=?", (emprestimo_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        taxa = row[0] or 0
         cur.execute("""
-            INSERT INTO parcelas_emprestimo (emprestimo_id, mes_ano, valor_original, valor_quitado, data_quitacao)
-            VALUES (?,?,?,?,?)
-        """, (emprestimo_id, mes_ano, valor_parcela, None, None))
-
-    conn.commit()
-    conn.close()
+            SELECT id, mes_ano, valor_original
+            FROM parcelas_emprestimo
+            WHERE emprestimo_id=? AND valor_quitado IS NULL
+            ORDER BY mes_ano DESC, id DESC
+        """, (emprestimo_id,))
+        rows = cur.fetchall() if qtd_parcelas is None else cur.fetchmany(qtd_parcelas)
+    simulacao = descontar_parcelas(reversed(rows), mes_pagamento, taxa)
+    return [(pid, mes_br(mes_ano), valor, vp, desconto) for pid, mes_ano, valor, vp, desconto in simulacao]
+
+@em_cache
+def resumo_emprestimos(apenas_ativos=False, quitadas_no_mes=None):
+    # Uma linha por empréstimo, agregando as parcelas numa única consulta:
+    # (id, instituicao, contrato, tipo, qtd_parcelas, valor_parcela, economia,
+    #  parcelas_abertas, parcelas_quitadas, proximo_vencimento, saldo_devedor)
+    filtros = []
+    params = []
+    if quitadas_no_mes is not None:
+        inicio, fim = intervalo_mes(quitadas_no_mes)
+        filtros.append("SUM(p.valor_quitado IS NOT NULL AND p.data_quitacao BETWEEN ? AND ?) > 0")
+        params += [inicio, fim]
+    if apenas_ativos:
+        filtros.append("SUM(p.id IS NOT NULL AND p.valor_quitado IS NULL) > 0")
+    having = f"HAVING {' AND '.join(filtros)}" if filtros else ""
+    with leitura() as cur:
+        cur.execute(f"""
+        SELECT e.id, e.instituicao, e.contrato, e.tipo, e.qtd_parcelas, e.valor_parcela,
+               IFNULL(SUM(CASE WHEN p.valor_quitado IS NOT NULL THEN p.valor_original - p.valor_quitado END), 0),
+               IFNULL(SUM(p.id IS NOT NULL AND p.valor_quitado IS NULL), 0),
+               IFNULL(SUM(p.valor_quitado IS NOT NULL), 0),
+               MIN(CASE WHEN p.valor_quitado IS NULL THEN p.mes_ano END),
+               IFNULL(SUM(CASE WHEN p.valor_quitado IS NULL THEN p.valor_original END), 0)
+        FROM emprestimos e
+        LEFT JOIN parcelas_emprestimo p ON p.emprestimo_id = e.id
+        GROUP BY e.id
+        {having}
+        ORDER BY e.id
+        """, params)
+        rows = cur.fetchall()
+    return [row[:9] + (mes_br(row[9]) if row[9] else None, row[10]) for row in rows]
 
 def listar_emprestimos():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT id, instituicao, contrato, tipo, qtd_parcelas, valor_parcela FROM emprestimos")
-    rows = cur.fetchall()
-    conn.close()
-
-    result = []
-    for (eid, inst, contrato, tipo, qtd, valor) in rows:
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("SELECT SUM(valor_original - IFNULL(valor_quitado, valor_original)) FROM parcelas_emprestimo WHERE emprestimo_id=? AND valor_quitado IS NOT NULL", (eid,))
-        economia = cur.fetchone()[0]
-        conn.close()
-        economia = economia if economia else 0
-        result.append((eid, inst, contrato, tipo, qtd, valor, economia))
-    return result
+    return [row[:7] for row in resumo_emprestimos()]
 
+@em_cache
 def listar_parcelas(emprestimo_id):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT id, mes_ano, valor_original, valor_quitado, data_quitacao FROM parcelas_emprestimo WHERE emprestimo_id=? ORDER BY id", (emprestimo_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def quitar_parcela(parcela_id, valor_quitado, data_quitacao):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE parcelas_emprestimo
-        SET valor_quitado=?, data_quitacao=?
-        WHERE id=?
-    """, (valor_quitado, data_quitacao, parcela_id))
-    conn.commit()
-    conn.close()
-
-def verificar_quitacoes_automaticas(ano_mes, data_receita):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, emprestimo_id, valor_original
+    with leitura() as cur:
+        cur.execute("SELECT id, mes_ano, valor_original, valor_quitado, data_quitacao FROM parcelas_emprestimo WHERE emprestimo_id=? ORDER BY id", (emprestimo_id,))
+        rows = cur.fetchall()
+    return [(pid, mes_br(mes_ano), orig, quitado, data_br(data_q)) for pid, mes_ano, orig, quitado, data_q in rows]
+
+def listar_parcelas_quitadas(data_inicio, data_fim):
+    # Parcelas pagas no período, pelo índice de data_quitacao
+    with leitura() as cur:
+        cur.execute("""
+        SELECT id, emprestimo_id, mes_ano, valor_original, valor_quitado, data_quitacao
         FROM parcelas_emprestimo
-        WHERE mes_ano=? AND valor_quitado IS NULL
-        ORDER BY id
-    """, (ano_mes,))
-    parcelas = cur.fetchall()
+        WHERE data_quitacao BETWEEN ? AND ? AND valor_quitado IS NOT NULL
+        ORDER BY data_quitacao, id
+        """, (data_iso(data_inicio), data_iso(data_fim)))
+        rows = cur.fetchall()
+    return [(pid, eid, mes_br(mes_ano), orig, quitado, data_br(data_q))
+            for pid, eid, mes_ano, orig, quitado, data_q in rows]
 
-    for pid, eid, valor in parcelas:
+def quitar_parcela(parcela_id, valor_quitado, data_quitacao):
+    with transacao() as cur:
         cur.execute("""
             UPDATE parcelas_emprestimo
             SET valor_quitado=?, data_quitacao=?
             WHERE id=?
-        """, (valor, data_receita, pid))
+        """, (valor_quitado, data_iso(data_quitacao), parcela_id))
+
+def quitar_parcelas(quitacoes, data_quitacao):
+    # Quitação em lote: [(parcela_id, valor_quitado)] numa só transação.
+    # Parcelas já quitadas são ignoradas; retorna quantas foram quitadas
+    data = data_iso(data_quitacao)
+    with transacao() as cur:
+        cur.executemany("""
+            UPDATE parcelas_emprestimo
+            SET valor_quitado=?, data_quitacao=?
+            WHERE id=? AND valor_quitado IS NULL
+        """, [(valor, data, pid) for pid, valor in quitacoes])
+        return cur.rowcount
+
+@em_cache
+def candidatos_antecipacao(mes_pagamento):
+    # Parcelas em aberto que vencem depois de mes_pagamento, de todos os empréstimos:
+    # (parcela_id, emprestimo_id, instituicao, contrato, mes_ano, valor_original, taxa_juros)
+    with leitura() as cur:
+        cur.execute("""
+            SELECT p.id, e.id, e.instituicao, e.contrato, p.mes_ano, p.valor_original, IFNULL(e.taxa_juros, 0)
+            FROM parcelas_emprestimo p
+            JOIN emprestimos e ON e.id = p.emprestimo_id
+            WHERE p.valor_quitado IS NULL AND p.mes_ano > ?
+            ORDER BY e.id, p.mes_ano
+        """, (mes_chave(mes_pagamento),))
+        rows = cur.fetchall()
+    return [row[:4] + (mes_br(row[4]),) + row[5:] for row in rows]
+
+def otimizar_quitacoes(mes_pagamento, orcamento, taxas=None):
+    # Escolhe as parcelas a antecipar que dão o maior desconto sem passar do
+    # orçamento. taxas: {emprestimo_id: taxa mensal} sobrepõe a do contrato.
+    # Retorna ([(parcela_id, emprestimo_id, instituicao, contrato, mes, valor_original,
+    #            valor_presente, desconto)], custo_total, economia_total, metodo)
+    mes_pagamento = mes_chave(mes_pagamento)
+    taxas = taxas or {}
+    candidatos = []
+    for pid, eid, inst, contrato, mes, valor, taxa in candidatos_antecipacao(mes_pagamento):
+        vp = valor_presente(valor, meses_entre_chaves(mes_pagamento, mes_chave(mes)), taxas.get(eid, taxa))
+        candidatos.append((pid, eid, inst, contrato, mes, valor, vp, round(valor - vp, 2)))
+    escolhidos, custo, economia, metodo = otimizar_quitacao(
+        [c[6] for c in candidatos], [c[7] for c in candidatos], orcamento)
+    return [candidatos[i] for i in escolhidos], custo, economia, metodo
+
+def saldo_reservas(ano_mes, reservas_id):
+    # Saldo disponível na Reservas: a linha do mês, que recebe as sobras de
+    # todos os meses já fechados (fechar_mes leva tudo para o mês seguinte)
+    return resumo_saldos_mes(ano_mes, subconta_id=reservas_id)[2]
+
+def quitar_com_reservas(quitacoes, data_quitacao, reservas_id, ano_mes):
+    # Quita [(parcela_id, valor)] e debita o total da Reservas na mesma
+    # transação. Meses anteriores ainda abertos são fechados antes, para que
+    # o débito saia do mesmo saldo de saldo_reservas. Retorna a quantidade
+    # quitada ou None se faltar saldo.
+    total = round(sum(valor for _, valor in quitacoes), 2)
+    with transacao():
+        fechar_meses_pendentes(ano_mes, reservas_id, data_quitacao)
+        if not registrar_gasto(data_quitacao, total, f"Quitação antecipada de {len(quitacoes)} parcela(s)",
+                               reservas_id, ano_mes):
+            return None
+        qtd = quitar_parcelas(quitacoes, data_quitacao)
+        if qtd != len(quitacoes):
+            raise ValueError("Algumas parcelas do plano já foram quitadas; recalcule o plano.")
+    return qtd
 
-        cur.execute("SELECT instituicao, contrato FROM emprestimos WHERE id=?", (eid,))
-        inst, contrato = cur.fetchone()
-        descricao = f"Parcela empréstimo {inst} contrato {contrato}"
-        cur.execute("INSERT INTO gastos (data, valor, descricao, subconta_id, ano_mes) VALUES (?,?,?,?,?)",
-                    (data_receita, valor, descricao, None, ano_mes))
+def verificar_quitacoes_automaticas(ano_mes, data_receita):
+    # Quita de uma vez todas as parcelas em aberto do mês e lança os gastos
+    # correspondentes; retorna (quantidade, valor_total) do que foi quitado
+    ano_mes, data_receita = mes_chave(ano_mes), data_iso(data_receita)
+    with transacao() as cur:
+        cur.execute("""
+            SELECT COUNT(*), IFNULL(SUM(valor_original), 0)
+            FROM parcelas_emprestimo
+            WHERE mes_ano=? AND valor_quitado IS NULL
+        """, (ano_mes,))
+        resumo = cur.fetchone()
+        if not resumo[0]:
+            return resumo
 
-    conn.commit()
-    conn.close()
+        cur.execute("""
+            INSERT INTO gastos (data, valor, descricao, subconta_id, ano_mes)
+            SELECT ?, p.valor_original,
+                   'Parcela empréstimo ' || e.instituicao || ' contrato ' || e.contrato,
+                   NULL, p.mes_ano
+            FROM parcelas_emprestimo p
+            JOIN emprestimos e ON e.id = p.emprestimo_id
+            WHERE p.mes_ano=? AND p.valor_quitado IS NULL
+            ORDER BY p.id
+        """, (data_receita, ano_mes))
+        cur.execute("""
+            UPDATE parcelas_emprestimo
+            SET valor_quitado=valor_original, data_quitacao=?
+            WHERE mes_ano=? AND valor_quitado IS NULL
+        """, (data_receita, ano_mes))
+    return resumo
 
 # -------------------- NOVO: EXCLUIR EMPRÉSTIMO --------------------
 def excluir_emprestimo(emprestimo_id):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM parcelas_emprestimo WHERE emprestimo_id=?", (emprestimo_id,))
-    cur.execute("DELETE FROM emprestimos WHERE id=?", (emprestimo_id,))
-    conn.commit()
-    conn.close()
+    with transacao() as cur:
+        cur.execute("DELETE FROM parcelas_emprestimo WHERE emprestimo_id=?", (emprestimo_id,))
+        cur.execute("DELETE FROM emprestimos WHERE id=?", (emprestimo_id,))
+
+# -------------------- RELATÓRIOS DE PERÍODO --------------------
+@em_cache
+def totais_por_mes(mes_inicio, mes_fim):
+    # Uma linha por mês da janela, com consultas agrupadas (independe do nº de meses):
+    # (ano_mes, receitas, atribuido, saldo, gastos, transferido,
+    #  parcelas_pagas, valor_parcelas, economia_parcelas)
+    inicio, fim = mes_chave(mes_inicio), mes_chave(mes_fim)
+    data_ini, data_fim = intervalo_mes(inicio, fim)
+    meses = {m: [0, 0, 0, 0, 0, 0, 0, 0] for m in meses_entre(inicio, fim)}
+    with leitura() as cur:
+        cur.execute("""
+            SELECT ano_mes, SUM(valor) FROM receitas
+            WHERE ano_mes BETWEEN ? AND ? GROUP BY ano_mes
+        """, (inicio, fim))
+        for mes, total in cur.fetchall():
+            meses[mes][0] = total
+        cur.execute("""
+            SELECT ano_mes, SUM(saldo_inicial), SUM(saldo_atual) FROM subconta_atribuicoes
+            WHERE ano_mes BETWEEN ? AND ? GROUP BY ano_mes
+        """, (inicio, fim))
+        for mes, inicial, atual in cur.fetchall():
+            meses[mes][1:3] = [inicial or 0, atual or 0]
+        cur.execute("""
+            SELECT ano_mes, SUM(valor) FROM gastos
+            WHERE ano_mes BETWEEN ? AND ? AND subconta_id IS NOT NULL GROUP BY ano_mes
+        """, (inicio, fim))
+        for mes, total in cur.fetchall():
+            meses[mes][3] = total
+        cur.execute("""
+            SELECT mes_ano, SUM(valor) FROM transferencias
+            WHERE mes_ano BETWEEN ? AND ? GROUP BY mes_ano
+        """, (inicio, fim))
+        for mes, total in cur.fetchall():
+            meses[mes][4] = total
+        cur.execute("""
+            SELECT CAST(substr(data_quitacao, 1, 4) AS INTEGER) * 100 + CAST(substr(data_quitacao, 6, 2) AS INTEGER),
+                   COUNT(*), SUM(valor_quitado), SUM(valor_original - valor_quitado)
+            FROM parcelas_emprestimo
+            WHERE data_quitacao BETWEEN ? AND ? AND valor_quitado IS NOT NULL
+            GROUP BY 1
+        """, (data_ini, data_fim))
+        for mes, qtd, pago, economia in cur.fetchall():
+            meses[mes][5:8] = [qtd, pago, economia]
+    return [(mes_br(mes),) + tuple(valores) for mes, valores in meses.items()]
+
+@em_cache
+def totais_por_subconta(mes_inicio, mes_fim):
+    # (id, conta, subconta, planejado, gasto, transferencias_liquidas, saldo) somados na janela.
+    # Gastos entram pelo mês de competência (ano_mes), como receitas e atribuições.
+    inicio, fim = mes_chave(mes_inicio), mes_chave(mes_fim)
+    totais = {}
+    def linha(sid):
+        return totais.setdefault(sid, [0, 0, 0, 0])
+    with leitura() as cur:
+        cur.execute("""
+            SELECT subconta_id, SUM(saldo_inicial), SUM(saldo_atual) FROM subconta_atribuicoes
+            WHERE ano_mes BETWEEN ? AND ? GROUP BY subconta_id
+        """, (inicio, fim))
+        for sid, inicial, atual in cur.fetchall():
+            linha(sid)[0] = inicial or 0
+            linha(sid)[3] = atual or 0
+        cur.execute("""
+            SELECT subconta_id, SUM(valor) FROM gastos
+            WHERE ano_mes BETWEEN ? AND ? AND subconta_id IS NOT NULL GROUP BY subconta_id
+        """, (inicio, fim))
+        for sid, total in cur.fetchall():
+            linha(sid)[1] = total
+        cur.execute("""
+            SELECT subconta_origem, subconta_destino, SUM(valor) FROM transferencias
+            WHERE mes_ano BETWEEN ? AND ? GROUP BY subconta_origem, subconta_destino
+        """, (inicio, fim))
+        for origem, destino, total in cur.fetchall():
+            linha(origem)[2] -= total
+            linha(destino)[2] += total
+    return [(sid, c_nome, s_nome) + tuple(totais.get(sid, (0, 0, 0, 0)))
+            for sid, s_nome, c_nome in get_subcontas()]
+
+# -------------------- IMPORTAÇÃO EM LOTE --------------------
+def registrar_lote(receitas, gastos):
+    # receitas: [(data, origem, valor, descricao)]; gastos: [(data, valor, descricao, subconta_id)]
+    # Mesma semântica de add_receita/registrar_gasto, numa única transação; os
+    # débitos do extrato já aconteceram no banco e entram sem checar o saldo,
+    # mas arredondados em centavos como em registrar_gasto
+    receitas = [(data_iso(d), origem, valor, desc, mes_da_data(d)) for d, origem, valor, desc in receitas]
+    gastos = [(data_iso(d), valor, desc, sid, mes_da_data(d)) for d, valor, desc, sid in gastos]
+
+    debitos = {}
+    for _, valor, _, sid, ano_mes in gastos:
+        if sid is not None:
+            debitos[(sid, ano_mes)] = debitos.get((sid, ano_mes), 0) + valor
+    # Primeira receita de cada mês dispara as quitações automáticas daquele mês
+    primeiras = {}
+    for data, _, _, _, ano_mes in receitas:
+        if ano_mes not in primeiras or data < primeiras[ano_mes]:
+            primeiras[ano_mes] = data
+
+    quitadas, total_quitado = 0, 0
+    with transacao() as cur:
+        cur.executemany("INSERT INTO receitas (data, origem, valor, descricao, ano_mes) VALUES (?,?,?,?,?)", receitas)
+        cur.executemany("INSERT INTO gastos (data, valor, descricao, subconta_id, ano_mes) VALUES (?,?,?,?,?)", gastos)
+        cur.executemany("""
+        UPDATE subconta_atribuicoes
+        SET saldo_atual = ROUND(saldo_atual - ?, 2)
+        WHERE subconta_id=? AND ano_mes=?
+        """, [(valor, sid, ano_mes) for (sid, ano_mes), valor in debitos.items()])
+        for ano_mes, data in sorted(primeiras.items()):
+            n, total = verificar_quitacoes_automaticas(ano_mes, data)
+            quitadas += n
+            total_quitado += total
+    return len(receitas), len(gastos), quitadas, total_quitado
@@ -0,0 +1,170 @@
+import csv
+import io
+import re
+import unicodedata
+from collections import namedtuple
+from itertools import islice
+
+from datas import data_iso
+from db import registrar_lote
+
+# Importação de extratos bancários (CSV/OFX). Os leitores são geradores:
+# o arquivo é percorrido uma única vez e só um lote fica em memória.
+
+Lancamento = namedtuple("Lancamento", "data valor descricao")
+
+TAMANHO_LOTE = 5000
+
+# -------------------- HELPERS --------------------
+def _normalizar(texto):
+    texto = texto or ""
+    if texto.isascii():
+        return texto.strip().lower()
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(ch for ch in texto if not unicodedata.combining(ch)).strip().lower()
+
+def _texto(arquivo, encoding):
+    # Aceita caminho, arquivo binário (ex.: upload do Streamlit) ou arquivo texto
+    if isinstance(arquivo, str):
+        return open(arquivo, encoding=encoding, newline="")
+    if isinstance(arquivo, io.TextIOBase):
+        return arquivo
+    return io.TextIOWrapper(arquivo, encoding=encoding, newline="")
+
+def converter_valor(texto):
+    # "1.234,56", "1,234.56", "-1234.56", "R$ 10,00", "(50,00)". Com os dois
+    # separadores, o último é o decimal; um separador repetido ("1.234.567")
+    # é de milhar; sozinho, é o decimal. Milhar fora de grupos de 3 dígitos
+    # é rejeitado em vez de virar outro número.
+    texto = texto.strip().replace("R$", "").replace(" ", "")
+    negativo = texto.startswith("(") and texto.endswith(")")
+    texto = texto.strip("()")
+    virgula, ponto = texto.rfind(","), texto.rfind(".")
+    if virgula >= 0 and ponto >= 0:
+        decimal = "," if virgula > ponto else "."
+    elif texto.count(",") == 1 or texto.count(".") == 1:
+        decimal = "," if virgula >= 0 else "."
+    else:
+        decimal = None
+    inteiro, _, fracao = texto.rpartition(decimal) if decimal else (texto, "", "")
+    milhar = next((sep for sep in ",." if sep in inteiro), None)
+    if milhar:
+        if not re.fullmatch(rf"[-+]?\d{{1,3}}(\{milhar}\d{{3}})+", inteiro):
+            raise ValueError(f"Valor inválido: {texto}")
+        inteiro = inteiro.replace(milhar, "")
+    texto = f"{inteiro}.{fracao}" if decimal else inteiro
+    valor = float(texto)
+    return -valor if negativo else valor
+
+# -------------------- CSV --------------------
+COLUNAS_CSV = {
+    "data": ("data", "date", "dt", "data lancamento", "data do lancamento"),
+    "valor": ("valor", "value", "amount", "quantia", "valor (r$)"),
+    "descricao": ("descricao", "historico", "description", "memo", "lancamento", "estabelecimento"),
+}
+
+def ler_csv(arquivo, encoding="utf-8-sig", delimitador=None):
+    texto = _texto(arquivo, encoding)
+    primeira = texto.readline()
+    if delimitador is None:
+        delimitador = ";" if primeira.count(";") > primeira.count(",") else ","
+    cabecalho = [_normalizar(c) for c in next(csv.reader([primeira], delimiter=delimitador))]
+    indices = {}
+    for campo, nomes in COLUNAS_CSV.items():
+        for i, nome in enumerate(cabecalho):
+            if nome in nomes:
+                indices[campo] = i
+                break
+        else:
+            raise ValueError(f"Coluna '{campo}' não encontrada no cabeçalho do CSV")
+
+    for linha in csv.reader(texto, delimiter=delimitador):
+        if not linha or not linha[indices["data"]].strip():
+            continue
+        yield Lancamento(
+            data_iso(linha[indices["data"]]),
+            converter_valor(linha[indices["valor"]]),
+            linha[indices["descricao"]].strip(),
+        )
+
+# -------------------- OFX --------------------
+_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+def _tags_ofx(texto, bloco=65536):
+    # Percorre o arquivo em blocos, emitindo (fechamento, tag, conteúdo);
+    # funciona tanto para OFX SGML (sem tags de fechamento) quanto XML
+    resto = ""
+    while True:
+        parte = texto.read(bloco)
+        resto += parte
+        ultimo = resto.rfind("<") if parte else len(resto)
+        if ultimo <= 0 and parte:
+            continue
+        for m in _TAG.finditer(resto, 0, ultimo):
+            yield m.group(1) == "/", m.group(2).upper(), m.group(3).strip()
+        resto = resto[ultimo:]
+        if not parte:
+            break
+
+def ler_ofx(arquivo, encoding="latin-1"):
+    atual = None
+    for fechamento, tag, conteudo in _tags_ofx(_texto(arquivo, encoding)):
+        if tag == "STMTTRN":
+            if fechamento and atual:
+                yield _lancamento_ofx(atual)
+                atual = None
+            elif not fechamento:
+                if atual:
+                    yield _lancamento_ofx(atual)
+                atual = {}
+        elif atual is not None and not fechamento and conteudo:
+            atual[tag] = conteudo
+    if atual:
+        yield _lancamento_ofx(atual)
+
+def _lancamento_ofx(campos):
+    dt = campos["DTPOSTED"]
+    return Lancamento(
+        f"{dt[0:4]}-{dt[4:6]}-{dt[6:8]}",
+        converter_valor(campos["TRNAMT"]),
+        campos.get("MEMO") or campos.get("NAME", ""),
+    )
+
+def ler_extrato(arquivo, nome=None, encoding=None):
+    nome = (nome or getattr(arquivo, "name", "") or str(arquivo)).lower()
+    if nome.endswith((".ofx", ".qfx")):
+        return ler_ofx(arquivo, encoding or "latin-1")
+    return ler_csv(arquivo, encoding or "utf-8-sig")
+
+# -------------------- REGRAS --------------------
+def compilar_regras(regras):
+    # regras: [(trecho da descrição, subconta_id)]; a primeira que casar vence
+    return [(_normalizar(trecho), sid) for trecho, sid in regras if trecho.strip()]
+
+def classificar(descricao, regras, subconta_padrao=None):
+    descricao = _normalizar(descricao)
+    for trecho, sid in regras:
+        if trecho in descricao:
+            return sid
+    return subconta_padrao
+
+# -------------------- PIPELINE --------------------
+def importar_extrato(lancamentos, regras=(), subconta_padrao=None, origem="Extrato",
+                     tamanho_lote=TAMANHO_LOTE, progresso=None):
+    # Créditos viram receitas, débitos viram gastos na subconta da regra.
+    # Cada lote é gravado numa transação com executemany.
+    regras = compilar_regras(regras)
+    lancamentos = iter(lancamentos)
+    total = [0, 0, 0, 0.0]  # receitas, gastos, parcelas quitadas, valor quitado
+    while True:
+        lote = list(islice(lancamentos, tamanho_lote))
+        if not lote:
+            break
+        receitas = [(l.data, origem, l.valor, l.descricao) for l in lote if l.valor > 0]
+        gastos = [(l.data, -l.valor, l.descricao, classificar(l.descricao, regras, subconta_padrao))
+                  for l in lote if l.valor < 0]
+        for i, n in enumerate(registrar_lote(receitas, gastos)):
+            total[i] += n
+        if progresso:
+            progresso(total[0] + total[1])
+    return tuple(total)
@@ -0,0 +1,221 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import conexao
+from cache import estatisticas_cache
+
+# Instrumentação das consultas SQL: texto, duração e linhas de cada comando,
+# atribuídos à página ativa na thread (cada sessão do Streamlit roda na sua).
+# Desligada por padrão; ativar() troca a fábrica de cursores do pool por uma
+# que mede. A duração soma execute e fetch*, onde o SQLite percorre as linhas;
+# o comando é fechado no próximo execute do cursor ou quando ele é fechado.
+
+LIMITE_LENTA_MS = 50.0
+LIMITE_RECENTES = 200
+SEM_PAGINA = "-"
+
+log = logging.getLogger("financesystem.sql")
+
+_lock = threading.Lock()
+_local = threading.local()
+_agregado = {}                        # (pagina, sql) -> [execucoes, total_ms, max_ms, linhas]
+_lentas = deque(maxlen=LIMITE_RECENTES)
+_config = {"ativo": False, "limite_lenta_ms": LIMITE_LENTA_MS}
+
+_ESPACOS = re.compile(r"\s+")
+
+# -------------------- CURSOR --------------------
+class Consulta:
+    __slots__ = ("pagina", "sql", "duracao_ms", "linhas")
+
+    def __init__(self, pagina, sql):
+        self.pagina = pagina
+        self.sql = sql
+        self.duracao_ms = 0.0
+        self.linhas = 0
+
+    def como_dict(self):
+        return {"pagina": self.pagina, "sql": self.sql,
+                "duracao_ms": round(self.duracao_ms, 3), "linhas": self.linhas}
+
+class CursorMedido(sqlite3.Cursor):
+    _consulta = None
+
+    def _iniciar(self, sql):
+        self._encerrar()
+        consulta = Consulta(getattr(_local, "pagina", SEM_PAGINA), _ESPACOS.sub(" ", sql).strip())
+        coleta = getattr(_local, "coleta", None)
+        if coleta is not None:
+            coleta.append(consulta)
+        self._consulta = consulta
+        return consulta
+
+    def _encerrar(self):
+        if self._consulta is not None:
+            _registrar(self._consulta)
+            self._consulta = None
+
+    def execute(self, sql, params=()):
+        consulta = self._iniciar(sql)
+        inicio = time.perf_counter()
+        try:
+            super().execute(sql, params)
+        finally:
+            consulta.duracao_ms += (time.perf_counter() - inicio) * 1000
+        # Para INSERT/UPDATE/DELETE, linhas afetadas; SELECT conta no fetch
+        consulta.linhas += max(self.rowcount, 0)
+        return self
+
+    def executemany(self, sql, params):
+        consulta = self._iniciar(sql)
+        inicio = time.perf_counter()
+        try:
+            super().executemany(sql, params)
+        finally:
+            consulta.duracao_ms += (time.perf_counter() - inicio) * 1000
+        consulta.linhas += max(self.rowcount, 0)
+        return self
+
+    def _buscar(self, metodo, *args):
+        inicio = time.perf_counter()
+        resultado = metodo(*args)
+        consulta = self._consulta
+        if consulta is not None:
+            consulta.duracao_ms += (time.perf_counter() - inicio) * 1000
+            if isinstance(resultado, list):
+                consulta.linhas += len(resultado)
+            elif resultado is not None:
+                consulta.linhas += 1
+        return resultado
+
+    def fetchone(self):
+        return self._buscar(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._buscar(super().fetchmany, size or self.arraysize)
+
+    def fetchall(self):
+        return self._buscar(super().fetchall)
+
+    def __next__(self):
+        return self._buscar(super().__next__)
+
+    def close(self):
+        self._encerrar()
+        super().close()
+
+# -------------------- AGREGAÇÃO --------------------
+def _registrar(consulta):
+    chave = (consulta.pagina, consulta.sql)
+    with _lock:
+        item = _agregado.get(chave)
+        if item is None:
+            item = _agregado[chave] = [0, 0.0, 0.0, 0]
+        item[0] += 1
+        item[1] += consulta.duracao_ms
+        item[2] = max(item[2], consulta.duracao_ms)
+        item[3] += consulta.linhas
+        lenta = consulta.duracao_ms >= _config["limite_lenta_ms"]
+        if lenta:
+            _lentas.append(consulta)
+    if lenta:
+        log.warning("SQL lenta: %.1f ms, %d linhas, página %s: %s",
+                    consulta.duracao_ms, consulta.linhas, consulta.pagina, consulta.sql)
+
+# -------------------- API --------------------
+def ativar(limite_lenta_ms=LIMITE_LENTA_MS):
+    _config["limite_lenta_ms"] = limite_lenta_ms
+    _config["ativo"] = True
+    conexao.fabrica_cursor = CursorMedido
+
+def desativar():
+    _config["ativo"] = False
+    conexao.fabrica_cursor = sqlite3.Cursor
+
+def ativo():
+    return _config["ativo"]
+
+@contextmanager
+def pagina(nome):
+    # Atribui a `nome` as consultas feitas nesta thread; devolve a lista de
+    # consultas do bloco (por exemplo, as de um rerun)
+    anterior = getattr(_local, "pagina", SEM_PAGINA), getattr(_local, "coleta", None)
+    _local.pagina, _local.coleta = nome, []
+    try:
+        yield _local.coleta
+    finally:
+        _local.pagina, _local.coleta = anterior
+
+def limpar():
+    with _lock:
+        _agregado.clear()
+        _lentas.clear()
+
+def snapshot():
+    with _lock:
+        consultas = [
+            {"pagina": pagina, "sql": sql, "execucoes": n, "total_ms": round(total, 3),
+             "max_ms": round(maximo, 3), "linhas": linhas}
+            for (pagina, sql), (n, total, maximo, linhas) in _agregado.items()
+        ]
+        lentas = [c.como_dict() for c in _lentas]
+    paginas = {}
+    for c in consultas:
+        p = paginas.setdefault(c["pagina"], {"execucoes": 0, "total_ms": 0.0, "linhas": 0})
+        p["execucoes"] += c["execucoes"]
+        p["total_ms"] = round(p["total_ms"] + c["total_ms"], 3)
+        p["linhas"] += c["linhas"]
+    return {
+        "limite_lenta_ms": _config["limite_lenta_ms"],
+        "paginas": paginas,
+        "consultas": sorted(consultas, key=lambda c: -c["total_ms"]),
+        "lentas": lentas,
+        "cache": estatisticas_cache(),
+    }
+
+def snapshot_json():
+    return json.dumps(snapshot(), indent=2, ensure_ascii=False)
+
+def _rotulo(texto):
+    return texto.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+def _numero(valor):
+    # Sem :g, que corta em 6 dígitos significativos; contadores saem inteiros
+    return str(valor) if isinstance(valor, int) else repr(float(valor))
+
+METRICAS_SQL = (
+    ("financesystem_sql_execucoes_total", "Comandos SQL executados", "execucoes", 1),
+    ("financesystem_sql_segundos_total", "Tempo gasto em SQL", "total_ms", 0.001),
+    ("financesystem_sql_linhas_total", "Linhas lidas ou alteradas", "linhas", 1),
+)
+
+def prometheus():
+    # Formato de exposição de texto do Prometheus
+    dados = snapshot()
+    linhas = []
+    for nome, ajuda, campo, escala in METRICAS_SQL:
+        linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} counter"]
+        for c in dados["consultas"]:
+            rotulos = f'pagina="{_rotulo(c["pagina"])}",sql="{_rotulo(c["sql"])}"'
+            linhas.append(f"{nome}{{{rotulos}}} {_numero(c[campo] * escala)}")
+    linhas += [
+        "# HELP financesystem_sql_lentas Comandos acima do limite guardados",
+        "# TYPE financesystem_sql_lentas gauge",
+        f"financesystem_sql_lentas {len(dados['lentas'])}",
+        "# HELP financesystem_cache_total Leituras do cache do db.py",
+        "# TYPE financesystem_cache_total counter",
+    ]
+    for evento in ("acertos", "falhas", "invalidacoes"):
+        linhas.append(f'financesystem_cache_total{{evento="{evento}"}} {dados["cache"][evento]}')
+    linhas += [
+        "# HELP financesystem_cache_entradas Entradas no cache do db.py",
+        "# TYPE financesystem_cache_entradas gauge",
+        f"financesystem_cache_entradas {dados['cache']['entradas']}",
+    ]
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,394 @@
+import threading
+from conexao import transacao, leitura
+import conexao
+
+# Cada migração recebe o cursor já dentro de uma transação e é aplicada
+# uma única vez; a versão do schema fica em PRAGMA user_version.
+
+# -------------------- V1: TABELAS --------------------
+def _v1_tabelas(c):
+    # Sessão (corrigido para incluir criado_em)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS sessao (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        token TEXT,
+        criado_em TEXT
+    )
+    """)
+
+    # Receitas
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS receitas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT,
+        origem TEXT,
+        valor REAL,
+        descricao TEXT,
+        ano_mes TEXT
+    )
+    """)
+
+    # Contas principais
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS contas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT UNIQUE
+    )
+    """)
+
+    # Subcontas
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS subcontas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT,
+        conta_id INTEGER,
+        FOREIGN KEY (conta_id) REFERENCES contas(id)
+    )
+    """)
+
+    # Atribuições mensais
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS subconta_atribuicoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subconta_id INTEGER,
+        ano_mes TEXT,
+        saldo_inicial REAL,
+        saldo_atual REAL,
+        FOREIGN KEY (subconta_id) REFERENCES subcontas(id)
+    )
+    """)
+
+    # Gastos
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS gastos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT,
+        valor REAL,
+        descricao TEXT,
+        subconta_id INTEGER,
+        ano_mes TEXT,
+        FOREIGN KEY (subconta_id) REFERENCES subcontas(id)
+    )
+    """)
+
+    # Transferências
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS transferencias (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT,
+        subconta_origem INTEGER,
+        subconta_destino INTEGER,
+        valor REAL,
+        justificativa TEXT,
+        mes_ano TEXT
+    )
+    """)
+
+    # Empréstimos
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS emprestimos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        instituicao TEXT,
+        contrato TEXT,
+        tipo TEXT,
+        primeira_parcela TEXT,
+        qtd_parcelas INTEGER,
+        valor_parcela REAL
+    )
+    """)
+
+    # Parcelas de empréstimos
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS parcelas_emprestimo (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        emprestimo_id INTEGER,
+        mes_ano TEXT,
+        valor_original REAL,
+        valor_quitado REAL,
+        data_quitacao TEXT,
+        FOREIGN KEY (emprestimo_id) REFERENCES emprestimos(id)
+    )
+    """)
+
+# -------------------- V2: ÍNDICES --------------------
+def _v2_indices(c):
+    # Consolida atribuições duplicadas antes de criar a chave única
+    c.execute("""
+    UPDATE subconta_atribuicoes
+    SET saldo_inicial = (SELECT SUM(d.saldo_inicial) FROM subconta_atribuicoes d
+                         WHERE d.subconta_id = subconta_atribuicoes.subconta_id
+                           AND d.ano_mes = subconta_atribuicoes.ano_mes),
+        saldo_atual = (SELECT SUM(d.saldo_atual) FROM subconta_atribuicoes d
+                       WHERE d.subconta_id = subconta_atribuicoes.subconta_id
+                         AND d.ano_mes = subconta_atribuicoes.ano_mes)
+    WHERE id IN (SELECT MIN(id) FROM subconta_atribuicoes
+                 GROUP BY subconta_id, ano_mes HAVING COUNT(*) > 1)
+    """)
+    c.execute("""
+    DELETE FROM subconta_atribuicoes
+    WHERE id NOT IN (SELECT MIN(id) FROM subconta_atribuicoes GROUP BY subconta_id, ano_mes)
+    """)
+
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_atribuicoes_subconta_mes ON subconta_atribuicoes (subconta_id, ano_mes)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_receitas_ano_mes ON receitas (ano_mes)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_gastos_subconta_mes ON gastos (subconta_id, ano_mes)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_parcelas_emprestimo ON parcelas_emprestimo (emprestimo_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_parcelas_mes_quitado ON parcelas_emprestimo (mes_ano, valor_quitado)")
+
+# -------------------- V3: DATAS ISO E MESES AAAAMM --------------------
+# "DD/MM/AAAA" -> "AAAA-MM-DD" e "MM/AAAA" -> AAAAMM (inteiro)
+_DATA_ISO = "CASE WHEN {0} LIKE '__/__/____' THEN substr({0},7,4)||'-'||substr({0},4,2)||'-'||substr({0},1,2) ELSE {0} END"
+_MES_CHAVE = "CASE WHEN {0} LIKE '__/____' THEN CAST(substr({0},4,4) AS INTEGER)*100 + CAST(substr({0},1,2) AS INTEGER) ELSE {0} END"
+
+def _reconstruir(c, tabela, ddl, colunas):
+    # SQLite não altera tipo de coluna: recria a tabela e copia convertendo
+    c.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (tabela,))
+    seq = c.fetchone()
+    c.execute(ddl.format(tabela=f"{tabela}_nova"))
+    destino = ", ".join(nome for nome, _ in colunas)
+    origem = ", ".join(expr.format(nome) if expr else nome for nome, expr in colunas)
+    c.execute(f"INSERT INTO {tabela}_nova ({destino}) SELECT {origem} FROM {tabela}")
+    c.execute(f"DROP TABLE {tabela}")
+    c.execute(f"ALTER TABLE {tabela}_nova RENAME TO {tabela}")
+    if seq:
+        c.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name=?", (seq[0], tabela))
+
+def _v3_datas_iso(c):
+    _reconstruir(c, "receitas", """
+    CREATE TABLE {tabela} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT,
+        origem TEXT,
+        valor REAL,
+        descricao TEXT,
+        ano_mes INTEGER
+    )
+    """, [("id", None), ("data", _DATA_ISO), ("origem", None), ("valor", None),
+          ("descricao", None), ("ano_mes", _MES_CHAVE)])
+
+    _reconstruir(c, "subconta_atribuicoes", """
+    CREATE TABLE {tabela} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subconta_id INTEGER,
+        ano_mes INTEGER,
+        saldo_inicial REAL,
+        saldo_atual REAL,
+        FOREIGN KEY (subconta_id) REFERENCES subcontas(id)
+    )
+    """, [("id", None), ("subconta_id", None), ("ano_mes", _MES_CHAVE),
+          ("saldo_inicial", None), ("saldo_atual", None)])
+
+    _reconstruir(c, "gastos", """
+    CREATE TABLE {tabela} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT,
+        valor REAL,
+        descricao TEXT,
+        subconta_id INTEGER,
+        ano_mes INTEGER,
+        FOREIGN KEY (subconta_id) REFERENCES subcontas(id)
+    )
+    """, [("id", None), ("data", _DATA_ISO), ("valor", None), ("descricao", None),
+          ("subconta_id", None), ("ano_mes", _MES_CHAVE)])
+
+    _reconstruir(c, "transferencias", """
+    CREATE TABLE {tabela} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT,
+        subconta_origem INTEGER,
+        subconta_destino INTEGER,
+        valor REAL,
+        justificativa TEXT,
+        mes_ano INTEGER
+    )
+    """, [("id", None), ("data", _DATA_ISO), ("subconta_origem", None), ("subconta_destino", None),
+          ("valor", None), ("justificativa", None), ("mes_ano", _MES_CHAVE)])
+
+    _reconstruir(c, "emprestimos", """
+    CREATE TABLE {tabela} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        instituicao TEXT,
+        contrato TEXT,
+        tipo TEXT,
+        primeira_parcela INTEGER,
+        qtd_parcelas INTEGER,
+        valor_parcela REAL
+    )
+    """, [("id", None), ("instituicao", None), ("contrato", None), ("tipo", None),
+          ("primeira_parcela", _MES_CHAVE), ("qtd_parcelas", None), ("valor_parcela", None)])
+
+    _reconstruir(c, "parcelas_emprestimo", """
+    CREATE TABLE {tabela} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        emprestimo_id INTEGER,
+        mes_ano INTEGER,
+        valor_original REAL,
+        valor_quitado REAL,
+        data_quitacao TEXT,
+        FOREIGN KEY (emprestimo_id) REFERENCES emprestimos(id)
+    )
+    """, [("id", None), ("emprestimo_id", None), ("mes_ano", _MES_CHAVE), ("valor_original", None),
+          ("valor_quitado", None), ("data_quitacao", _DATA_ISO)])
+
+    # Índices da V2 foram removidos junto com as tabelas antigas
+    _v2_indices(c)
+    c.execute("CREATE INDEX IF NOT EXISTS ix_receitas_data ON receitas (data)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_gastos_data ON gastos (data)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_transferencias_mes ON transferencias (mes_ano)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_parcelas_data_quitacao ON parcelas_emprestimo (data_quitacao)")
+
+# -------------------- V4: AMORTIZAÇÃO --------------------
+def _v4_amortizacao(c):
+    c.execute("ALTER TABLE emprestimos ADD COLUMN sistema TEXT DEFAULT 'FIXO'")
+    c.execute("ALTER TABLE emprestimos ADD COLUMN taxa_juros REAL DEFAULT 0")
+    c.execute("ALTER TABLE emprestimos ADD COLUMN valor_financiado REAL")
+    c.execute("ALTER TABLE parcelas_emprestimo ADD COLUMN amortizacao REAL")
+    c.execute("ALTER TABLE parcelas_emprestimo ADD COLUMN juros REAL")
+
+# -------------------- V5: ÍNDICES DE PERÍODO --------------------
+def _v5_indices_periodo(c):
+    c.execute("CREATE INDEX IF NOT EXISTS ix_atribuicoes_mes ON subconta_atribuicoes (ano_mes)")
+
+# -------------------- V6: FECHAMENTO DE MÊS --------------------
+def _v6_meses_fechados(c):
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS meses_fechados (
+        ano_mes INTEGER PRIMARY KEY,
+        fechado_em TEXT,
+        subcontas_varridas INTEGER,
+        valor_varrido REAL
+    )
+    """)
+
+# -------------------- V7: SESSÕES POR USUÁRIO --------------------
+def _v7_sessoes(c):
+    c.execute("ALTER TABLE sessao ADD COLUMN usuario TEXT")
+    c.execute("ALTER TABLE sessao ADD COLUMN expira_em TEXT")
+    # Sessões antigas valiam 1h a partir da criação
+    c.execute("UPDATE sessao SET expira_em = strftime('%Y-%m-%dT%H:%M:%S', criado_em, '+1 hour')")
+    c.execute("DELETE FROM sessao WHERE token IS NULL OR id NOT IN (SELECT MAX(id) FROM sessao GROUP BY token)")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_sessao_token ON sessao (token)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_sessao_expira ON sessao (expira_em)")
+
+# -------------------- V8: HISTÓRICO (PAGINAÇÃO POR CHAVE) --------------------
+def _v8_indices_historico(c):
+    # Paginação por (data, id): o id vem junto no índice como rowid
+    c.execute("CREATE INDEX IF NOT EXISTS ix_gastos_subconta_data ON gastos (subconta_id, data)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_transferencias_data ON transferencias (data)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_transferencias_origem_data ON transferencias (subconta_origem, data)")
+    c.execute("CREATE INDEX IF NOT EXISTS ix_transferencias_destino_data ON transferencias (subconta_destino, data)")
+
+# -------------------- V9: BUSCA TEXTUAL --------------------
+# Índice FTS5 único para receitas, gastos, transferências e empréstimos.
+# O rowid codifica a origem (id * 8 + tipo), então os gatilhos mantêm o
+# índice por rowid, sem varrer a tabela de busca.
+TIPOS_BUSCA = {
+    1: ("receitas", "descricao", "origem"),
+    2: ("gastos", "descricao", None),
+    3: ("transferencias", "justificativa", None),
+    4: ("emprestimos", "instituicao", "contrato"),
+}
+
+def _valores_busca(tipo, prefixo=""):
+    _, texto, extra = TIPOS_BUSCA[tipo]
+    extra = f"IFNULL({prefixo}{extra}, '')" if extra else "''"
+    return f"{prefixo}id * 8 + {tipo}, IFNULL({prefixo}{texto}, ''), {extra}"
+
+def _v9_busca(c):
+    c.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS busca USING fts5(
+        texto, extra,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """)
+    for tipo, (tabela, texto, extra) in TIPOS_BUSCA.items():
+        colunas = f"{texto}, {extra}" if extra else texto
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS busca_{tabela}_ai AFTER INSERT ON {tabela} BEGIN
+            INSERT INTO busca (rowid, texto, extra) VALUES ({_valores_busca(tipo, "new.")});
+        END
+        """)
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS busca_{tabela}_au AFTER UPDATE OF {colunas} ON {tabela} BEGIN
+            DELETE FROM busca WHERE rowid = old.id * 8 + {tipo};
+            INSERT INTO busca (rowid, texto, extra) VALUES ({_valores_busca(tipo, "new.")});
+        END
+        """)
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS busca_{tabela}_ad AFTER DELETE ON {tabela} BEGIN
+            DELETE FROM busca WHERE rowid = old.id * 8 + {tipo};
+        END
+        """)
+        c.execute(f"INSERT INTO busca (rowid, texto, extra) SELECT {_valores_busca(tipo)} FROM {tabela}")
+
+# -------------------- V10: VERSÃO DOS DADOS --------------------
+def _v10_versao_dados(c):
+    # Contador único incrementado por conexao.transacao() a cada escrita
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS versao_dados (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        valor INTEGER NOT NULL
+    )
+    """)
+    c.execute("INSERT OR IGNORE INTO versao_dados (id, valor) VALUES (1, 0)")
+
+# -------------------- V11: GASTOS POR MÊS --------------------
+def _v11_gastos_mes(c):
+    # Relatórios filtram gastos pelo mês de competência, sem subconta fixa
+    c.execute("CREATE INDEX IF NOT EXISTS ix_gastos_mes ON gastos (ano_mes)")
+
+# -------------------- V12: SOBRA AUTOMÁTICA MARCADA --------------------
+def _v12_transferencias_automaticas(c):
+    # A varredura do fechamento era reconhecida só pelo texto da justificativa
+    c.execute("ALTER TABLE transferencias ADD COLUMN automatica INTEGER NOT NULL DEFAULT 0")
+    c.execute("""
+    UPDATE transferencias SET automatica = 1
+    WHERE justificativa GLOB 'Sobra automática de [0-9][0-9]/[0-9][0-9][0-9][0-9]'
+    """)
+    # A Reservas agora é levada ao mês seguinte sem transferência para si mesma
+    c.execute("DELETE FROM transferencias WHERE automatica = 1 AND subconta_origem = subconta_destino")
+
+# -------------------- RUNNER --------------------
+MIGRACOES = [
+    _v1_tabelas,
+    _v2_indices,
+    _v3_datas_iso,
+    _v4_amortizacao,
+    _v5_indices_periodo,
+    _v6_meses_fechados,
+    _v7_sessoes,
+    _v8_indices_historico,
+    _v9_busca,
+    _v10_versao_dados,
+    _v11_gastos_mes,
+    _v12_transferencias_automaticas,
+]
+
+_lock = threading.Lock()
+_migrados = set()
+
+def versao_schema():
+    with leitura() as c:
+        c.execute("PRAGMA user_version")
+        return c.fetchone()[0]
+
+def migrar():
+    # Roda no máximo uma vez por processo para cada arquivo de banco
+    banco = conexao.DB_NAME
+    if banco in _migrados:
+        return
+    with _lock:
+        if banco in _migrados:
+            return
+        if versao_schema() < len(MIGRACOES):
+            for versao, migracao in enumerate(MIGRACOES, start=1):
+                # Sem versionar: a tabela do contador só existe a partir da V10
+                with transacao(versionar=False) as c:
+                    # Relê dentro da transação: outro processo pode ter migrado
+                    c.execute("PRAGMA user_version")
+                    if c.fetchone()[0] >= versao:
+                        continue
+                    migracao(c)
+                    c.execute(f"PRAGMA user_version = {versao}")
+        _migrados.add(banco)
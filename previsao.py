@@ -0,0 +1,201 @@
+import threading
+
+import numpy as np
+
+from cache import em_cache
+import conexao
+from conexao import leitura
+from datas import mes_chave, mes_br, somar_meses
+from db import get_subcontas
+
+# Previsão de saldos de fim de mês a partir do histórico e do cronograma
+# dos empréstimos:
+#   - por subconta: média dos últimos meses fechados de atribuído + transferido
+#     líquido - gasto (a Reservas recebe também as sobras projetadas das outras,
+#     como no fechamento de mês);
+#   - total: saldo atual acumulado com a média de receitas menos a média de
+#     gastos e menos as parcelas em aberto de cada mês.
+# As somas mensais ficam em matrizes NumPy (subconta x mês) mantidas em
+# memória; a cada versão nova dos dados só as linhas com id maior que o último
+# visto são lidas. Se a contagem de linhas não bate (houve exclusão), a tabela
+# é relida inteira. Gastos, receitas e transferências não são alterados no
+# lugar pelo app, só inseridos ou excluídos.
+
+JANELA_HISTORICO = 6
+HORIZONTE_MIN, HORIZONTE_MAX = 12, 60
+
+_lock = threading.Lock()
+
+def _mes_absoluto(chaves):
+    # AAAAMM -> meses desde o ano 0, para indexar colunas
+    chaves = np.asarray(chaves, dtype=np.int64)
+    return chaves // 100 * 12 + chaves % 100 - 1
+
+# -------------------- SOMAS MENSAIS --------------------
+class _SomaMensal:
+    # Matriz (linha x mês) que cresce conforme chegam linhas novas
+    def __init__(self):
+        self.linhas = {}
+        self.primeiro_mes = None
+        self.matriz = np.zeros((0, 0))
+
+    def somar(self, chaves, meses, valores):
+        if not len(valores):
+            return
+        meses = _mes_absoluto(meses)
+        inicio, fim = int(meses.min()), int(meses.max())
+        if self.primeiro_mes is None:
+            self.primeiro_mes = inicio
+        ultimo = self.primeiro_mes + self.matriz.shape[1] - 1
+        antes, depois = max(self.primeiro_mes - inicio, 0), max(fim - ultimo, 0)
+        unicas, posicoes = np.unique(np.asarray(chaves, dtype=np.int64), return_inverse=True)
+        for chave in unicas.tolist():
+            self.linhas.setdefault(chave, len(self.linhas))
+        novas = len(self.linhas) - self.matriz.shape[0]
+        if antes or depois or novas:
+            self.matriz = np.pad(self.matriz, ((0, novas), (antes, depois)))
+            self.primeiro_mes -= antes
+        linhas = np.array([self.linhas[c] for c in unicas.tolist()])[posicoes]
+        np.add.at(self.matriz, (linhas, meses - self.primeiro_mes), np.asarray(valores, dtype=float))
+
+    def janela(self, chaves, ultimo_mes, tamanho):
+        # Linhas pedidas nos `tamanho` meses até ultimo_mes (AAAAMM); zero onde não há dado
+        resultado = np.zeros((len(chaves), tamanho))
+        if self.primeiro_mes is None:
+            return resultado
+        fim = int(_mes_absoluto(ultimo_mes)) - self.primeiro_mes + 1
+        inicio = fim - tamanho
+        a, b = max(inicio, 0), min(fim, self.matriz.shape[1])
+        if a >= b:
+            return resultado
+        for i, chave in enumerate(chaves):
+            linha = self.linhas.get(chave)
+            if linha is not None:
+                resultado[i, a - inicio:b - inicio] = self.matriz[linha, a:b]
+        return resultado
+
+# Cada fonte: tabela, consulta das linhas novas (id > ?) e como somá-las
+_FONTES = {
+    "gastos": """
+        SELECT id, IFNULL(subconta_id, 0), ano_mes, valor FROM gastos WHERE id > ? ORDER BY id
+    """,
+    "receitas": """
+        SELECT id, 0, ano_mes, valor FROM receitas WHERE id > ? ORDER BY id
+    """,
+    "transferencias": """
+        SELECT id, subconta_origem, subconta_destino, mes_ano, valor, automatica
+        FROM transferencias WHERE id > ? ORDER BY id
+    """,
+}
+
+_estado = {"versao": None}
+_fontes = {}  # tabela -> {"soma": _SomaMensal, "ultimo_id": int, "linhas": int}
+
+def _nova_fonte():
+    return {"soma": _SomaMensal(), "ultimo_id": 0, "linhas": 0}
+
+def _incorporar(tabela, fonte, rows):
+    if not rows:
+        return
+    soma = fonte["soma"]
+    if tabela == "transferencias":
+        rows = [r for r in rows if not r[5]]  # a sobra do fechamento não é fluxo do mês
+        if rows:
+            _, origens, destinos, meses, valores, _ = zip(*rows)
+            soma.somar(destinos + origens, meses + meses, valores + tuple(-v for v in valores))
+    else:
+        _, chaves, meses, valores = zip(*rows)
+        soma.somar(chaves, meses, valores)
+
+def _atualizar():
+    # Traz para as matrizes só o que entrou desde a última leitura
+    versao = conexao.versao_dados()
+    if versao is not None and _estado["versao"] == versao:
+        return
+    with leitura() as cur:
+        for tabela, consulta in _FONTES.items():
+            fonte = _fontes.setdefault(tabela, _nova_fonte())
+            cur.execute(f"SELECT COUNT(*) FROM {tabela} WHERE id <= ?", (fonte["ultimo_id"],))
+            if cur.fetchone()[0] != fonte["linhas"]:
+                fonte = _fontes[tabela] = _nova_fonte()
+            cur.execute(consulta, (fonte["ultimo_id"],))
+            rows = cur.fetchall()
+            _incorporar(tabela, fonte, rows)
+            if rows:
+                fonte["ultimo_id"] = rows[-1][0]
+                fonte["linhas"] += len(rows)
+    _estado["versao"] = versao
+
+def limpar_previsao():
+    with _lock:
+        _fontes.clear()
+        _estado["versao"] = None
+
+# -------------------- PREVISÃO --------------------
+@em_cache
+def prever_saldos(mes_atual, meses=HORIZONTE_MIN, janela=JANELA_HISTORICO, reservas_id=None):
+    # Retorna (meses, subcontas, saldos, total): meses em MM/AAAA a partir do
+    # seguinte a mes_atual, ids das subcontas, matriz subconta x mês com o saldo
+    # previsto de fim de mês e o saldo total acumulado previsto em cada mês
+    if not HORIZONTE_MIN <= meses <= HORIZONTE_MAX:
+        raise ValueError(f"Horizonte deve ficar entre {HORIZONTE_MIN} e {HORIZONTE_MAX} meses")
+    mes_atual = mes_chave(mes_atual)
+    ultimo_fechado = somar_meses(mes_atual, -1)
+    primeiro_janela = somar_meses(mes_atual, -janela)
+    futuros = [somar_meses(mes_atual, i) for i in range(1, meses + 1)]
+    subcontas = [sid for sid, _, _ in get_subcontas()]
+
+    with _lock:
+        _atualizar()
+        gastos = _fontes["gastos"]["soma"].janela(subcontas, ultimo_fechado, janela)
+        transferido = _fontes["transferencias"]["soma"].janela(subcontas, ultimo_fechado, janela)
+        receitas = _fontes["receitas"]["soma"].janela([0], ultimo_fechado, janela)[0]
+
+    with leitura() as cur:
+        cur.execute("""
+            SELECT subconta_id, ano_mes, saldo_inicial FROM subconta_atribuicoes
+            WHERE ano_mes BETWEEN ? AND ?
+        """, (primeiro_janela, ultimo_fechado))
+        atribuicoes = cur.fetchall()
+        cur.execute("SELECT subconta_id, saldo_atual FROM subconta_atribuicoes WHERE ano_mes=?", (mes_atual,))
+        atuais = cur.fetchall()
+        cur.execute("""
+            SELECT mes_ano, SUM(valor_original) FROM parcelas_emprestimo
+            WHERE valor_quitado IS NULL AND mes_ano BETWEEN ? AND ?
+            GROUP BY mes_ano
+        """, (mes_atual, futuros[-1]))
+        parcelas = cur.fetchall()
+
+    indice = {sid: i for i, sid in enumerate(subcontas)}
+    atribuido = np.zeros((len(subcontas), janela))
+    for sid, mes, valor in atribuicoes:
+        if sid in indice:
+            atribuido[indice[sid], int(_mes_absoluto(mes) - _mes_absoluto(primeiro_janela))] += valor or 0
+    atual = np.zeros(len(subcontas))
+    for sid, valor in atuais:
+        if sid in indice:
+            atual[indice[sid]] += valor or 0
+    saldo_atual = sum(valor or 0 for _, valor in atuais)
+
+    # Fim de mês por subconta: as demais recomeçam do mesmo saldo todo mês; a
+    # Reservas parte do saldo de hoje e acumula o próprio fluxo mais as sobras
+    # positivas das demais, que o fechamento leva para o mês seguinte (no
+    # primeiro mês previsto, as sobras reais do mês atual)
+    mensal = (atribuido + transferido - gastos).mean(axis=1)
+    saldos = np.repeat(mensal[:, None], meses, axis=1)
+    if reservas_id in indice:
+        r = indice[reservas_id]
+        outras = np.ones(len(subcontas), dtype=bool)
+        outras[r] = False
+        sobras = np.full(meses, np.clip(mensal[outras], 0, None).sum())
+        sobras[0] = np.clip(atual[outras], 0, None).sum()
+        saldos[r] = atual[r] + np.cumsum(mensal[r] + sobras)
+
+    # Total: as parcelas ainda em aberto do mês atual saem no primeiro mês previsto
+    cronograma = np.zeros(meses)
+    base = int(_mes_absoluto(futuros[0]))
+    for mes, valor in parcelas:
+        cronograma[max(int(_mes_absoluto(mes)) - base, 0)] += valor
+    fluxo = receitas.mean() - gastos.sum(axis=0).mean() - cronograma
+    total = saldo_atual + np.cumsum(fluxo)
+    return [mes_br(m) for m in futuros], subcontas, saldos, total
@@ -0,0 +1,260 @@
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from conexao import versao_dados
+from datas import mes_chave, mes_br
+from db import get_total_receitas_mes, get_saldos_mes, resumo_emprestimos, totais_por_mes, totais_por_subconta
+from formatacao import brl
+
+# O ReportLab é importado só quando um relatório é gerado: ele é pesado e a
+# maioria das execuções do app nunca chega a montar um PDF.
+
+# -------------------- GERAÇÃO EM SEGUNDO PLANO --------------------
+# PDFs prontos ficam em cache por (tipo, parâmetros, versão dos dados); uma
+# escrita no banco muda a versão, então um mês alterado é gerado de novo.
+LIMITE_CACHE_BYTES = 32 * 1024 * 1024
+TRABALHADORES = 2
+
+_executor = ThreadPoolExecutor(max_workers=TRABALHADORES, thread_name_prefix="relatorio")
+_lock = threading.Lock()
+_prontos = OrderedDict()
+_pendentes = {}
+_bytes_em_cache = 0
+
+def _guardar(chave, futuro):
+    global _bytes_em_cache
+    with _lock:
+        _pendentes.pop(chave, None)
+        if futuro.cancelled() or futuro.exception() is not None:
+            return
+        pdf = futuro.result()
+        _prontos[chave] = pdf
+        _bytes_em_cache += len(pdf)
+        while _bytes_em_cache > LIMITE_CACHE_BYTES and len(_prontos) > 1:
+            _, antigo = _prontos.popitem(last=False)
+            _bytes_em_cache -= len(antigo)
+
+def _solicitar(chave, funcao, *args):
+    # Devolve um Future: já resolvido se o PDF está em cache, o mesmo Future
+    # se a geração já está em andamento, ou um novo trabalho no pool
+    with _lock:
+        if chave in _prontos:
+            _prontos.move_to_end(chave)
+            futuro = Future()
+            futuro.set_result(_prontos[chave])
+            return futuro
+        if chave in _pendentes:
+            return _pendentes[chave]
+        futuro = _executor.submit(funcao, *args)
+        _pendentes[chave] = futuro
+    futuro.add_done_callback(lambda f: _guardar(chave, f))
+    return futuro
+
+def solicitar_pdf_mensal(ano_mes, reservas_id):
+    chave = ("mensal", mes_chave(ano_mes), reservas_id, versao_dados())
+    return _solicitar(chave, gerar_pdf_mensal, ano_mes, reservas_id)
+
+def estatisticas_relatorios():
+    with _lock:
+        return {"prontos": len(_prontos), "pendentes": len(_pendentes), "bytes": _bytes_em_cache}
+
+def solicitar_pdf_periodo(mes_inicio, mes_fim, reservas_id):
+    chave = ("periodo", mes_chave(mes_inicio), mes_chave(mes_fim), reservas_id, versao_dados())
+    return _solicitar(chave, gerar_pdf_periodo, mes_inicio, mes_fim, reservas_id)
+
+# -------------------- ESTILOS --------------------
+def _estilos():
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    estilos = getSampleStyleSheet()
+    estilos.add(ParagraphStyle(name="Titulo", fontSize=16, leading=20, spaceAfter=15, alignment=1))
+    estilos.add(ParagraphStyle(name="Subtitulo", fontSize=12, leading=14, spaceAfter=10, textColor=colors.HexColor("#4f46e5")))
+    estilos.add(ParagraphStyle(name="Texto", fontSize=10, leading=12))
+    estilos.add(ParagraphStyle(name="TextoPequeno", fontSize=8, leading=10))
+    return estilos
+
+# -------------------- PDF MENSAL --------------------
+def gerar_pdf_mensal(ano_mes, reservas_id):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+    receitas_total = get_total_receitas_mes(ano_mes)
+    saldos = get_saldos_mes(ano_mes)
+    total_atribuido = sum(saldo[3] for saldo in saldos) if saldos else 0
+    saldo_atual = sum(saldo[4] for saldo in saldos) if saldos else 0
+
+    reservas = [saldo for saldo in saldos if saldo[0] == reservas_id]
+    saldo_reservas = reservas[0][4] if reservas else 0
+
+    # Criar PDF em memória
+    buffer = io.BytesIO()
+    documento = SimpleDocTemplate(buffer, pagesize=A4)
+    elementos = []
+    estilos = _estilos()
+
+    # Cabeçalho
+    elementos.append(Paragraph("📊 Relatório Mensal de Orçamento e Finanças", estilos["Titulo"]))
+    elementos.append(Paragraph(f"Mês/Ano: {ano_mes}", estilos["Texto"]))
+    elementos.append(Spacer(1, 12))
+
+    # Resumo Executivo
+    elementos.append(Paragraph("Resumo Executivo", estilos["Subtitulo"]))
+    resumo_dados = [
+        [Paragraph("Receitas no mês", estilos["Texto"]), Paragraph(brl(receitas_total), estilos["Texto"])],
+        [Paragraph("Total atribuído em subcontas", estilos["Texto"]), Paragraph(brl(total_atribuido), estilos["Texto"])],
+        [Paragraph("Saldo atual consolidado", estilos["Texto"]), Paragraph(brl(saldo_atual), estilos["Texto"])],
+        [Paragraph("Saldo em Reservas", estilos["Texto"]), Paragraph(brl(saldo_reservas), estilos["Texto"])]
+    ]
+    tabela_resumo = Table(resumo_dados, colWidths=[250, 150])
+    tabela_resumo.setStyle(TableStyle([
+        ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
+        ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
+        ("VALIGN", (0,0), (-1,-1), "TOP"),
+    ]))
+    elementos.append(tabela_resumo)
+    elementos.append(Spacer(1, 18))
+
+    # Subcontas
+    elementos.append(Paragraph("Subcontas – Planejamento vs. Execução", estilos["Subtitulo"]))
+    dados_subcontas = [[
+        Paragraph("Subconta", estilos["Texto"]),
+        Paragraph("Planejado", estilos["Texto"]),
+        Paragraph("Gasto", estilos["Texto"]),
+        Paragraph("Saldo", estilos["Texto"])
+    ]]
+    for sid, conta, subconta, valor_inicial, valor_atual in saldos:
+        dados_subcontas.append([
+            Paragraph(f"{conta}/{subconta}", estilos["Texto"]),
+            Paragraph(brl(valor_inicial), estilos["Texto"]),
+            Paragraph(brl(valor_inicial - valor_atual), estilos["Texto"]),
+            Paragraph(brl(valor_atual), estilos["Texto"])
+        ])
+    tabela_subcontas = Table(dados_subcontas, colWidths=[200, 100, 100, 100])
+    tabela_subcontas.setStyle(TableStyle([
+        ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#dbeafe")),
+        ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
+        ("VALIGN", (0,0), (-1,-1), "TOP"),
+    ]))
+    elementos.append(tabela_subcontas)
+    elementos.append(Spacer(1, 18))
+
+    # Empréstimos (apenas com parcelas quitadas no mês)
+    elementos.append(Paragraph("Empréstimos", estilos["Subtitulo"]))
+    emprestimos_filtrados = [
+        (instituicao, contrato, tipo, quantidade_parcelas, valor_parcela)
+        for eid, instituicao, contrato, tipo, quantidade_parcelas, valor_parcela, *_ in resumo_emprestimos(quitadas_no_mes=ano_mes)
+    ]
+
+    if emprestimos_filtrados:
+        dados_emprestimos = [[
+            Paragraph("Instituição", estilos["Texto"]),
+            Paragraph("Contrato", estilos["Texto"]),
+            Paragraph("Tipo", estilos["Texto"]),
+            Paragraph("Parcelas", estilos["Texto"]),
+            Paragraph("Valor Parcela", estilos["Texto"])
+        ]]
+        for instituicao, contrato, tipo, quantidade_parcelas, valor_parcela in emprestimos_filtrados:
+            dados_emprestimos.append([
+                Paragraph(instituicao, estilos["Texto"]),
+                Paragraph(contrato, estilos["Texto"]),
+                Paragraph(tipo, estilos["Texto"]),
+                Paragraph(str(quantidade_parcelas), estilos["Texto"]),
+                Paragraph(brl(valor_parcela), estilos["Texto"])
+            ])
+        tabela_emprestimos = Table(dados_emprestimos, colWidths=[100, 150, 100, 80, 100])
+        tabela_emprestimos.setStyle(TableStyle([
+            ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#fef3c7")),
+            ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
+            ("VALIGN", (0,0), (-1,-1), "TOP"),
+        ]))
+        elementos.append(tabela_emprestimos)
+    else:
+        elementos.append(Paragraph("Nenhum empréstimo com parcelas quitadas neste mês.", estilos["Texto"]))
+
+    # Gerar PDF
+    documento.build(elementos)
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
+
+# -------------------- PDF DE PERÍODO --------------------
+def gerar_pdf_periodo(mes_inicio, mes_fim, reservas_id):
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+    meses = totais_por_mes(mes_inicio, mes_fim)
+    subcontas = totais_por_subconta(mes_inicio, mes_fim)
+    emprestimos = resumo_emprestimos(apenas_ativos=True)
+
+    buffer = io.BytesIO()
+    documento = SimpleDocTemplate(buffer, pagesize=landscape(A4))
+    elementos = []
+    estilos = _estilos()
+    texto = estilos["TextoPequeno"]
+
+    def tabela(linhas, larguras, cor):
+        t = Table([[Paragraph(str(c), texto) for c in linha] for linha in linhas],
+                  colWidths=larguras, repeatRows=1)
+        t.setStyle(TableStyle([
+            ("BACKGROUND", (0,0), (-1,0), colors.HexColor(cor)),
+            ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
+            ("VALIGN", (0,0), (-1,-1), "TOP"),
+        ]))
+        return t
+
+    # Cabeçalho
+    elementos.append(Paragraph("📊 Relatório de Período – Orçamento e Finanças", estilos["Titulo"]))
+    elementos.append(Paragraph(f"Período: {mes_br(mes_chave(mes_inicio))} a {mes_br(mes_chave(mes_fim))}", estilos["Texto"]))
+    elementos.append(Spacer(1, 12))
+
+    # Resumo Executivo
+    totais = [sum(m[i] for m in meses) for i in range(1, 9)]
+    elementos.append(Paragraph("Resumo Executivo", estilos["Subtitulo"]))
+    elementos.append(tabela([
+        ["Indicador", "Total no período"],
+        ["Receitas", brl(totais[0])],
+        ["Atribuído em subcontas", brl(totais[1])],
+        ["Gastos em subcontas", brl(totais[3])],
+        ["Transferências", brl(totais[4])],
+        [f"Parcelas de empréstimo pagas ({totais[5]})", brl(totais[6])],
+        ["Economia com quitações antecipadas", brl(totais[7])],
+    ], [250, 150], "#e5e7eb"))
+    elementos.append(Spacer(1, 18))
+
+    # Mês a mês
+    elementos.append(Paragraph("Evolução Mensal", estilos["Subtitulo"]))
+    linhas = [["Mês", "Receitas", "Atribuído", "Saldo", "Gastos", "Transferido", "Parcelas", "Pago", "Economia"]]
+    for mes, receitas, atribuido, saldo, gastos, transferido, qtd, pago, economia in meses:
+        linhas.append([mes, brl(receitas), brl(atribuido), brl(saldo), brl(gastos),
+                       brl(transferido), qtd, brl(pago), brl(economia)])
+    elementos.append(tabela(linhas, [60, 90, 90, 90, 90, 90, 55, 90, 80], "#dbeafe"))
+    elementos.append(Spacer(1, 18))
+
+    # Subcontas
+    elementos.append(Paragraph("Subcontas – Planejamento vs. Execução no Período", estilos["Subtitulo"]))
+    linhas = [["Subconta", "Planejado", "Gasto", "Transferências (líq.)", "Saldo"]]
+    for sid, conta, subconta, planejado, gasto, transf, saldo in subcontas:
+        if sid == reservas_id or planejado or gasto or transf:
+            linhas.append([f"{conta}/{subconta}", brl(planejado), brl(gasto), brl(transf), brl(saldo)])
+    elementos.append(tabela(linhas, [220, 110, 110, 130, 110], "#dbeafe"))
+    elementos.append(Spacer(1, 18))
+
+    # Empréstimos ativos
+    elementos.append(Paragraph("Empréstimos em Aberto", estilos["Subtitulo"]))
+    if emprestimos:
+        linhas = [["Instituição", "Contrato", "Tipo", "Quitadas", "Próximo venc.", "Saldo devedor", "Economia"]]
+        for eid, inst, contrato, tipo, qtd, valor, economia, abertas, quitadas, proximo, devedor in emprestimos:
+            linhas.append([inst, contrato, tipo, f"{quitadas}/{qtd}", proximo, brl(devedor), brl(economia)])
+        elementos.append(tabela(linhas, [110, 130, 100, 70, 90, 110, 100], "#fef3c7"))
+    else:
+        elementos.append(Paragraph("Nenhum empréstimo em aberto.", estilos["Texto"]))
+
+    documento.build(elementos)
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
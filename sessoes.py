@@ -0,0 +1,112 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from conexao import transacao, leitura
+
+# Sessões por usuário: cada login gera um token próprio com validade.
+# Tokens já vistos ficam num LRU em memória, então revalidar a sessão a
+# cada rerun não consulta o banco; passados VALIDADE_CACHE segundos o token
+# é reconferido, para que um logout feito em outro processo (API, outro
+# worker) valha aqui também. Expiradas são removidas periodicamente.
+
+DURACAO_SESSAO = timedelta(hours=1)
+LIMITE_SESSOES = 1024
+INTERVALO_LIMPEZA = 600  # segundos
+VALIDADE_CACHE = 30  # segundos até reconferir um token no banco
+
+_lock = threading.Lock()
+_tokens = OrderedDict()  # token -> (usuario, expira_em, conferido_em)
+_ultima_limpeza = 0.0
+
+# -------------------- USUÁRIOS --------------------
+def usuarios_configurados():
+    # APP_USER/APP_PASS e, para mais pessoas, APP_USERS="ana:senha1,joao:senha2"
+    usuarios = dict(par.split(":", 1) for par in os.environ.get("APP_USERS", "").split(",") if ":" in par)
+    if os.environ.get("APP_USER") and os.environ.get("APP_PASS"):
+        usuarios[os.environ["APP_USER"]] = os.environ["APP_PASS"]
+    return usuarios
+
+def autenticar(usuario, senha):
+    esperada = usuarios_configurados().get(usuario)
+    if not (usuario and senha and esperada):
+        return False
+    return secrets.compare_digest(esperada.encode(), senha.encode())
+
+# -------------------- CACHE --------------------
+def _guardar(token, usuario, expira_em):
+    with _lock:
+        _tokens[token] = (usuario, expira_em, time.monotonic())
+        _tokens.move_to_end(token)
+        if len(_tokens) > LIMITE_SESSOES:
+            _tokens.popitem(last=False)
+
+def _esquecer(token):
+    with _lock:
+        _tokens.pop(token, None)
+
+# -------------------- API --------------------
+def criar_sessao(usuario, duracao=DURACAO_SESSAO):
+    token = secrets.token_urlsafe(32)
+    agora = datetime.now()
+    expira_em = agora + duracao
+    with transacao(versionar=False) as cur:
+        cur.execute("INSERT INTO sessao (token, criado_em, usuario, expira_em) VALUES (?, ?, ?, ?)",
+                    (token, agora.isoformat(), usuario, expira_em.isoformat()))
+    _guardar(token, usuario, expira_em)
+    _limpar_se_preciso()
+    return token
+
+def validar_sessao(token):
+    # Retorna o usuário dono do token ou None se inválido/expirado
+    if not token or not isinstance(token, str):
+        return None
+    agora = datetime.now()
+    with _lock:
+        sessao = _tokens.get(token)
+        if sessao is not None:
+            _tokens.move_to_end(token)
+    if sessao is None or time.monotonic() - sessao[2] >= VALIDADE_CACHE:
+        with leitura() as cur:
+            cur.execute("SELECT usuario, expira_em FROM sessao WHERE token=? AND expira_em > ?",
+                        (token, agora.isoformat()))
+            row = cur.fetchone()
+        if row is None:
+            _esquecer(token)
+            return None
+        sessao = (row[0], datetime.fromisoformat(row[1]))
+        _guardar(token, *sessao)
+    usuario, expira_em = sessao[:2]
+    if expira_em <= agora:
+        _esquecer(token)
+        return None
+    _limpar_se_preciso()
+    return usuario
+
+def encerrar_sessao(token):
+    _esquecer(token)
+    with transacao(versionar=False) as cur:
+        cur.execute("DELETE FROM sessao WHERE token=?", (token,))
+
+# -------------------- LIMPEZA --------------------
+def limpar_sessoes_expiradas():
+    global _ultima_limpeza
+    agora = datetime.now()
+    with _lock:
+        _ultima_limpeza = time.monotonic()
+        for token in [t for t, (_, expira_em, _) in _tokens.items() if expira_em <= agora]:
+            del _tokens[token]
+    with transacao(versionar=False) as cur:
+        cur.execute("DELETE FROM sessao WHERE expira_em <= ?", (agora.isoformat(),))
+        return cur.rowcount
+
+def _limpar_se_preciso():
+    if time.monotonic() - _ultima_limpeza >= INTERVALO_LIMPEZA:
+        limpar_sessoes_expiradas()
+
+def limpar_cache_sessoes():
+    with _lock:
+        _tokens.clear()
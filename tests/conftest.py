@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import conexao
+from cache import limpar_cache
+
+
+@pytest.fixture
+def usar_banco_temporario(tmp_path):
+    # Aponta o pool para um arquivo novo e volta ao banco anterior no fim
+    anterior = conexao.DB_NAME
+    caminho = str(tmp_path / "finance.db")
+    conexao.usar_banco(caminho)
+    limpar_cache()
+    yield caminho
+    conexao.usar_banco(anterior)
+    limpar_cache()
+
+
+@pytest.fixture
+def banco(usar_banco_temporario):
+    # Banco novo já migrado
+    import db
+    db.init_db()
+    return usar_banco_temporario
@@ -0,0 +1,90 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from amortizacao import gerar_cronograma, otimizar_quitacao
+
+
+def test_fixo():
+    meses, parcelas, amortizacoes, juros = gerar_cronograma("11/2025", 3, "FIXO", valor_parcela=100.004)
+    assert meses == [202511, 202512, 202601]
+    assert parcelas == [100.0] * 3
+    assert amortizacoes == juros == [None] * 3
+
+
+def test_price_parcela_constante_e_quita_o_saldo():
+    _, parcelas, amortizacoes, juros = gerar_cronograma("01/2025", 12, "PRICE", valor_financiado=10000,
+                                                        taxa_mensal=0.02)
+    assert parcelas[0] == 945.6
+    assert len(set(parcelas[:-1])) == 1
+    assert round(sum(amortizacoes), 2) == 10000
+    assert juros[0] == 200 and juros == sorted(juros, reverse=True)
+    assert all(round(a + j, 2) == p for p, a, j in zip(parcelas, amortizacoes, juros))
+
+
+def test_price_sem_juros():
+    _, parcelas, amortizacoes, juros = gerar_cronograma("01/2025", 3, "price", valor_financiado=100)
+    assert parcelas == [33.33, 33.33, 33.34]
+    assert juros == [0, 0, 0]
+
+
+def test_sac_amortizacao_constante():
+    _, parcelas, amortizacoes, juros = gerar_cronograma("01/2025", 4, "SAC", valor_financiado=1000,
+                                                        taxa_mensal=0.01)
+    assert amortizacoes == [250] * 4
+    assert juros == [10, 7.5, 5, 2.5]
+    assert parcelas == [260, 257.5, 255, 252.5]
+
+
+@pytest.mark.parametrize("sistema", ["FIXO", "PRICE", "SAC"])
+@pytest.mark.parametrize("qtd", [0, -1, 2.5, None])
+def test_quantidade_invalida(sistema, qtd):
+    with pytest.raises(ValueError):
+        gerar_cronograma("01/2025", qtd, sistema, valor_parcela=100, valor_financiado=1000, taxa_mensal=0.01)
+
+
+def test_valor_obrigatorio_por_sistema():
+    with pytest.raises(ValueError):
+        gerar_cronograma("01/2025", 12, "FIXO")
+    with pytest.raises(ValueError):
+        gerar_cronograma("01/2025", 12, "PRICE", valor_parcela=100)
+    with pytest.raises(ValueError):
+        gerar_cronograma("01/2025", 12, "SAC", valor_financiado=0)
+
+
+def test_taxa_negativa_e_sistema_desconhecido():
+    with pytest.raises(ValueError):
+        gerar_cronograma("01/2025", 12, "PRICE", valor_financiado=1000, taxa_mensal=-0.01)
+    with pytest.raises(ValueError):
+        gerar_cronograma("01/2025", 12, "BALAO", valor_financiado=1000)
+
+
+def _melhor_por_forca_bruta(custos, ganhos, orcamento):
+    melhor = 0.0
+    for n in range(1, len(custos) + 1):
+        for combinacao in combinations(range(len(custos)), n):
+            if sum(custos[i] for i in combinacao) <= orcamento + 1e-9:
+                melhor = max(melhor, sum(ganhos[i] for i in combinacao))
+    return melhor
+
+
+def test_otimizacao_bate_com_forca_bruta():
+    rng = random.Random(1)
+    for _ in range(200):
+        n = rng.randint(1, 10)
+        custos = [round(rng.uniform(50, 2000), 2) for _ in range(n)]
+        ganhos = [round(rng.uniform(0, 300), 2) for _ in range(n)]
+        orcamento = round(rng.uniform(0, sum(custos)), 2)
+
+        escolhidos, custo, ganho, _ = otimizar_quitacao(custos, ganhos, orcamento)
+        assert custo <= orcamento + 0.01
+        assert custo == pytest.approx(sum(custos[i] for i in escolhidos), abs=0.01)
+        assert ganho == pytest.approx(sum(ganhos[i] for i in escolhidos), abs=0.01)
+        # O ganho devolvido é arredondado em centavos
+        assert ganho >= _melhor_por_forca_bruta(custos, ganhos, orcamento) - 0.011
+
+
+def test_otimizacao_sem_orcamento_ou_sem_ganho():
+    assert otimizar_quitacao([100, 200], [10, 20], 0) == ([], 0.0, 0.0, "nenhum")
+    assert otimizar_quitacao([100, 200], [0, 0], 500) == ([], 0.0, 0.0, "nenhum")
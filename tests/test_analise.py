@@ -0,0 +1,60 @@
+import analise
+import db
+from conexao import transacao
+
+
+def test_series_ignoram_sobra_mas_nao_transferencia_sem_justificativa(banco):
+    db.add_conta("Casa")
+    db.add_subconta("Mercado", db.get_contas()[0][0])
+    mercado = db.get_subcontas()[0][0]
+    reservas = db.garantir_reservas()
+    db.salvar_valor_subconta("01/2025", mercado, 100)
+    with transacao() as cur:
+        cur.execute("INSERT INTO transferencias (data, subconta_origem, subconta_destino, valor, justificativa, mes_ano) "
+                    "VALUES ('2025-01-10', ?, ?, 30, NULL, 202501)", (mercado, reservas))
+    db.fechar_mes("01/2025", reservas, "01/02/2025")
+
+    meses, subcontas, planejado, gasto, transferido = analise.series_mensais("01/2025", "02/2025")
+    linha = {sid: i for i, (sid, _, _) in enumerate(subcontas)}
+    # Só a transferência sem justificativa conta; a sobra do fechamento (70) não
+    assert transferido[linha[mercado]].tolist() == [-30, 0]
+    assert transferido[linha[reservas]].tolist() == [30, 0]
+
+
+def test_series_contam_transferencia_manual_com_texto_da_sobra(banco):
+    db.add_conta("Casa")
+    db.add_subconta("Mercado", db.get_contas()[0][0])
+    mercado = db.get_subcontas()[0][0]
+    reservas = db.garantir_reservas()
+    db.salvar_valor_subconta("01/2025", mercado, 100)
+    # Quem marca a varredura é a coluna automatica, não a justificativa
+    db.registrar_transferencia("15/01/2025", mercado, reservas, 25,
+                               db.JUSTIFICATIVA_SOBRA.format("01/2025"), "01/2025")
+
+    _, subcontas, _, _, transferido = analise.series_mensais("01/2025", "01/2025")
+    linha = {sid: i for i, (sid, _, _) in enumerate(subcontas)}
+    assert transferido[linha[mercado]].tolist() == [-25]
+    assert transferido[linha[reservas]].tolist() == [25]
+
+
+def test_totais_usam_o_mes_de_competencia_como_as_series(banco):
+    db.add_conta("Casa")
+    db.add_subconta("Mercado", db.get_contas()[0][0])
+    mercado = db.get_subcontas()[0][0]
+    db.salvar_valor_subconta("03/2025", mercado, 100)
+    # Gasto de março lançado com data de abril
+    db.registrar_gasto("02/04/2025", 40, "fatura", mercado, "03/2025")
+
+    por_mes = {linha[0]: linha[4] for linha in db.totais_por_mes("03/2025", "04/2025")}
+    assert por_mes == {"03/2025": 40, "04/2025": 0}
+    assert db.totais_por_subconta("03/2025", "03/2025")[0][4] == 40
+    assert db.totais_por_subconta("04/2025", "04/2025")[0][4] == 0
+    _, _, _, gasto, _ = analise.series_mensais("03/2025", "04/2025")
+    assert gasto[0].tolist() == [40, 0]
+
+
+def test_periodo_vazio_nao_quebra(banco):
+    db.garantir_reservas()
+    meses, linhas, indicadores = analise.analisar("05/2025", "03/2025")
+    assert meses == []
+    assert all(m.shape == (len(linhas), 0) for m in indicadores.values())
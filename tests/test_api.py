@@ -0,0 +1,43 @@
+import pytest
+from starlette.testclient import TestClient
+
+import api
+
+
+@pytest.fixture
+def cliente(banco, monkeypatch):
+    monkeypatch.setenv("APP_USER", "ana")
+    monkeypatch.setenv("APP_PASS", "s1")
+    with TestClient(api.app) as c:
+        token = c.post("/sessoes", json={"usuario": "ana", "senha": "s1"}).json()["token"]
+        c.headers["Authorization"] = f"Bearer {token}"
+        yield c
+
+
+@pytest.mark.parametrize("corpo", [
+    {"qtd_parcelas": 0, "valor_parcela": 100},
+    {"qtd_parcelas": -3, "valor_parcela": 100},
+    {"qtd_parcelas": 12, "sistema": "PRICE", "valor_financiado": 1000, "taxa_juros": -0.1},
+])
+def test_emprestimo_invalido_responde_400(cliente, corpo):
+    r = cliente.post("/emprestimos", json=dict(corpo, instituicao="B", contrato="X", primeira_parcela="01/2026"))
+    assert r.status_code == 400
+    assert "erro" in r.json()
+
+
+def test_emprestimo_valido(cliente):
+    r = cliente.post("/emprestimos", json={"instituicao": "B", "contrato": "X", "primeira_parcela": "01/2026",
+                                           "qtd_parcelas": 3, "sistema": "SAC", "valor_financiado": 300})
+    assert r.status_code == 201
+    assert len(cliente.get(f"/emprestimos/{r.json()['id']}/parcelas").json()) == 3
+
+
+def test_simulacao_de_emprestimo_inexistente_responde_404(cliente):
+    assert cliente.get("/emprestimos/999/simulacao").status_code == 404
+
+
+@pytest.mark.parametrize("caminho", ["/relatorios", "/relatorios/pdf", "/analises"])
+def test_periodo_invertido_responde_400(cliente, caminho):
+    r = cliente.get(caminho, params={"inicio": "05/2025", "fim": "03/2025"})
+    assert r.status_code == 400
+    assert "erro" in r.json()
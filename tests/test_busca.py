@@ -0,0 +1,50 @@
+import db
+from conexao import transacao
+
+
+def _ids(texto, **kwargs):
+    return [(tabela, rid) for tabela, rid, *_ in db.buscar(texto, **kwargs)]
+
+
+def test_busca_acompanha_insercao_edicao_e_exclusao(banco):
+    db.add_conta("Casa")
+    db.add_subconta("Mercado", db.get_contas()[0][0])
+    mercado = db.get_subcontas()[0][0]
+    db.add_receita("05/03/2025", "Salário", 5000, "pagamento de março")
+    db.salvar_valor_subconta("03/2025", mercado, 100)
+    db.registrar_gasto("10/03/2025", 30, "Farmácia São João", mercado, "03/2025")
+    eid = db.registrar_emprestimo("Banco Farmacêutico", "C-1", "Pessoal", "04/2025", 2, 150)
+
+    # Prefixo, sem acento e em qualquer campo (descrição, origem, contrato)
+    assert sorted(_ids("farma")) == [("emprestimos", eid), ("gastos", 1)]
+    assert _ids("salario") == [("receitas", 1)]
+    assert _ids("farma", tabelas=["gastos"]) == [("gastos", 1)]
+    tabela, rid, data, valor, texto, _ = db.buscar("sao joao")[0]
+    assert (tabela, data, valor, texto) == ("gastos", "10/03/2025", 30, "Farmácia [São] [João]")
+
+    with transacao() as cur:
+        cur.execute("UPDATE gastos SET descricao = 'Drogaria' WHERE id = 1")
+    assert _ids("farma") == [("emprestimos", eid)]
+    assert _ids("drogaria") == [("gastos", 1)]
+
+    with transacao() as cur:
+        cur.execute("DELETE FROM gastos WHERE id = 1")
+    db.excluir_emprestimo(eid)
+    assert _ids("drogaria") == []
+    assert _ids("farma") == []
+
+
+def test_ids_iguais_em_tabelas_diferentes_nao_colidem(banco):
+    db.add_conta("Casa")
+    db.add_subconta("Mercado", db.get_contas()[0][0])
+    mercado = db.get_subcontas()[0][0]
+    reservas = db.garantir_reservas()
+    db.add_receita("05/03/2025", "Feira", 10, "")
+    db.salvar_valor_subconta("03/2025", mercado, 100)
+    db.registrar_gasto("10/03/2025", 30, "feira", mercado, "03/2025")
+    db.registrar_transferencia("11/03/2025", mercado, reservas, 5, "sobra da feira", "03/2025")
+
+    assert sorted(_ids("feira")) == [("gastos", 1), ("receitas", 1), ("transferencias", 1)]
+    with transacao() as cur:
+        cur.execute("DELETE FROM receitas WHERE id = 1")
+    assert sorted(_ids("feira")) == [("gastos", 1), ("transferencias", 1)]
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+import sqlite3
+
+import conexao
+import db
+from cache import estatisticas_cache
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _em_outro_processo(banco, codigo):
+    subprocess.run([sys.executable, "-c", f"import db; db.init_db(); {codigo}"],
+                   cwd=RAIZ, env=dict(os.environ, FINANCE_DB=banco), check=True)
+
+
+def test_leitura_repetida_vem_do_cache(banco):
+    db.add_receita("2025-03-05", "Salário", 100, "")
+    assert db.get_total_receitas_mes(202503) == 100
+    acertos = estatisticas_cache()["acertos"]
+    assert db.get_total_receitas_mes(202503) == 100
+    assert estatisticas_cache()["acertos"] == acertos + 1
+
+
+def test_escrita_de_outro_processo_invalida_cache(banco):
+    db.add_receita("2025-03-05", "Salário", 100, "")
+    assert db.get_total_receitas_mes(202503) == 100
+    _em_outro_processo(banco, "db.add_receita('2025-03-06', 'Extra', 50, '')")
+    # O app relê a versão no começo de cada rerun
+    conexao.sincronizar_versao()
+    assert db.get_total_receitas_mes(202503) == 150
+
+
+def test_acerto_de_cache_nao_consulta_o_banco(banco, monkeypatch):
+    consultas = []
+
+    class CursorContado(sqlite3.Cursor):
+        def execute(self, sql, *args):
+            consultas.append(sql)
+            return super().execute(sql, *args)
+
+    db.add_receita("2025-03-05", "Salário", 100, "")
+    conexao.sincronizar_versao()
+    db.get_total_receitas_mes(202503)
+    db.get_subcontas()
+    monkeypatch.setattr(conexao, "fabrica_cursor", CursorContado)
+    for _ in range(3):
+        db.get_total_receitas_mes(202503)
+        db.get_subcontas()
+    assert consultas == []
+
+
+def test_escrita_local_invalida_sem_sincronizar(banco):
+    assert db.get_total_receitas_mes(202503) == 0
+    db.add_receita("2025-03-05", "Salário", 100, "")
+    assert db.get_total_receitas_mes(202503) == 100
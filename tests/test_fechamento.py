@@ -0,0 +1,82 @@
+import db
+from conexao import leitura
+
+
+def _subcontas():
+    db.add_conta("Casa")
+    conta_id = [cid for cid, nome in db.get_contas() if nome == "Casa"][0]
+    db.add_subconta("Mercado", conta_id)
+    db.add_subconta("Lazer", conta_id)
+    reservas_id = db.garantir_reservas()
+    ids = {nome: sid for sid, nome, _ in db.get_subcontas()}
+    return ids["Mercado"], ids["Lazer"], reservas_id
+
+
+def _saldo(subconta_id, ano_mes):
+    return db.resumo_saldos_mes(ano_mes, subconta_id=subconta_id)[2]
+
+
+def test_sobras_vao_para_a_reservas_do_mes_seguinte(banco):
+    mercado, lazer, reservas = _subcontas()
+    db.salvar_valor_subconta("01/2025", mercado, 300)
+    db.salvar_valor_subconta("01/2025", lazer, 100)
+    db.registrar_gasto("10/01/2025", 120, "feira", mercado, "01/2025")
+
+    assert db.fechar_mes("01/2025", reservas, "01/02/2025") == (2, 280)
+    assert _saldo(mercado, "01/2025") == 0
+    assert _saldo(reservas, "01/2025") == 0
+    assert _saldo(reservas, "02/2025") == 280
+    assert db.fechar_mes("01/2025", reservas) is None
+
+
+def test_reservas_e_levada_sem_transferencia_para_si_mesma(banco):
+    mercado, _, reservas = _subcontas()
+    db.salvar_valor_subconta("01/2025", mercado, 50)
+    db.salvar_valor_subconta("01/2025", reservas, 20)
+
+    assert db.fechar_mes("01/2025", reservas, "01/02/2025") == (1, 50)
+    assert _saldo(reservas, "02/2025") == 70
+    with leitura() as cur:
+        cur.execute("SELECT subconta_origem, subconta_destino, valor, justificativa, automatica FROM transferencias")
+        assert cur.fetchall() == [(mercado, reservas, 50, db.JUSTIFICATIVA_SOBRA.format("01/2025"), 1)]
+
+
+def test_reservas_acumula_entre_meses_fechados(banco):
+    mercado, lazer, reservas = _subcontas()
+    db.salvar_valor_subconta("01/2025", mercado, 50)
+    db.salvar_valor_subconta("02/2025", lazer, 30)
+    db.salvar_valor_subconta("03/2025", mercado, 10)
+
+    fechados = db.fechar_meses_pendentes("03/2025", reservas, "01/03/2025")
+    assert fechados == [("01/2025", 1, 50), ("02/2025", 1, 30)]
+    # A Reservas de fevereiro foi levada junto para março
+    assert _saldo(reservas, "02/2025") == 0
+    assert _saldo(reservas, "03/2025") == 80
+    assert _saldo(mercado, "03/2025") == 10
+
+
+def test_reservas_atravessa_meses_sem_atribuicoes(banco):
+    mercado, _, reservas = _subcontas()
+    db.salvar_valor_subconta("01/2025", mercado, 500)
+
+    fechados = db.fechar_meses_pendentes("04/2025", reservas, "01/04/2025")
+    assert fechados == [("01/2025", 1, 500), ("02/2025", 0, 0), ("03/2025", 0, 0)]
+    assert _saldo(reservas, "04/2025") == 500
+
+
+def test_quitar_com_reservas_usa_o_saldo_acumulado(banco):
+    mercado, _, reservas = _subcontas()
+    db.salvar_valor_subconta("01/2025", mercado, 500)
+    db.registrar_emprestimo("Banco", "C-1", "Pessoal", "04/2025", 2, 150)
+    with leitura() as cur:
+        parcelas = [pid for pid, in cur.execute("SELECT id FROM parcelas_emprestimo ORDER BY id")]
+
+    # Janeiro ainda não foi fechado: o débito fecha antes e usa a sobra
+    assert db.quitar_com_reservas([(pid, 150) for pid in parcelas], "10/03/2025", reservas, "03/2025") == 2
+    assert db.saldo_reservas("03/2025", reservas) == 200
+
+    db.registrar_emprestimo("Banco", "C-2", "Pessoal", "04/2025", 1, 250)
+    with leitura() as cur:
+        nova = cur.execute("SELECT MAX(id) FROM parcelas_emprestimo").fetchone()[0]
+    assert db.quitar_com_reservas([(nova, 250)], "11/03/2025", reservas, "03/2025") is None
+    assert db.saldo_reservas("03/2025", reservas) == 200
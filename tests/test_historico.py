@@ -0,0 +1,47 @@
+import db
+from conexao import transacao
+
+
+def _subcontas():
+    db.add_conta("Casa")
+    conta_id = db.get_contas()[0][0]
+    db.add_subconta("Mercado", conta_id)
+    db.add_subconta("Lazer", conta_id)
+    return [sid for sid, _, _ in db.get_subcontas()]
+
+
+def _paginas(funcao, limite, **filtros):
+    paginas, apos = [], None
+    while True:
+        rows, apos = funcao(apos=apos, limite=limite, **filtros)
+        paginas.append([row[0] for row in rows])
+        if apos is None:
+            return paginas
+
+
+def test_gastos_paginam_sem_repetir_nem_pular_na_mesma_data(banco):
+    mercado, lazer = _subcontas()
+    # Cinco gastos no mesmo dia e dois em outros, direto na tabela para não
+    # depender de saldo; a fronteira das páginas cai no meio do mesmo dia
+    with transacao() as cur:
+        cur.executemany("INSERT INTO gastos (data, valor, descricao, subconta_id, ano_mes) VALUES (?, ?, '', ?, ?)",
+                        [("2025-03-10", 10, mercado, 202503)] * 5 +
+                        [("2025-03-11", 20, mercado, 202503), ("2025-03-09", 30, lazer, 202503)])
+
+    paginas = _paginas(db.historico_gastos, 2)
+    assert paginas == [[6, 5], [4, 3], [2, 1], [7]]
+    assert _paginas(db.historico_gastos, 3, subconta_id=mercado) == [[6, 5, 4], [3, 2, 1]]
+    assert _paginas(db.historico_gastos, 10, data_inicio="10/03/2025", data_fim="10/03/2025") == [[5, 4, 3, 2, 1]]
+
+
+def test_transferencias_da_subconta_paginam_pelos_dois_lados(banco):
+    mercado, lazer = _subcontas()
+    with transacao() as cur:
+        cur.executemany("INSERT INTO transferencias (data, subconta_origem, subconta_destino, valor, justificativa, "
+                        "mes_ano) VALUES ('2025-03-10', ?, ?, ?, NULL, 202503)",
+                        [(mercado, lazer, 1), (lazer, mercado, 2), (mercado, lazer, 3), (lazer, mercado, 4),
+                         (mercado, mercado, 5)])
+
+    assert _paginas(db.historico_transferencias, 2, subconta_id=mercado) == [[5, 4], [3, 2], [1]]
+    assert _paginas(db.historico_transferencias, 4, subconta_id=lazer) == [[4, 3, 2, 1]]
+    assert _paginas(db.historico_transferencias, 2, valor_min=2, valor_max=4) == [[4, 3], [2]]
@@ -0,0 +1,32 @@
+import io
+
+import pytest
+
+from importacao import converter_valor, ler_csv
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("1.234,56", 1234.56),
+    ("1,234.56", 1234.56),
+    ("-1234.56", -1234.56),
+    ("R$ 10,00", 10.0),
+    ("(50,00)", -50.0),
+    ("1.234.567,89", 1234567.89),
+    ("1,234,567.89", 1234567.89),
+    ("1.234.567", 1234567.0),
+    ("0,5", 0.5),
+    ("12.5", 12.5),
+])
+def test_converter_valor(texto, esperado):
+    assert converter_valor(texto) == esperado
+
+
+@pytest.mark.parametrize("texto", ["1,2,3.4", "1.2.3", "12,34.56", "abc"])
+def test_converter_valor_invalido(texto):
+    with pytest.raises(ValueError):
+        converter_valor(texto)
+
+
+def test_csv_em_ingles():
+    arquivo = io.BytesIO(b'date,amount,description\n2025-03-05,"1,234.56",Rent\n2025-03-06,-12.5,Coffee\n')
+    assert [(l.data, l.valor) for l in ler_csv(arquivo)] == [("2025-03-05", 1234.56), ("2025-03-06", -12.5)]
@@ -0,0 +1,24 @@
+import pytest
+
+import instrumentacao
+from instrumentacao import Consulta
+
+
+@pytest.fixture
+def limpo():
+    instrumentacao.limpar()
+    yield
+    instrumentacao.limpar()
+
+
+def test_prometheus_nao_arredonda_valores_grandes(limpo):
+    consulta = Consulta("Dashboard", "SELECT 1")
+    consulta.duracao_ms, consulta.linhas = 1234567.5, 1234567
+    instrumentacao._registrar(consulta)
+
+    metricas = dict(linha.rsplit(" ", 1) for linha in instrumentacao.prometheus().splitlines()
+                    if linha.startswith("financesystem_sql_"))
+    rotulos = '{pagina="Dashboard",sql="SELECT 1"}'
+    assert metricas["financesystem_sql_execucoes_total" + rotulos] == "1"
+    assert metricas["financesystem_sql_linhas_total" + rotulos] == "1234567"
+    assert float(metricas["financesystem_sql_segundos_total" + rotulos]) == pytest.approx(1234.5675)
@@ -0,0 +1,67 @@
+import pytest
+
+import db
+
+
+@pytest.fixture
+def subcontas(banco):
+    db.add_conta("Casa")
+    conta_id = db.get_contas()[0][0]
+    db.add_subconta("Mercado", conta_id)
+    db.add_subconta("Lazer", conta_id)
+    return [sid for sid, _, _ in db.get_subcontas()]
+
+
+def _saldo(subconta_id, ano_mes="03/2025"):
+    return db.resumo_saldos_mes(ano_mes, subconta_id=subconta_id)[2]
+
+
+def test_gasto_debita_ate_o_saldo(subcontas):
+    sid = subcontas[0]
+    db.salvar_valor_subconta("03/2025", sid, 100)
+    assert db.registrar_gasto("10/03/2025", 60, "feira", sid, "03/2025")
+    assert not db.registrar_gasto("11/03/2025", 40.01, "feira", sid, "03/2025")
+    assert db.registrar_gasto("12/03/2025", 40, "feira", sid, "03/2025")
+    assert _saldo(sid) == 0
+    assert len(db.listar_gastos("01/03/2025", "31/03/2025", sid)) == 2
+
+
+def test_gasto_sem_linha_do_mes_nao_grava(subcontas):
+    assert not db.registrar_gasto("10/03/2025", 1, "feira", subcontas[0], "03/2025")
+    assert db.listar_gastos("01/03/2025", "31/03/2025") == []
+
+
+def test_saldo_comparado_em_centavos(subcontas):
+    sid = subcontas[0]
+    db.salvar_valor_subconta("03/2025", sid, 0.3)
+    assert db.registrar_gasto("10/03/2025", 0.1, "", sid, "03/2025")
+    assert db.registrar_gasto("10/03/2025", 0.2, "", sid, "03/2025")
+    assert _saldo(sid) == 0
+
+
+@pytest.mark.parametrize("valor", [0, -50])
+def test_valor_nao_positivo_rejeitado(subcontas, valor):
+    origem, destino = subcontas
+    db.salvar_valor_subconta("03/2025", origem, 100)
+    with pytest.raises(ValueError):
+        db.registrar_gasto("10/03/2025", valor, "", origem, "03/2025")
+    with pytest.raises(ValueError):
+        db.registrar_transferencia("10/03/2025", origem, destino, valor, "ajuste", "03/2025")
+    assert _saldo(origem) == 100
+    assert db.listar_gastos("01/03/2025", "31/03/2025") == []
+
+
+def test_transferencia_debita_origem_e_credita_destino(subcontas):
+    origem, destino = subcontas
+    db.salvar_valor_subconta("03/2025", origem, 50)
+    assert not db.registrar_transferencia("10/03/2025", origem, destino, 50.01, "ajuste", "03/2025")
+    assert db.registrar_transferencia("10/03/2025", origem, destino, 50, "ajuste", "03/2025")
+    assert (_saldo(origem), _saldo(destino)) == (0, 50)
+    assert len(db.listar_transferencias("01/03/2025", "31/03/2025")) == 1
+
+
+def test_lote_debita_em_centavos(subcontas):
+    sid = subcontas[0]
+    db.salvar_valor_subconta("03/2025", sid, 0.7)
+    db.registrar_lote([], [("10/03/2025", 0.1, "pão", sid), ("11/03/2025", 0.2, "café", sid)])
+    assert _saldo(sid) == 0.4
@@ -0,0 +1,104 @@
+import sqlite3
+
+import pytest
+
+import conexao
+from conexao import leitura
+from migracoes import MIGRACOES, migrar, _v1_tabelas
+
+
+def _banco_original(caminho):
+    # Schema e formatos anteriores às migrações: datas "DD/MM/AAAA", meses
+    # "MM/AAAA" e atribuições duplicadas para a mesma subconta e mês
+    conn = sqlite3.connect(caminho)
+    c = conn.cursor()
+    _v1_tabelas(c)
+    c.execute("INSERT INTO contas (nome) VALUES ('Casa')")
+    c.executemany("INSERT INTO subcontas (nome, conta_id) VALUES (?, 1)", [("Mercado",), ("Reservas",)])
+    c.execute("INSERT INTO receitas (data, origem, valor, descricao, ano_mes) "
+              "VALUES ('05/03/2024', 'Salário', 5000, 'março', '03/2024')")
+    c.executemany("INSERT INTO subconta_atribuicoes (subconta_id, ano_mes, saldo_inicial, saldo_atual) "
+                  "VALUES (?, ?, ?, ?)",
+                  [(1, "03/2024", 100, 80), (1, "03/2024", 50, 40), (1, "03/2024", 25, 25),
+                   (1, "04/2024", 10, 10), (2, "03/2024", 0, 0)])
+    c.execute("INSERT INTO gastos (data, valor, descricao, subconta_id, ano_mes) "
+              "VALUES ('20/03/2024', 20, 'feira', 1, '03/2024')")
+    c.execute("INSERT INTO transferencias (data, subconta_origem, subconta_destino, valor, justificativa, mes_ano) "
+              "VALUES ('21/03/2024', 1, 2, 5, NULL, '03/2024')")
+    c.execute("INSERT INTO emprestimos (instituicao, contrato, tipo, primeira_parcela, qtd_parcelas, valor_parcela) "
+              "VALUES ('Banco', 'C-1', 'Pessoal', '01/2024', 2, 300)")
+    c.executemany("INSERT INTO parcelas_emprestimo (emprestimo_id, mes_ano, valor_original, valor_quitado, data_quitacao) "
+                  "VALUES (1, ?, 300, ?, ?)",
+                  [("01/2024", 300, "10/01/2024"), ("02/2024", None, None)])
+    c.execute("INSERT INTO sessao (token, criado_em) VALUES ('abc', '2024-03-01 10:00:00')")
+    conn.commit()
+    conn.close()
+
+
+def test_migra_banco_original(usar_banco_temporario):
+    _banco_original(usar_banco_temporario)
+    migrar()
+
+    with leitura() as c:
+        c.execute("PRAGMA user_version")
+        assert c.fetchone()[0] == len(MIGRACOES)
+        c.execute("PRAGMA integrity_check")
+        assert c.fetchone()[0] == "ok"
+
+        c.execute("SELECT data, ano_mes FROM receitas")
+        assert c.fetchall() == [("2024-03-05", 202403)]
+        c.execute("SELECT data, ano_mes FROM gastos")
+        assert c.fetchall() == [("2024-03-20", 202403)]
+        c.execute("SELECT data, mes_ano FROM transferencias")
+        assert c.fetchall() == [("2024-03-21", 202403)]
+        c.execute("SELECT primeira_parcela FROM emprestimos")
+        assert c.fetchall() == [(202401,)]
+        c.execute("SELECT mes_ano, data_quitacao FROM parcelas_emprestimo ORDER BY id")
+        assert c.fetchall() == [(202401, "2024-01-10"), (202402, None)]
+
+        # Duplicadas somadas na linha de menor id
+        c.execute("SELECT id, subconta_id, ano_mes, saldo_inicial, saldo_atual "
+                  "FROM subconta_atribuicoes ORDER BY id")
+        assert c.fetchall() == [(1, 1, 202403, 175, 145), (4, 1, 202404, 10, 10), (5, 2, 202403, 0, 0)]
+
+        c.execute("SELECT expira_em FROM sessao WHERE token='abc'")
+        assert c.fetchall() == [("2024-03-01T11:00:00",)]
+
+
+def test_chave_unica_apos_migrar(usar_banco_temporario):
+    _banco_original(usar_banco_temporario)
+    migrar()
+    with leitura() as c:
+        with pytest.raises(sqlite3.IntegrityError):
+            c.execute("INSERT INTO subconta_atribuicoes (subconta_id, ano_mes, saldo_inicial, saldo_atual) "
+                      "VALUES (1, 202403, 1, 1)")
+
+
+def test_migrar_de_novo_nao_altera(usar_banco_temporario):
+    import migracoes
+    _banco_original(usar_banco_temporario)
+    migrar()
+    migracoes._migrados.discard(conexao.DB_NAME)
+    migrar()
+    with leitura() as c:
+        c.execute("PRAGMA user_version")
+        assert c.fetchone()[0] == len(MIGRACOES)
+        c.execute("SELECT COUNT(*) FROM subconta_atribuicoes")
+        assert c.fetchone()[0] == 3
+
+
+def test_marca_sobras_antigas_e_remove_autotransferencia(usar_banco_temporario):
+    _banco_original(usar_banco_temporario)
+    conn = sqlite3.connect(usar_banco_temporario)
+    conn.executemany("INSERT INTO transferencias (data, subconta_origem, subconta_destino, valor, justificativa, mes_ano) "
+                     "VALUES ('01/04/2024', ?, 2, ?, 'Sobra automática de 03/2024', '03/2024')",
+                     [(1, 60), (2, 5)])
+    conn.execute("INSERT INTO transferencias (data, subconta_origem, subconta_destino, valor, justificativa, mes_ano) "
+                 "VALUES ('02/04/2024', 1, 2, 7, 'Sobra automática da viagem', '03/2024')")
+    conn.commit()
+    conn.close()
+    migrar()
+
+    with leitura() as c:
+        c.execute("SELECT subconta_origem, valor, automatica FROM transferencias ORDER BY id")
+        assert c.fetchall() == [(1, 5, 0), (1, 60, 1), (1, 7, 0)]
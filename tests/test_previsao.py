@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+import db
+import previsao
+
+
+@pytest.fixture
+def historico(banco):
+    previsao.limpar_previsao()
+    db.add_conta("Casa")
+    db.add_subconta("Mercado", db.get_contas()[0][0])
+    mercado = db.get_subcontas()[0][0]
+    reservas = db.garantir_reservas()
+    for mes in ("01/2025", "02/2025"):
+        db.salvar_valor_subconta(mes, mercado, 100)
+        db.salvar_valor_subconta(mes, reservas, 10)
+        db.registrar_gasto(f"10/{mes}", 40, "feira", mercado, mes)
+    db.salvar_valor_subconta("03/2025", mercado, 100)
+    db.salvar_valor_subconta("03/2025", reservas, 50)
+    db.registrar_gasto("10/03/2025", 30, "feira", mercado, "03/2025")
+    yield mercado, reservas
+    previsao.limpar_previsao()
+
+
+def test_reservas_acumula_a_partir_do_saldo_atual(historico):
+    mercado, reservas = historico
+    meses, subcontas, saldos, _ = previsao.prever_saldos("03/2025", 12, janela=2, reservas_id=reservas)
+    linha = dict(zip(subcontas, saldos))
+
+    assert meses[0] == "04/2025"
+    assert np.allclose(linha[mercado], 60)
+    # Abril: 50 de hoje + 10 do próprio fluxo + 70 que sobram em março no Mercado;
+    # depois, 10 + 60 por mês
+    assert np.allclose(linha[reservas], 130 + 70 * np.arange(12))
@@ -0,0 +1,7 @@
+import db
+import relatorio
+
+
+def test_pdf_de_periodo_vazio(banco):
+    reservas = db.garantir_reservas()
+    assert relatorio.gerar_pdf_periodo("05/2025", "03/2025", reservas).startswith(b"%PDF")
@@ -0,0 +1,38 @@
+import pytest
+
+import sessoes
+from conexao import transacao
+
+
+@pytest.fixture(autouse=True)
+def _cache_limpo():
+    sessoes.limpar_cache_sessoes()
+    yield
+    sessoes.limpar_cache_sessoes()
+
+
+def _revogar_em_outro_processo(token):
+    # Só o banco muda; o LRU deste processo continua com o token
+    with transacao(versionar=False) as cur:
+        cur.execute("DELETE FROM sessao WHERE token=?", (token,))
+
+
+def test_sessao_valida_ate_encerrar(banco):
+    token = sessoes.criar_sessao("ana")
+    assert sessoes.validar_sessao(token) == "ana"
+    sessoes.encerrar_sessao(token)
+    assert sessoes.validar_sessao(token) is None
+
+
+def test_token_invalido(banco):
+    assert sessoes.validar_sessao(None) is None
+    assert sessoes.validar_sessao("nao-existe") is None
+
+
+def test_revogacao_de_outro_processo_vale_apos_validade_do_cache(banco, monkeypatch):
+    token = sessoes.criar_sessao("ana")
+    _revogar_em_outro_processo(token)
+    assert sessoes.validar_sessao(token) == "ana"  # ainda dentro de VALIDADE_CACHE
+    monkeypatch.setattr(sessoes, "VALIDADE_CACHE", 0)
+    assert sessoes.validar_sessao(token) is None
+    assert token not in sessoes._tokens